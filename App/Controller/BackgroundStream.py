@@ -0,0 +1,91 @@
+import queue
+import threading
+
+
+class BackgroundStream:
+
+    def __init__(self, root, generatorFunction, onItems, onDone=None, onError=None, pollInterval=50, batchSize=200):
+        """
+        Constructor for a generator consumed on a worker thread, whose items are handed in batches to the Tk thread
+        through root.after, so the UI stays responsive while a long download streams in
+        :param root: The Tk root whose mainloop runs the callbacks
+        :param generatorFunction: Function run on the worker thread, returning the generator to consume
+        :param onItems: Function run on the Tk thread with each list of new items
+        :param onDone: Function run on the Tk thread once the generator is exhausted
+        :param onError: Function run on the Tk thread with the exception if the generator raised one
+        :param pollInterval: Milliseconds between checks for new items
+        :param batchSize: Maximum number of items handed to onItems at once
+        """
+        self.__root = root
+        self.__generatorFunction = generatorFunction
+        self.__onItems = onItems
+        self.__onDone = onDone
+        self.__onError = onError
+        self.__pollInterval = pollInterval
+        self.__batchSize = batchSize
+        self.__queue = queue.Queue()  # ("item", item), ("done", None) or ("error", exception)
+        self.__pollJob = None
+        self.__stopped = False
+
+    def start(self):
+        """
+        Start consuming the generator
+        :return: None
+        """
+        threading.Thread(target=self.__work, daemon=True).start()
+        self.__pollJob = self.__root.after(self.__pollInterval, self.__poll)
+
+    def stop(self):
+        """
+        Stop handing items to the Tk thread; the worker stops at its next item
+        :return: None
+        """
+        self.__stopped = True
+        if self.__pollJob is not None:
+            self.__root.after_cancel(self.__pollJob)
+            self.__pollJob = None
+
+    def __work(self):
+        """
+        Consume the generator on the worker thread, queueing each item for the Tk thread
+        :return: None
+        """
+        try:
+            for item in self.__generatorFunction():
+                if self.__stopped:
+                    return
+                self.__queue.put(("item", item))
+            self.__queue.put(("done", None))
+        except Exception as e:
+            self.__queue.put(("error", e))
+
+    def __poll(self):
+        """
+        Run on the Tk thread to hand the queued items over, until the generator is exhausted or failed
+        :return: None
+        """
+        self.__pollJob = None
+        if self.__stopped:
+            return
+        items = []
+        finished = None
+        while len(items) < self.__batchSize:
+            try:
+                kind, value = self.__queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "item":
+                items.append(value)
+            else:
+                finished = (kind, value)
+                break
+
+        if items:
+            self.__onItems(items)
+        if finished is None:
+            self.__pollJob = self.__root.after(self.__pollInterval, self.__poll)
+        elif finished[0] == "done":
+            if self.__onDone:
+                self.__onDone()
+        elif self.__onError:
+            self.__onError(finished[1])
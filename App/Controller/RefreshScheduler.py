@@ -0,0 +1,137 @@
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RefreshScheduler:
+
+    def __init__(self, root, fetch, apply, interval, onError=None, pollInterval=50):
+        """
+        Constructor for the scheduler refreshing the UI every N seconds. The slow fetch runs on a worker thread and its
+        result is handed back to the Tk thread through root.after, so Tk widgets are only ever touched from mainloop
+        :param root: The Tk root whose mainloop runs apply
+        :param fetch: Function run on the worker thread each tick; its return value is passed to apply
+        :param apply: Function run on the Tk thread with the result of fetch
+        :param interval: Seconds between ticks
+        :param onError: Function run on the Tk thread with the exception if fetch raised one
+        :param pollInterval: Milliseconds between checks for a finished fetch
+        """
+        self.__root = root
+        self.__fetch = fetch
+        self.__apply = apply
+        self.__onError = onError
+        self.__interval = interval
+        self.__pollInterval = pollInterval
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__results = queue.Queue()  # (True, result) or (False, exception) of finished fetches
+        self.__tickJob = None  # after id of the next tick
+        self.__pollJob = None  # after id of the next check for a finished fetch
+        self.__lastTick = None
+        self.__inFlight = False
+        self.__tickPending = False  # a tick came while a fetch was in flight
+        self.__running = False
+
+    def start(self):
+        """
+        Start ticking, with a first tick straight away
+        :return: None
+        """
+        if not self.__running:
+            self.__running = True
+            self.__tick()
+
+    def stop(self):
+        """
+        Stop ticking and shut the worker down without waiting for a fetch in flight
+        :return: None
+        """
+        self.__running = False
+        if self.__tickJob is not None:
+            self.__root.after_cancel(self.__tickJob)
+            self.__tickJob = None
+        if self.__pollJob is not None:
+            self.__root.after_cancel(self.__pollJob)
+            self.__pollJob = None
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def setInterval(self, interval):
+        """
+        Change the seconds between ticks. The next tick is moved to interval seconds after the last one, or happens
+        straight away if that time has already passed
+        :param interval: Seconds between ticks
+        :return: None
+        """
+        self.__interval = interval
+        if self.__running and self.__tickJob is not None:
+            self.__root.after_cancel(self.__tickJob)
+            self.__scheduleTick()
+
+    def __scheduleTick(self):
+        """
+        Schedule the next tick interval seconds after the last one
+        :return: None
+        """
+        delay = self.__interval
+        if self.__lastTick is not None:
+            delay = max(0, self.__lastTick + self.__interval - time.monotonic())
+        self.__tickJob = self.__root.after(int(delay * 1000), self.__tick)
+
+    def __tick(self):
+        """
+        Start a fetch, or if the previous one is still running, coalesce this tick into one run right after it
+        :return: None
+        """
+        self.__tickJob = None
+        if not self.__running:
+            return
+        self.__lastTick = time.monotonic()
+        if self.__inFlight:
+            self.__tickPending = True
+        else:
+            self.__submit()
+        self.__scheduleTick()
+
+    def __submit(self):
+        """
+        Hand a fetch to the worker and start checking for its result
+        :return: None
+        """
+        self.__inFlight = True
+        self.__executor.submit(self.__work)
+        if self.__pollJob is None:
+            self.__pollJob = self.__root.after(self.__pollInterval, self.__poll)
+
+    def __work(self):
+        """
+        Run fetch on the worker thread and queue its outcome for the Tk thread
+        :return: None
+        """
+        try:
+            self.__results.put((True, self.__fetch()))
+        except Exception as e:
+            self.__results.put((False, e))
+
+    def __poll(self):
+        """
+        Run on the Tk thread until the fetch in flight finishes, then apply its result
+        :return: None
+        """
+        self.__pollJob = None
+        if not self.__running:
+            return
+        try:
+            succeeded, result = self.__results.get_nowait()
+        except queue.Empty:
+            self.__pollJob = self.__root.after(self.__pollInterval, self.__poll)
+            return
+
+        self.__inFlight = False
+        try:
+            if succeeded:
+                self.__apply(result)
+            elif self.__onError:
+                self.__onError(result)
+        finally:
+            if self.__tickPending and self.__running:
+                self.__tickPending = False
+                self.__submit()
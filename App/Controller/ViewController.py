@@ -1,30 +1,84 @@
 from ..View.View import View
 import tkinter as tk
-import threading
+import argparse
 import datetime
+import os
 
-from matplotlib.figure import Figure
-
+from ..Model.AdaptivePoller import AdaptivePoller
+from ..Model.EventBus import EventBus
 from ..Model.WebServiceManager import WebServiceManager
+from ..Model.LocalStore import LocalStore
+from ..Model.MonitoringGroup import MonitoringGroup
 from ..Model.MonitoringList import MonitoringList
 from ..Model.MonitoringListAverage import MonitoringListAverage
+from ..Model.MyExceptions import ServerException
 from ..Model.Practitioner import Practitioner
+from ..Model.Ward import Ward
+from .BackgroundStream import BackgroundStream
+from .RefreshScheduler import RefreshScheduler
 
 
 class ViewController:
-    def __init__(self, root):
+    def __init__(self, root, wsm=None, store=None):
+        """
+        Constructor for the controller of the app's window
+        :param root: the Tk root window
+        :param wsm: WebServiceManager to fetch the data with, or None for one using the default server
+        :param store: LocalStore keeping data between runs, or None for the one in the home directory
+        """
+        self.__root = root
         self.__view = View(root)
         # Default Values for Frequency, X and Y.
         self.__freq = 20
         self.__xValue = 140
         self.__yValue = 90
+        # Historic systolic readings are kept for this many days, up to this many readings, and plotted in buckets
+        self.__historicDays = 90
+        self.__historicReadings = 500
+        self.__historicBuckets = 60
+        self.__historicRowReadings = 5  # latest readings listed in the historic table
+        self.__bloodPressureHysteresis = 2  # mmHg below X or Y a reading must go to clear its highlight
         self.__practitioner = None
-        self.__wsm = WebServiceManager()
+        self.__pracId = None
+        self.__loginStream = None
+        self.__sessionStream = None
+        self.__sessionRestored = False
+        self.__wsm = wsm if wsm is not None else WebServiceManager()
+        # Roster and monitored Encounters of the last run, shown at login while the server is asked for fresh ones
+        self.__store = store if store is not None else LocalStore(os.path.join(os.path.expanduser("~"),
+                                                                                 ".patient_monitor.sqlite3"))
         self.__patients = None
-        self.__monitoringList = MonitoringListAverage(self.__wsm, "cholesterol")
-        self.__systolicMonitor = MonitoringList("systolic", self.__wsm, self.__xValue, 1)
-        self.__systolicMonitorHistoric = MonitoringList("systolic", self.__wsm, self.__xValue, 5)
-        self.__diastolicMonitor = MonitoringList("diastolic", self.__wsm, self.__yValue, 1)
+        # Monitors publish their changes here, and only the tables and graphs they affect are redrawn
+        self.__eventBus = EventBus()
+        self.__monitoringList = MonitoringListAverage("cholesterol", self.__wsm, self.__eventBus)
+        self.__systolicMonitor = MonitoringList("systolic", self.__wsm, self.__xValue, 1, None,
+                                                self.__bloodPressureHysteresis, self.__eventBus)
+        self.__systolicMonitorHistoric = MonitoringList("systolic", self.__wsm, self.__xValue, self.__historicReadings,
+                                                        self.__historicDays * 24 * 3600, 0, self.__eventBus)
+        self.__diastolicMonitor = MonitoringList("diastolic", self.__wsm, self.__yValue, 1, None,
+                                                 self.__bloodPressureHysteresis, self.__eventBus)
+        # All monitors are refreshed from one shared download per tick, of the patients the poller finds due: those
+        # with a raised alert every N seconds, the others less often the longer their readings stay unchanged
+        self.__poller = AdaptivePoller(self.__wsm, self.__freq)
+        self.__monitoringGroup = MonitoringGroup(self.__wsm, [self.__monitoringList, self.__systolicMonitor,
+                                                              self.__systolicMonitorHistoric, self.__diastolicMonitor],
+                                                 self.__store, self.__poller)
+        # Monitors by the name their patients are saved under in a session
+        self.__monitors = {"cholesterol": self.__monitoringList, "systolic": self.__systolicMonitor,
+                           "systolicHistoric": self.__systolicMonitorHistoric, "diastolic": self.__diastolicMonitor}
+        for monitor in (self.__monitoringList, self.__systolicMonitor, self.__diastolicMonitor):
+            monitor.getAlerts().addListener(
+                lambda patient_id, raised, value, encounterType=monitor.getEncounterType():
+                self.alertChanged(encounterType, patient_id, raised, value))
+        self.__redraw = set()  # monitors whose table must be rendered again, e.g. after a patient was added
+        self.__changedRows = dict()  # monitor to the IDs of its patients whose Encounters changed
+        for eventType in (EventBus.PATIENT_ADDED, EventBus.PATIENT_REMOVED, EventBus.ENCOUNTER_CHANGED,
+                          EventBus.THRESHOLD_CHANGED):
+            self.__eventBus.subscribe(eventType, self.monitorChanged)
+        # Downloads run on a worker thread, the results are applied and displayed on the Tk thread
+        self.__scheduler = RefreshScheduler(root, self.__monitoringGroup.fetch, self.timerFunction, self.__freq,
+                                            self.updateFailed)
+        root.protocol("WM_DELETE_WINDOW", self.close)
         # Configure the actions in View, by passing references, View will not know existence of controller.
         self.__view.pracIdButton.config(command=self.login)
         self.__view.NButton.config(command=self.updateN)
@@ -37,19 +91,19 @@ class ViewController:
     def login(self):
         """
         This function gets the input from UI entry as practitioner ID, and attempt to use it to fetch all patients.
-        If successful, display all patients and also start the time loop function.
+        Several IDs separated by commas log in a whole ward. Patients are shown as their pages arrive, and the time
+        loop function starts as soon as the login succeeds.
         """
         pracId = self.__view.pracIdInput.get()
         self.practitionerLogin(pracId)
-        self.__patients = self.getAllPatients()
-        self.displayAllPatientTree()
-        self.timerFunction()
 
     def updateN(self):
         """
         This function updates the local frequency variable from the user input
         """
         self.__freq = int(self.__view.NInput.get())
+        self.__scheduler.setInterval(self.__freq)
+        self.__poller.setInterval(self.__freq)
         print("New N: {0}".format(self.__freq))
 
     def updateX(self):
@@ -57,50 +111,283 @@ class ViewController:
         This function updates the local X variable from the user input
         """
         self.__xValue = int(self.__view.XInput.get())
+        self.__systolicMonitor.setThreshold(self.__xValue)
+        self.__systolicMonitorHistoric.setThreshold(self.__xValue)
         print("New X: {0}".format(self.__xValue))
+        self.refreshDisplays()
 
     def updateY(self):
         """
         This function updates the local Y variable from the user input
         """
         self.__yValue = int(self.__view.YInput.get())
+        self.__diastolicMonitor.setThreshold(self.__yValue)
         print("New Y: {0}".format(self.__yValue))
+        self.refreshDisplays()
 
-    def timerFunction(self):
+    def timerFunction(self, fetched):
         """
-        This function prints the current datetime, then proceed to update every table presenting in the UI.
-        Once done, the thread gets invoked again with the updated frequency.
+        This function runs on the Tk thread every N seconds once the scheduler fetched new measurements. It prints the
+        current datetime, applies the measurements to the monitors, then proceed to update the tables and graphs
+        the new measurements changed. A tick without new measurements draws nothing.
+        :param fetched: the new measurements returned by MonitoringGroup.fetch
         """
         t = datetime.datetime.now()
         st = t.strftime('Last Updated - %H:%M:%S (H:M:S)')
         print(st)
-        self.displayCholesterolPatientTree()
-        self.displayBloodPressurePatientTree()
-        self.displayHistoricBloodPressurePatientTree()
-        self.displayCholesterolGraph()
-        self.displayBloodGraph()
-        threading.Timer(self.__freq, self.timerFunction).start()
+        self.__monitoringGroup.apply(fetched)
+        self.refreshDisplays()
+
+    def monitorChanged(self, eventType, monitor, patient_ids):
+        """
+        This function is the handler of the events published by the monitors. Changes are only recorded here, and
+        drawn together by refreshDisplays
+        :param eventType: the type of event, e.g. EventBus.PATIENT_ADDED
+        :param monitor: the MonitoringList that changed
+        :param patient_ids: the IDs of the patients concerned
+        """
+        if eventType == EventBus.ENCOUNTER_CHANGED:
+            self.__changedRows.setdefault(monitor, set()).update(patient_ids)
+        else:  # rows are added or removed, or highlights may change on any row
+            self.__redraw.add(monitor)
+
+    def refreshDisplays(self):
+        """
+        This function updates the tables and graphs affected by the changes of the monitors since the last call.
+        Tables only showing new measurements have just those rows changed
+        """
+        redraw, changedRows = self.__redraw, self.__changedRows
+        self.__redraw, self.__changedRows = set(), dict()
+
+        if self.__monitoringList in redraw:
+            self.displayCholesterolPatientTree()
+        elif self.__monitoringList in changedRows:
+            patients = self.__monitoringList.returnPatients()
+            self.__view.cholesterolPatientRows.update(
+                [self.getCholesterolPatientRow(patients[patient_id])
+                 for patient_id in changedRows[self.__monitoringList] if patient_id in patients])
+        if self.__monitoringList in redraw or self.__monitoringList in changedRows:
+            self.displayCholesterolGraph()
+
+        bloodPressureMonitors = (self.__systolicMonitor, self.__diastolicMonitor)
+        if any(monitor in redraw for monitor in bloodPressureMonitors):
+            self.displayBloodPressurePatientTree()
+        elif any(monitor in changedRows for monitor in bloodPressureMonitors):
+            patientsSystolic = self.__systolicMonitor.returnPatients()
+            patientsDiastolic = self.__diastolicMonitor.returnPatients()
+            patient_ids = changedRows.get(self.__systolicMonitor, set()) | changedRows.get(self.__diastolicMonitor,
+                                                                                             set())
+            self.__view.bloodPressurePatientRows.update(
+                [self.getBloodPressurePatientRow(patientsSystolic[patient_id], patientsDiastolic[patient_id])
+                 for patient_id in patient_ids if patient_id in patientsSystolic and patient_id in patientsDiastolic])
+
+        if self.__systolicMonitorHistoric in redraw:
+            self.displayHistoricBloodPressurePatientTree()
+        elif self.__systolicMonitorHistoric in changedRows:
+            patients = self.__systolicMonitorHistoric.returnPatients()
+            self.__view.historicalRows.update(
+                [self.getHistoricBloodPressurePatientRow(patients[patient_id])
+                 for patient_id in changedRows[self.__systolicMonitorHistoric] if patient_id in patients])
+        if self.__systolicMonitorHistoric in redraw or self.__systolicMonitorHistoric in changedRows:
+            self.displayBloodGraph()
+
+    def alertChanged(self, encounterType, patient_id, raised, value):
+        """
+        This function is the handler when the alert of a monitored patient is raised or cleared. Highlights are read
+        from the alerts when rows are built, so this only reports the change
+        :param encounterType: the type of measurement of the alert, e.g. "systolic"
+        :param patient_id: the ID of the patient
+        :param raised: True if the alert was raised, False if it was cleared
+        :param value: the latest value of the patient, or None if they are no longer monitored
+        """
+        if value is not None:
+            print("Alert {0}: patient {1} {2} {3}".format("raised" if raised else "cleared", patient_id,
+                                                         encounterType, value))
+
+    def updateFailed(self, error):
+        """
+        This function is the handler when a scheduled fetch, or the fetch of a patient selected to be monitored,
+        failed. The last known values stay displayed and the next tick, or click, tries again
+        :param error: the exception raised by the fetch
+        """
+        if not isinstance(error, ServerException):
+            raise error
+        print("Update failed: {0}".format(error))
 
-    def insertAllPatientTree(self, patient):
+    def close(self):
         """
-        This function inserts an Patient to allPatientTree in UI
+        This function is the handler when the window is closed. It stops the scheduler and saves the session and the
+        monitored Encounters before destroying the window
+        """
+        self.__scheduler.stop()
+        for stream in (self.__loginStream, self.__sessionStream):
+            if stream is not None:
+                stream.stop()
+        self.saveSession()
+        self.__monitoringGroup.saveEncounters()
+        self.__store.close()
+        self.__root.destroy()
+
+    def getAllPatientRow(self, patient):
+        """
+        This function builds the row of a Patient in allPatientTree in UI
         :param patient: a Patient
+        :return: the values of the row
         """
-        self.__view.allPatientTree.insert("", "end",
-                                          values=(patient.getId(), patient.getFullName(), 'Click Here', 'Click Here'))
+        return patient.getId(), patient.getFullName(), 'Click Here', 'Click Here'
 
     def practitionerLogin(self, prac_id):
         """
-        This function will use the provided id to login for a practitioner (create an instance of it).
-        :param prac_id: the practitioner ID used for login
+        This function will use the provided id to login for a practitioner (create an instance of it). The roster is
+        downloaded on a worker thread. The patients stored by the last login are shown straight away, then the ones
+        the server adds are shown as their pages arrive, and the list is refreshed once the whole roster is known.
+        With several IDs, their rosters are fetched concurrently and shown as one list where shared patients appear
+        once.
+        :param prac_id: the practitioner ID used for login, or several IDs separated by commas
+        """
+        pracIds = list(dict.fromkeys(pracId.strip() for pracId in prac_id.split(",") if pracId.strip()))
+        if not pracIds:
+            return
+        if self.__loginStream is not None:
+            self.__loginStream.stop()
+        self.__pracId = ",".join(pracIds)  # a ward saves its session under the IDs of all its practitioners
+        self.__sessionRestored = False
+        self.__view.allPatientRows.setRows([])
+
+        def streamLogin():
+            if len(pracIds) > 1:
+                practitioner = Ward(pracIds, self.__wsm, False, self.__store)
+            else:
+                practitioner = Practitioner(pracIds[0], self.__wsm, False, self.__store)
+            yield practitioner
+            yield from list(practitioner.returnPatients().values())  # stored by the last login
+            yield from practitioner.loadPatients()
+
+        self.__loginStream = BackgroundStream(self.__root, streamLogin, self.addAllPatientRows,
+                                              self.loginCompleted, self.loginFailed)
+        self.__loginStream.start()
+
+    def loginCompleted(self):
+        """
+        This function is the handler when the whole roster has been downloaded. It shows the final roster, which also
+        drops stored patients the server no longer lists
+        """
+        self.__patients = self.getAllPatients()
+        self.displayAllPatientTree()
+        if not self.__sessionRestored:
+            self.restoreSession()
+
+    def loginFailed(self, error):
+        """
+        This function is the handler when the login or the roster download fails
+        :param error: the exception raised on the worker thread
         """
-        loggedIn = False
-        while not loggedIn:
-            try:
-                self.__practitioner = Practitioner(prac_id, self.__wsm)
-                loggedIn = True
-            except Exception:
-                print("Login failed, please try again")
+        print("Login failed, please try again")
+
+    def addAllPatientRows(self, items):
+        """
+        This function appends newly fetched patients to allPatientTree in UI. The first item of a login is the
+        Practitioner or Ward itself, whose patients are then shown while the rest of the roster is still being fetched
+        :param items: list of Patients, possibly preceded by the logged in Practitioner or Ward
+        """
+        if items and isinstance(items[0], (Practitioner, Ward)):
+            self.__practitioner = items.pop(0)
+            # the roster stored by the last login is enough to restore its session
+            if self.__practitioner.returnPatients():
+                self.restoreSession()
+            self.__scheduler.start()
+        self.__patients = self.getAllPatients()
+        self.__view.allPatientRows.extend([self.getAllPatientRow(patient) for patient in items])
+
+    def saveSession(self):
+        """
+        This function saves the monitored patients and the N, X and Y settings of the logged in practitioner, so the
+        next login can restore them
+        """
+        if self.__practitioner is None:
+            return
+        monitors = {name: {"patients": monitor.getPatientIds(), "threshold": monitor.getThreshold(),
+                           "thresholdMode": monitor.getThresholdMode()}
+                    for name, monitor in self.__monitors.items()}
+        self.__store.saveSession(self.__pracId, {"N": self.__freq, "X": self.__xValue, "Y": self.__yValue,
+                                                 "monitors": monitors})
+
+    def restoreSession(self):
+        """
+        This function restores the session saved by the last run of the practitioner. Monitored patients are shown
+        straight away with their stored Encounters, then all of them are refreshed by a single bulk fetch on a worker
+        thread, instead of one fetch per patient as when they are selected
+        """
+        self.__sessionRestored = True
+        session = self.__store.loadSession(self.__pracId)
+        if not session:
+            return
+        self.__freq, self.__xValue, self.__yValue = session["N"], session["X"], session["Y"]
+        self.__scheduler.setInterval(self.__freq)
+        self.__poller.setInterval(self.__freq)
+        for entry, value in ((self.__view.NInput, self.__freq), (self.__view.XInput, self.__xValue),
+                             (self.__view.YInput, self.__yValue)):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(value))
+
+        restored = {}  # monitor name to the Patients it monitored
+        for name, saved in session["monitors"].items():
+            monitor = self.__monitors[name]
+            mode, parameter = saved.get("thresholdMode", ("fixed", None))
+            if mode == "fixed":
+                monitor.setThreshold(saved["threshold"])
+            monitor.setThresholdMode(mode, parameter)
+            restored[name] = [self.__practitioner.getPatient(patient_id) for patient_id in saved["patients"]
+                              if self.__practitioner.getPatient(patient_id)]
+        monitored = [(self.__monitors[name], [patient.getId() for patient in patients])
+                     for name, patients in restored.items() if patients]
+        if not monitored:
+            return
+        patient_ids = list(dict.fromkeys(patient_id for monitor, ids in monitored for patient_id in ids))
+        encounterTypes = list(dict.fromkeys(monitor.getEncounterType() for monitor, ids in monitored))
+        num = max(monitor.getNumHistoric() for monitor, ids in monitored)
+
+        self.addSessionPatients(restored, self.__store.loadEncounters(patient_ids, encounterTypes, num), False)
+
+        def fetchSession():
+            # the same encounters of each type, from the same window start, as the monitoring group polls for
+            yield self.__monitoringGroup.fetchPatients(monitored)
+
+        self.__sessionStream = BackgroundStream(self.__root, fetchSession,
+                                                lambda items: self.addSessionPatients(restored, items[0], True),
+                                                onError=self.updateFailed)
+        self.__sessionStream.start()
+
+    def addSessionPatients(self, restored, results, replace):
+        """
+        This function adds the patients of a restored session to their monitors, with the Encounters given, and
+        updates the UI
+        :param restored: map of monitor name to the Patients it monitored
+        :param results: map of patient id to a map of encounter type to list of Encounters, latest first
+        :param replace: True to replace the Encounters of patients still monitored, False to only add patients
+        """
+        for name, patients in restored.items():
+            monitor = self.__monitors[name]
+            if replace:  # patients unmonitored while the fetch was running stay unmonitored
+                patients = [patient for patient in patients if monitor.contains(patient.getId())]
+            monitor.addAll([patient.withEncounters(self.getSessionEncounters(results, patient.getId(), monitor))
+                            for patient in patients], replace)
+        self.__monitoringGroup.saveEncounters()
+        self.refreshDisplays()
+
+    def getSessionEncounters(self, results, patient_id, monitor):
+        """
+        This function picks the Encounters of a restored patient for one monitor, following the same rules as when
+        the patient is selected
+        :param results: map of patient id to a map of encounter type to list of Encounters, latest first
+        :param patient_id: the ID of the patient
+        :param monitor: the MonitoringList the patient is added to
+        :return: list of Encounters, or None
+        """
+        encounters = results.get(patient_id, {})
+        if monitor is self.__diastolicMonitor and not encounters.get("systolic"):
+            return None  # blood pressure without a systolic value is shown as no data
+        return encounters.get(monitor.getEncounterType())
 
     def getAllPatients(self):
         """
@@ -112,11 +399,10 @@ class ViewController:
 
     def displayAllPatientTree(self):
         """
-        This function updates the allPatientTree in UI with the current holding patients in ViewController
+        This function updates the allPatientTree in UI with the current holding patients in ViewController. Only the
+        rows in view are materialized in the tree
         """
-        for patientId in self.__patients:  # for each patient, invoke the push function
-            patient = self.__patients[patientId]
-            self.insertAllPatientTree(patient)
+        self.__view.allPatientRows.setRows([self.getAllPatientRow(patient) for patient in self.__patients.values()])
 
     def selectedAllPatientTree(self, event):
         """
@@ -128,11 +414,11 @@ class ViewController:
         if col == '#3':
             # monitor cholesterol
             self.monitorCholesterol(str(curItem['values'][0]))
-            self.displayCholesterolPatientTree()
+            self.refreshDisplays()
         if col == '#4':
             # monitor BP implementation
             self.monitorBloodPressure(str(curItem['values'][0]))
-            self.displayBloodPressurePatientTree()
+            self.refreshDisplays()
 
     def selectedCholesterolPatientTree(self, event):
         """
@@ -157,7 +443,7 @@ class ViewController:
             self.__view.openExtraInfoWindow(patient.getExtraInfo())
         if col == '#7':
             self.monitorHistoricBloodPressure(str(curItem['values'][0]))
-            self.displayHistoricBloodPressurePatientTree()
+            self.refreshDisplays()
 
     def monitorCholesterol(self, patient_id):
         """
@@ -169,66 +455,54 @@ class ViewController:
         else:  # click means add
             monitoredPatient = self.__practitioner.getPatient(patient_id)
             if monitoredPatient:
-                cholesterolEncounters = self.__wsm.fetchEncounter(patient_id, "cholesterol", 1)
-                if cholesterolEncounters:
-                    monitoredPatient.updateEncounters(cholesterolEncounters)
-                else:
-                    monitoredPatient.updateEncounters(None)
-                self.__monitoringList.add(monitoredPatient)
+                try:
+                    cholesterolEncounters = self.__wsm.fetchEncounter(patient_id, "cholesterol", 1)
+                except ServerException as e:  # the patient stays unmonitored, clicking again tries again
+                    self.updateFailed(e)
+                    return
+                self.__monitoringList.add(monitoredPatient.withEncounters(cholesterolEncounters))
 
     def displayCholesterolPatientTree(self):
         """
-        This function updates the cholesterolPatientTree in UI with the current holding patients in ViewController
+        This function updates the cholesterolPatientTree in UI with the current holding patients in ViewController.
+        Only rows that changed since the last display are touched
         """
-        self.__view.cholesterolPatientTree.delete(*self.__view.cholesterolPatientTree.get_children())
         patientsMonitored = self.__monitoringList.returnPatients()
-        for patientId in patientsMonitored:  # for each patient, invoke the pushMonior function
-            patient = patientsMonitored[patientId]
-            self.insertCholesterolPatientTree(patient)
+        rows = [self.getCholesterolPatientRow(patient) for patient in patientsMonitored.values()]
+        self.__view.cholesterolPatientRows.render(rows)
 
-    def insertCholesterolPatientTree(self, patient):
+    def getCholesterolPatientRow(self, patient):
         """
-        This function inserts a patient in the cholesterolPatientTree
+        This function builds the row of a patient in the cholesterolPatientTree
         :param patient: a Patient
+        :return: the row as (iid, values, tags)
         """
         encounters = patient.getEncounters()
         if encounters:
             encounter = encounters[0]
             value = encounter.getValue()
-            if value > round(self.__monitoringList.getAverage(), 2):
+            values = (patient.getId(), patient.getFullName(), str(value), encounter.getDateTime(), 'Click Here')
+            if self.__monitoringList.getAlerts().isRaised(patient.getId()):
                 # display in red
-                self.__view.cholesterolPatientTree.insert("", "end", values=(
-                    patient.getId(), patient.getFullName(), str(value), encounter.getDateTime(), 'Click Here'),
-                                                          tags=("red font",))
-            else:
-                # display in plain background
-                self.__view.cholesterolPatientTree.insert("", "end", values=(
-                    patient.getId(), patient.getFullName(), str(value), encounter.getDateTime(), 'Click Here'))
-        else:
-            # no encounter
-            self.__view.cholesterolPatientTree.insert("", "end", values=(
-                patient.getId(), patient.getFullName(), 'No Data', 'N/A', 'Click Here'))
+                return patient.getId(), values, ("red font",)
+            # display in plain background
+            return patient.getId(), values, ()
+        # no encounter
+        return patient.getId(), (patient.getId(), patient.getFullName(), 'No Data', 'N/A', 'Click Here'), ()
 
     def displayCholesterolGraph(self):
         """
         This function display the cholesterol graph in UI
         """
-        if self.__monitoringList.getNumPatients() > 0:
-            patients = self.__monitoringList.returnPatients()
-            names = []
-            values = []
-            for patient_id in patients:
-                encounters = patients[patient_id].getEncounters()
-                if encounters:
-                    names.append(patients[patient_id].getFullName())
-                    values.append(patients[patient_id].getEncounters()[0].getValue())
-            f = Figure(figsize=(8, 2))
-            a = f.add_subplot(111)
-            a.bar(names, values)
-            a.set_title("Total Cholesterol mg/dL")
-            self.__view.displayCholesterolGraph(f, True)
-        else:
-            self.__view.displayCholesterolGraph()
+        names = []
+        values = []
+        patients = self.__monitoringList.returnPatients()
+        for patient in patients.values():
+            encounters = patient.getEncounters()
+            if encounters:
+                names.append(patient.getFullName())
+                values.append(encounters[0].getValue())
+        self.__view.displayCholesterolGraph(names, values)
 
     def monitorBloodPressure(self, patient_id):
         """
@@ -243,33 +517,38 @@ class ViewController:
             if self.__systolicMonitorHistoric.contains(patient_id):  # Should also remove from long term monitor
                 self.__systolicMonitorHistoric.remove(patient_id)
         else:  # click means add
-            monitoredPatientSystolic = self.__practitioner.getPatient(patient_id)
-            if monitoredPatientSystolic:
-                monitoredPatientDiastolic = self.__practitioner.getPatient(patient_id)
-                systolicEncounters = self.__wsm.fetchEncounter(patient_id, "systolic", 1)
-                diastolicEncounters = self.__wsm.fetchEncounter(patient_id, "diastolic", 1)
-                if systolicEncounters:
-                    monitoredPatientSystolic.updateEncounters(systolicEncounters)
-                    monitoredPatientDiastolic.updateEncounters(diastolicEncounters)
-                self.__systolicMonitor.add(monitoredPatientSystolic)
-                self.__diastolicMonitor.add(monitoredPatientDiastolic)
+            monitoredPatient = self.__practitioner.getPatient(patient_id)
+            if monitoredPatient:
+                try:
+                    systolicEncounters, diastolicEncounters = self.__wsm.fetchBloodPressureEncounters(patient_id, 1)
+                except ServerException as e:  # the patient stays unmonitored, clicking again tries again
+                    self.updateFailed(e)
+                    return
+                if not systolicEncounters:
+                    diastolicEncounters = None
+                self.__systolicMonitor.add(monitoredPatient.withEncounters(systolicEncounters))
+                self.__diastolicMonitor.add(monitoredPatient.withEncounters(diastolicEncounters))
 
     def displayBloodPressurePatientTree(self):
         """
-        This function updates the bloodPressurePatientTree in UI with the current holding patients in ViewController
+        This function updates the bloodPressurePatientTree in UI with the current holding patients in ViewController.
+        Only rows that changed since the last display are touched
         """
-        self.__view.bloodPressurePatientTree.delete(*self.__view.bloodPressurePatientTree.get_children())
         patientsSystolic = self.__systolicMonitor.returnPatients()
         patientsDiastolic = self.__diastolicMonitor.returnPatients()
+        rows = []
         for patient_id in patientsSystolic:
-            self.insertBloodPressurePatientTree(patientsSystolic[patient_id], patientsDiastolic[patient_id])
+            if patient_id in patientsDiastolic:
+                rows.append(self.getBloodPressurePatientRow(patientsSystolic[patient_id],
+                                                            patientsDiastolic[patient_id]))
+        self.__view.bloodPressurePatientRows.render(rows)
 
-    def insertBloodPressurePatientTree(self, patientSystolic, patientDiastolic):
+    def getBloodPressurePatientRow(self, patientSystolic, patientDiastolic):
         """
-        This function inserts a patient into systolic and diastolic BP graph
+        This function builds the row of a patient in the bloodPressurePatientTree
         :param patientSystolic: patient with systolic encounter
         :param patientDiastolic: same patient with diastolic encounter
-        :return:
+        :return: the row as (iid, values, tags)
         """
         diastolicEncounters = patientDiastolic.getEncounters()
         systolicEncounters = patientSystolic.getEncounters()
@@ -284,35 +563,30 @@ class ViewController:
         if systolicEncounters:
             date = systolicEncounters[0].getDateTime()
             displayValueSystolic = systolicEncounters[0].getValue()
-            if self.__xValue:
-                if displayValueSystolic > round(self.__xValue, 2):
+            if self.__systolicMonitor.getAlerts().isRaised(id):
                     highlight = 'systolic'
 
         if diastolicEncounters:
             date = diastolicEncounters[0].getDateTime()
             displayValueDiastolic = diastolicEncounters[0].getValue()
-            if self.__yValue:
-                if displayValueDiastolic > round(self.__yValue, 2):
-                    if highlight == 'systolic':
-                        highlight = 'allBloodPressure'
-                    else:
-                        highlight = 'diastolic'
+            if self.__diastolicMonitor.getAlerts().isRaised(id):
+                if highlight == 'systolic':
+                    highlight = 'allBloodPressure'
+                else:
+                    highlight = 'diastolic'
 
         if highlight == 'systolic':
-            self.__view.bloodPressurePatientTree.insert("", "end", values=(
-                id, name, str(displayValueSystolic), str(displayValueDiastolic), date, 'Click Here', 'Click Here'),
-                                                        tags=("red font",))
+            return id, (id, name, str(displayValueSystolic), str(displayValueDiastolic), date, 'Click Here',
+                        'Click Here'), ("red font",)
         elif highlight == 'diastolic':
-            self.__view.bloodPressurePatientTree.insert("", "end", values=(
-                id, name, str(displayValueSystolic), str(displayValueDiastolic), date, 'Click Here', 'Not Available'),
-                                                        tags=("blue font",))
+            return id, (id, name, str(displayValueSystolic), str(displayValueDiastolic), date, 'Click Here',
+                        'Not Available'), ("blue font",)
         elif highlight == 'allBloodPressure':
-            self.__view.bloodPressurePatientTree.insert("", "end", values=(
-                id, name, str(displayValueSystolic), str(displayValueDiastolic), date, 'Click Here', 'Click Here'),
-                                                        tags=("purple font",))
+            return id, (id, name, str(displayValueSystolic), str(displayValueDiastolic), date, 'Click Here',
+                        'Click Here'), ("purple font",)
         else:
-            self.__view.bloodPressurePatientTree.insert("", "end", values=(
-                id, name, str(displayValueSystolic), str(displayValueDiastolic), date, 'Click Here', 'Not Available'))
+            return id, (id, name, str(displayValueSystolic), str(displayValueDiastolic), date, 'Click Here',
+                        'Not Available'), ()
 
     def monitorHistoricBloodPressure(self, patient_id):
         """
@@ -322,65 +596,64 @@ class ViewController:
         if self.__systolicMonitorHistoric.contains(patient_id):  # click means remove
             self.__systolicMonitorHistoric.remove(patient_id)
         else:
-            latestEncounter = self.__systolicMonitor.getNthEncounter(patient_id, 0)
-            if latestEncounter and latestEncounter.getValue() > self.__xValue:  # Only monitor if systolic is higher than X
+            # Only monitor if systolic is higher than X
+            if self.__systolicMonitor.getAlerts().isRaised(patient_id):
                 monitoredPatient = self.__practitioner.getPatient(patient_id)
                 if monitoredPatient:
-                    # fetch systolic encounter with past 5 values
-                    systolicEncounters = self.__wsm.fetchEncounter(patient_id, "systolic", 5)
-                    if systolicEncounters:
-                        monitoredPatient.updateEncounters(systolicEncounters)
-                    self.__systolicMonitorHistoric.add(monitoredPatient)
+                    # fetch the systolic encounters in the historic window
+                    try:
+                        systolicEncounters = self.__wsm.fetchEncounter(
+                            patient_id, "systolic", self.__systolicMonitorHistoric.getNumHistoric(),
+                            self.__systolicMonitorHistoric.getWindowStart())
+                    except ServerException as e:  # the patient stays unmonitored, clicking again tries again
+                        self.updateFailed(e)
+                        return
+                    self.__systolicMonitorHistoric.add(monitoredPatient.withEncounters(systolicEncounters))
 
     def displayHistoricBloodPressurePatientTree(self):
         """
-        This function updates the historicBloodPressureTree in UI by using local data
+        This function updates the historicBloodPressureTree in UI by using local data. Only rows that changed since
+        the last display are touched
         """
-        self.__view.historicalTree.delete(*self.__view.historicalTree.get_children())
         patients = self.__systolicMonitorHistoric.returnPatients()
-        for patient_id in patients:
-            patient = patients[patient_id]
-            self.insertHistoricBloodPressurePatientTree(patient)
+        rows = [self.getHistoricBloodPressurePatientRow(patient) for patient in patients.values()]
+        self.__view.historicalRows.render(rows)
 
-    def insertHistoricBloodPressurePatientTree(self, patient):
+    def getHistoricBloodPressurePatientRow(self, patient):
         """
-        This function inserts a patient into the historicalTree in UI
+        This function builds the row of a patient in the historicalTree in UI
         :param patient: a Patient
+        :return: the row as (iid, values, tags)
         """
-        encounters = patient.getEncounters()
-        productString = ""
-        for encounter in encounters:
-            productString += "{0} ({1}),".format(encounter.getValue(), encounter.getDateTime())
-        productString = productString[:-1]
-        self.__view.historicalTree.insert("", "end", values=(patient.getFullName(), productString))
+        encounters = patient.getEncounters() or ()
+        productString = ",".join("{0} ({1})".format(encounter.getValue(), encounter.getDateTime())
+                                 for encounter in encounters[:self.__historicRowReadings])
+        return patient.getId(), (patient.getFullName(), productString), ()
 
     def displayBloodGraph(self):
         """
-        This function display the blood monitoring graph in UI
+        This function display the blood monitoring graph in UI. Each patient's historic readings are plotted against
+        time, summarised in buckets so a long history is drawn with a bounded number of points
         :return:
         """
-        if self.__systolicMonitorHistoric.getNumPatients() > 0:
-            patients = self.__systolicMonitorHistoric.returnPatients()
-            names = []
-            indices = [1, 2, 3, 4, 5]
-            f = Figure(figsize=(8, 2))
-            a = f.add_subplot(111)
-            a.set_xticks(indices)
-            for patient_id in patients:
-                encounters = patients[patient_id].getEncounters()
-                if encounters:
-                    names.append(patients[patient_id].getFullName())
-                    values = [encounter.getValue() for encounter in encounters]
-                    a.plot(indices[:len(values)], values)
-            a.legend(names, loc='best')
-            a.set_title("Systolic BP (mmHg)")
-            self.__view.displayBloodGraph(f, True)
-        else:
-            self.__view.displayBloodGraph()
+        lines = []
+        patients = self.__systolicMonitorHistoric.returnPatients()
+        for patient_id, patient in patients.items():
+            encounters = patient.getEncounters()
+            if encounters:
+                times, lows, highs, means = encounters.downsample(self.__historicBuckets)
+                lines.append((patient_id, patient.getFullName(), times.tolist(), means.tolist(), lows.tolist(),
+                              highs.tolist()))
+        self.__view.displayBloodGraph(lines)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m App.Controller.ViewController",
+                                     description="Monitor the cholesterol and blood pressure of patients.")
+    parser.add_argument("--server", default=None,
+                        help="base url of the FHIR server, e.g. http://127.0.0.1:8078/fhir/ for App.Simulator")
+    args = parser.parse_args()
     root = tk.Tk()
     root.title("FIT3077 Assignment 3")
-    vc = ViewController(root)
+    vc = ViewController(root, WebServiceManager(baseUrl=args.server) if args.server else None)
     root.mainloop()
@@ -0,0 +1,170 @@
+import threading
+import time
+
+
+class AdaptivePoller:
+
+    def __init__(self, wsm, interval=20, maxInterval=3600, requestsPerMinute=60, smoothing=0.3, backoff=2.0,
+                 cadenceFraction=0.25):
+        """
+        Constructor for the scheduler deciding which monitored patients are polled on each tick. Each patient's
+        cadence, the usual time between their readings, is tracked as an exponentially weighted moving average of the
+        gaps between reading times. Patients whose alert is raised are polled every interval. The others are polled
+        every interval after a new reading, then less and less often while polls find nothing new, though always at
+        least once per fraction of their cadence. A token bucket keeps the polls within a budget of Observation
+        requests per minute, urgent and most overdue patients first. Every page the WebServiceManager fetches is
+        charged, including the next pages of a search and the searches made outside the poller
+        :param wsm: WebServiceManager the polls are made with, whose chunk size and request counts are used
+        :param interval: Shortest seconds between two polls of a patient, i.e. the tick interval N
+        :param maxInterval: Longest seconds between two polls of a patient
+        :param requestsPerMinute: Budget of Observation requests per minute
+        :param smoothing: Weight of the latest gap in the cadence, between 0 and 1
+        :param backoff: Factor the time between polls grows by after each poll finding nothing new
+        :param cadenceFraction: Fraction of the cadence a patient is polled at least every
+        """
+        self.__wsm = wsm
+        self.__interval = interval
+        self.__maxInterval = maxInterval
+        self.__requestsPerMinute = requestsPerMinute
+        self.__smoothing = smoothing
+        self.__backoff = backoff
+        self.__cadenceFraction = cadenceFraction
+        # Patients are taken by fetch on a worker thread and their polls recorded by apply on the owning thread
+        self.__lock = threading.Lock()
+        self.__lastPoll = dict()  # patient ID to time.time() of their last poll
+        self.__period = dict()  # patient ID to seconds between their polls while their alert is not raised
+        self.__idlePolls = dict()  # patient ID to number of polls in a row without a new reading
+        self.__latest = dict()  # patient ID to the time of their latest reading seen
+        self.__cadence = dict()  # patient ID to the moving average of the seconds between their readings
+        self.__tokens = float(requestsPerMinute)
+        self.__refilled = time.monotonic()
+        self.__charged = self.__getRequestCount()  # Observation requests of the wsm already taken from the tokens
+
+    def setInterval(self, interval):
+        """
+        Change the shortest seconds between two polls of a patient, e.g. when N changes
+        :param interval: seconds
+        :return: None
+        """
+        with self.__lock:
+            self.__interval = interval
+            for patient_id in self.__period:
+                self.__period[patient_id] = self.__getPeriod(patient_id)
+
+    def getInterval(self):
+        """
+        Get the shortest seconds between two polls of a patient
+        :return: seconds
+        """
+        return self.__interval
+
+    def getCadence(self, patient_id):
+        """
+        Get the usual time between the readings of a patient
+        :param patient_id: ID of the patient
+        :return: seconds, or None while fewer than two readings were seen
+        """
+        return self.__cadence.get(patient_id)
+
+    def getPeriod(self, patient_id):
+        """
+        Get the time between the polls of a patient while their alert is not raised
+        :param patient_id: ID of the patient
+        :return: seconds; a patient never polled is polled straight away
+        """
+        return self.__period.get(patient_id, 0)
+
+    def takeDue(self, patient_ids, urgent_ids=(), now=None):
+        """
+        Pick the patients to poll now, within the request budget. Patients never polled are due straight away.
+        Patients not picked stay due and come first on the next tick once they are the most overdue
+        :param patient_ids: IDs of the patients that can be polled; others are forgotten
+        :param urgent_ids: IDs of the patients whose alert is raised, polled every interval and picked first
+        :param now: time.time() of the tick, now if None
+        :return: list of patient IDs to poll, urgent then most overdue first
+        """
+        now = time.time() if now is None else now
+        urgent_ids = set(urgent_ids)
+        with self.__lock:
+            self.__forget(patient_ids)
+            due = []
+            for patient_id in patient_ids:
+                period = self.__interval if patient_id in urgent_ids else self.__period.get(patient_id, 0)
+                next_poll = self.__lastPoll.get(patient_id, 0) + period
+                if next_poll <= now:
+                    due.append((patient_id not in urgent_ids, next_poll, patient_id))
+            if not due:
+                return []
+            due.sort()
+            monotonic = time.monotonic()
+            requests = self.__getRequestCount()
+            # pages fetched since the last tick are charged now, so the tokens can go below zero after a long search
+            self.__tokens = min(float(self.__requestsPerMinute),
+                                self.__tokens + (monotonic - self.__refilled) * self.__requestsPerMinute / 60) - \
+                max(0, requests - self.__charged)
+            self.__refilled = monotonic
+            self.__charged = requests
+            # each chunk of patients costs at least one request
+            return [patient_id for _, _, patient_id in due[:max(0, int(self.__tokens)) * self.__wsm.getBulkChunkSize()]]
+
+    def __getRequestCount(self):
+        """
+        Get the number of Observation requests the wsm made so far
+        :return: number of requests
+        """
+        return self.__wsm.getRequestStats().get("Observation", {}).get("requests", 0)
+
+    def polled(self, patient_id, timestamps, now=None):
+        """
+        Record the poll of a patient, updating their cadence from the times of their readings and the time until
+        their next poll
+        :param patient_id: ID of the patient
+        :param timestamps: times of the patient's readings after the poll, in seconds since the epoch, in any order
+        :param now: time.time() of the poll, now if None
+        :return: None
+        """
+        now = time.time() if now is None else now
+        with self.__lock:
+            latest = self.__latest.get(patient_id)
+            new = sorted(timestamp for timestamp in timestamps if latest is None or timestamp > latest)
+            previous = latest
+            for timestamp in new:
+                if previous is not None and timestamp > previous:
+                    gap = timestamp - previous
+                    cadence = self.__cadence.get(patient_id)
+                    self.__cadence[patient_id] = gap if cadence is None else \
+                        self.__smoothing * gap + (1 - self.__smoothing) * cadence
+                previous = timestamp
+            if new:
+                self.__latest[patient_id] = new[-1]
+            if new and latest is not None:
+                self.__idlePolls[patient_id] = 0
+            else:  # the first poll only reads the history, so it does not count as finding something new
+                self.__idlePolls[patient_id] = self.__idlePolls.get(patient_id, -1) + 1
+            self.__lastPoll[patient_id] = now
+            self.__period[patient_id] = self.__getPeriod(patient_id)
+
+    def __getPeriod(self, patient_id):
+        """
+        Compute the time between the polls of a patient whose alert is not raised
+        :param patient_id: ID of the patient
+        :return: seconds
+        """
+        # past 64 idle polls the period is long capped, and the power would overflow after many more
+        period = self.__interval * self.__backoff ** min(self.__idlePolls.get(patient_id, 0), 64)
+        cadence = self.__cadence.get(patient_id)
+        if cadence is not None:
+            period = min(period, max(self.__interval, cadence * self.__cadenceFraction))
+        return max(self.__interval, min(period, self.__maxInterval))
+
+    def __forget(self, patient_ids):
+        """
+        Drop the patients no longer monitored, so a patient monitored again starts afresh
+        :param patient_ids: IDs of the patients still monitored
+        :return: None
+        """
+        kept = set(patient_ids)
+        if any(patient_id not in kept for patient_id in self.__lastPoll):
+            for state in (self.__lastPoll, self.__period, self.__idlePolls, self.__latest, self.__cadence):
+                for patient_id in [patient_id for patient_id in state if patient_id not in kept]:
+                    del state[patient_id]
@@ -0,0 +1,262 @@
+from bisect import bisect_left, bisect_right
+
+
+class SortedIndex:
+    """
+    Patient IDs kept sorted by value, so the patients above or below a value are found by bisection
+    """
+
+    def __init__(self):
+        self.__values = []  # sorted values
+        self.__ids = []  # patient ID of each value
+
+    def add(self, patient_id, value):
+        """
+        Add a patient to the index
+        :param patient_id: ID of the patient
+        :param value: the value the patient is sorted by
+        :return: None
+        """
+        position = bisect_right(self.__values, value)
+        self.__values.insert(position, value)
+        self.__ids.insert(position, patient_id)
+
+    def remove(self, patient_id, value):
+        """
+        Remove a patient from the index
+        :param patient_id: ID of the patient
+        :param value: the value the patient was added with
+        :return: None
+        """
+        position = bisect_left(self.__values, value)
+        while self.__ids[position] != patient_id:  # patients with the same value are next to each other
+            position += 1
+        del self.__values[position]
+        del self.__ids[position]
+
+    def getAbove(self, value):
+        """
+        Get the patients with a value strictly above a given one, in O(log N + k)
+        :param value: the value compared to
+        :return: list of patient IDs, lowest value first
+        """
+        return self.__ids[bisect_right(self.__values, value):]
+
+    def getAtMost(self, value):
+        """
+        Get the patients with a value lower than or equal to a given one, in O(log N + k)
+        :param value: the value compared to
+        :return: list of patient IDs, lowest value first
+        """
+        return self.__ids[:bisect_right(self.__values, value)]
+
+    def __len__(self):
+        return len(self.__ids)
+
+
+class AlertEngine:
+
+    def __init__(self, threshold=None, hysteresis=0):
+        """
+        Constructor for the alerts raised on the latest values of monitored patients. A patient's alert is raised when
+        their value goes above the threshold, and only cleared once it is back at or below threshold - hysteresis, so
+        values hovering around the threshold do not keep raising and clearing it. Patients are kept in sorted indexes,
+        split by alert state, so changing the threshold only visits the patients whose state changes
+        :param threshold: Value above which alerts are raised, or None to raise none
+        :param hysteresis: How far below the threshold a value must go to clear an alert
+        """
+        self.__threshold = threshold
+        self.__hysteresis = hysteresis
+        self.__values = dict()  # patient ID to latest value
+        self.__index = SortedIndex()  # every patient with a value
+        self.__raised = SortedIndex()  # patients whose alert is raised
+        self.__quiet = SortedIndex()  # patients whose alert is not raised
+        self.__raisedIds = set()  # patients whose alert is raised, for constant time lookups
+        # copy of raisedIds replaced after each change, so other threads can read it while the engine is changed
+        self.__raisedSnapshot = frozenset()
+        self.__listeners = []
+        self.__changed = dict()  # patient ID to alert state before the changes not yet notified
+
+    def addListener(self, listener):
+        """
+        Register a function called when the alert state of a patient changes
+        :param listener: function taking the patient ID, True if the alert was raised or False if it was cleared, and
+        the latest value of the patient or None if the patient was removed
+        :return: None
+        """
+        self.__listeners.append(listener)
+
+    def removeListener(self, listener):
+        """
+        Unregister a function registered with addListener
+        :param listener: the function
+        :return: None
+        """
+        self.__listeners.remove(listener)
+
+    def getThreshold(self):
+        """
+        Get the value above which alerts are raised
+        :return: the threshold, or None if no alert is raised
+        """
+        return self.__threshold
+
+    def getHysteresis(self):
+        """
+        Get how far below the threshold a value must go to clear an alert
+        :return: the hysteresis
+        """
+        return self.__hysteresis
+
+    def isRaised(self, patient_id):
+        """
+        Checks if the alert of a patient is raised
+        :param patient_id: ID of the patient
+        :return: True if the alert is raised, False otherwise
+        """
+        return patient_id in self.__raisedIds
+
+    def getRaised(self):
+        """
+        Get the patients whose alert is raised
+        :return: list of patient IDs, lowest value first
+        """
+        return self.__raised.getAbove(float("-inf"))
+
+    def getRaisedSnapshot(self):
+        """
+        Get the patients whose alert is raised, safe to read from a thread other than the one changing the engine
+        :return: frozenset of patient IDs, as they were after the last change
+        """
+        return self.__raisedSnapshot
+
+    def getPatientsAbove(self, value):
+        """
+        Get the patients whose latest value is above a given one, whatever their alert state, in O(log N + k)
+        :param value: the value compared to
+        :return: list of patient IDs, lowest value first
+        """
+        return self.__index.getAbove(value)
+
+    def update(self, patient_id, value):
+        """
+        Set the latest value of a patient, adding the patient if needed, and notify listeners if their alert changes
+        :param patient_id: ID of the patient
+        :param value: the latest value, or None to remove the patient
+        :return: None
+        """
+        self.apply({patient_id: value})
+
+    def remove(self, patient_id):
+        """
+        Remove a patient, clearing their alert if it was raised
+        :param patient_id: ID of the patient
+        :return: None
+        """
+        self.apply({patient_id: None})
+
+    def setThreshold(self, threshold):
+        """
+        Change the threshold. Only the patients whose alert changes are visited
+        :param threshold: Value above which alerts are raised, or None to raise none
+        :return: None
+        """
+        self.apply({}, threshold)
+
+    def apply(self, values, threshold=False):
+        """
+        Set the latest values of many patients and optionally the threshold at once. Listeners are notified once all
+        the changes are made, and only for patients whose alert state differs from before the call
+        :param values: map of patient ID to latest value, or to None to remove the patient
+        :param threshold: new threshold, or False to keep the current one
+        :return: None
+        """
+        for patient_id, value in values.items():
+            self.__setValue(patient_id, value)
+        if threshold is not False and threshold != self.__threshold:
+            self.__threshold = threshold
+            if threshold is None:
+                for patient_id in self.__raised.getAbove(float("-inf")):
+                    self.__setRaised(patient_id, False)
+            else:
+                for patient_id in self.__quiet.getAbove(threshold):
+                    self.__setRaised(patient_id, True)
+                for patient_id in self.__raised.getAtMost(threshold - self.__hysteresis):
+                    self.__setRaised(patient_id, False)
+        if self.__changed:
+            self.__raisedSnapshot = frozenset(self.__raisedIds)
+        self.__notify()
+
+    def __setValue(self, patient_id, value):
+        """
+        Set the latest value of a patient in the indexes, raising or clearing their alert as the value requires
+        :param patient_id: ID of the patient
+        :param value: the latest value, or None to remove the patient
+        :return: None
+        """
+        raised = patient_id in self.__raisedIds
+        if patient_id in self.__values:
+            old = self.__values.pop(patient_id)
+            self.__index.remove(patient_id, old)
+            (self.__raised if raised else self.__quiet).remove(patient_id, old)
+        if value is None:
+            if raised:
+                self.__record(patient_id)
+                self.__raisedIds.discard(patient_id)
+            return
+
+        if self.__threshold is None:
+            now_raised = False
+        elif raised:
+            now_raised = value > self.__threshold - self.__hysteresis
+        else:
+            now_raised = value > self.__threshold
+        self.__values[patient_id] = value
+        self.__index.add(patient_id, value)
+        (self.__raised if now_raised else self.__quiet).add(patient_id, value)
+        if now_raised != raised:
+            self.__record(patient_id)
+            if now_raised:
+                self.__raisedIds.add(patient_id)
+            else:
+                self.__raisedIds.discard(patient_id)
+
+    def __setRaised(self, patient_id, raised):
+        """
+        Move a patient to the index of their new alert state
+        :param patient_id: ID of the patient
+        :param raised: True to raise the alert, False to clear it
+        :return: None
+        """
+        value = self.__values[patient_id]
+        self.__record(patient_id)
+        if raised:
+            self.__quiet.remove(patient_id, value)
+            self.__raised.add(patient_id, value)
+            self.__raisedIds.add(patient_id)
+        else:
+            self.__raised.remove(patient_id, value)
+            self.__quiet.add(patient_id, value)
+            self.__raisedIds.discard(patient_id)
+
+    def __record(self, patient_id):
+        """
+        Remember the alert state of a patient before it changes, so listeners are only told about the final change
+        :param patient_id: ID of the patient
+        :return: None
+        """
+        if patient_id not in self.__changed:
+            self.__changed[patient_id] = patient_id in self.__raisedIds
+
+    def __notify(self):
+        """
+        Notify the listeners of the patients whose alert state changed since the last notification
+        :return: None
+        """
+        changed = self.__changed
+        self.__changed = dict()
+        for patient_id, was_raised in changed.items():
+            raised = patient_id in self.__raisedIds
+            if raised != was_raised:
+                for listener in self.__listeners:
+                    listener(patient_id, raised, self.__values.get(patient_id))
@@ -2,7 +2,7 @@ from .Encounter import Encounter
 
 
 class CholesterolEncounter(Encounter):
-
+    __slots__ = ("__cholesterol",)
 
     def __init__(self, date_time, cholesterol):
         """
@@ -2,7 +2,7 @@ from .Encounter import Encounter
 
 
 class DiastolicEncounter(Encounter):
-
+    __slots__ = ("__diastolic",)
 
     def __init__(self, date_time, diastolic):
         """
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 
 
 class Encounter(ABC):
+    __slots__ = ("__dateTime",)  # Encounters are never modified, so they can be shared instead of copied
 
     def __init__(self, date_time):
         self.__dateTime = date_time
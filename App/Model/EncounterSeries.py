@@ -0,0 +1,259 @@
+import datetime
+from array import array
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class EncounterSeries(Sequence):
+    """
+    Compact store of one patient's Encounters of one type. Readings are kept in a ring buffer of typed arrays (epoch
+    timestamp, UTC offset and value) instead of one object each, and Encounters are only built when read. The buffer
+    grows as readings are added, up to the capacity, so a long window only costs memory once it is filled.
+    """
+    __slots__ = ("__encounterClass", "__capacity", "__window", "__times", "__offsets", "__values", "__start",
+                 "__size")
+    __initialSlots = 16
+
+    def __init__(self, encounterClass, capacity, window=None):
+        """
+        Constructor for an empty series
+        :param encounterClass: Encounter subclass built when a reading is read, e.g. CholesterolEncounter
+        :param capacity: Maximum number of readings kept; appending to a full series drops the oldest one
+        :param window: Optional number of seconds; readings older than this before the latest one are dropped
+        """
+        self.__encounterClass = encounterClass
+        self.__capacity = max(1, capacity)
+        self.__window = window
+        slots = min(self.__capacity, self.__initialSlots)
+        self.__times = array('d', bytes(8 * slots))  # seconds since the epoch
+        self.__offsets = array('h', bytes(2 * slots))  # UTC offset of the original datetime in minutes
+        self.__values = array('d', bytes(8 * slots))
+        self.__start = 0  # slot of the oldest reading
+        self.__size = 0
+
+    @classmethod
+    def fromEncounters(cls, encounters, capacity, window=None):
+        """
+        Create a series holding a list of Encounters
+        :param encounters: List of Encounters of one type, latest first
+        :param capacity: Maximum number of readings kept
+        :param window: Optional number of seconds of readings kept before the latest one
+        :return: EncounterSeries with the latest capacity Encounters, or None if encounters is empty
+        """
+        if not encounters:
+            return None
+        series = cls(type(encounters[0]), capacity, window)
+        series.merge(encounters)
+        return series
+
+    def copy(self):
+        """
+        Get an independent copy of the series, so it can be changed while readers keep the original
+        :return: EncounterSeries with the same readings
+        """
+        series = EncounterSeries(self.__encounterClass, self.__capacity, self.__window)
+        series.__times = array('d', self.__times)
+        series.__offsets = array('h', self.__offsets)
+        series.__values = array('d', self.__values)
+        series.__start = self.__start
+        series.__size = self.__size
+        return series
+
+    def getCapacity(self):
+        """
+        Get the maximum number of readings kept
+        :return: capacity of the series
+        """
+        return self.__capacity
+
+    def getWindow(self):
+        """
+        Get the number of seconds of readings kept before the latest one
+        :return: window in seconds, or None if readings are only limited by the capacity
+        """
+        return self.__window
+
+    def getTimestamp(self, n):
+        """
+        Get the time of the nth latest reading without building an Encounter
+        :param n: The reading number, n=0 refers to the latest reading
+        :return: seconds since the epoch
+        """
+        return self.__times[self.__slot(n)]
+
+    def getRawValue(self, n):
+        """
+        Get the value of the nth latest reading without building an Encounter
+        :param n: The reading number, n=0 refers to the latest reading
+        :return: the value as a float
+        """
+        return self.__values[self.__slot(n)]
+
+    def append(self, date_time, value):
+        """
+        Add a reading newer than all the others, dropping the oldest one if the series is full
+        :param date_time: Date and time of the reading in ISO 8601 string format
+        :param value: the measurement
+        :return: None
+        """
+        timestamp, offset = self.__parseDateTime(date_time)
+        self.__appendRaw(timestamp, offset, value)
+
+    def merge(self, encounters):
+        """
+        Merge Encounters into the series. A reading at the same time as a kept one replaces it
+        :param encounters: List of Encounters, latest first
+        :return: True if the readings in the series changed, False otherwise
+        """
+        readings = [self.__parseDateTime(encounter.getDateTime()) + (encounter.getValue(),)
+                    for encounter in reversed(encounters)]
+        if not readings:
+            return False
+        latest = self.__times[self.__slot(0)] if self.__size else None
+        if latest is None or (readings[0][0] > latest and
+                              all(readings[i][0] < readings[i + 1][0] for i in range(len(readings) - 1))):
+            for timestamp, offset, value in readings:  # common case: only newer readings, append them in order
+                self.__appendRaw(timestamp, offset, value)
+            return True
+
+        merged = {}
+        for n in range(self.__size - 1, -1, -1):
+            slot = self.__slot(n)
+            merged[self.__times[slot]] = (self.__offsets[slot], self.__values[slot])
+        before = dict(merged)
+        for timestamp, offset, value in readings:
+            merged[timestamp] = (offset, float(value))
+        kept = sorted(merged)[-self.__capacity:]
+        if self.__window is not None:
+            kept = [timestamp for timestamp in kept if timestamp >= kept[-1] - self.__window]
+        if [(timestamp, merged[timestamp]) for timestamp in kept] == \
+                [(timestamp, before[timestamp]) for timestamp in sorted(before)]:
+            return False
+        self.__start = 0
+        self.__size = 0
+        for timestamp in kept:
+            self.__appendRaw(timestamp, *merged[timestamp])
+        return True
+
+    def downsample(self, buckets):
+        """
+        Summarise the readings in buckets of equal duration, e.g. to plot a long history without drawing every reading
+        :param buckets: Maximum number of buckets
+        :return: NumPy arrays of the mean time (seconds since the epoch), lowest, highest and mean value of each
+        bucket holding readings, oldest first. With no more readings than buckets, each reading is its own bucket
+        """
+        order = (self.__start + np.arange(self.__size)) % len(self.__times)
+        times = np.frombuffer(self.__times, dtype=np.float64)[order]
+        values = np.frombuffer(self.__values, dtype=np.float64)[order]
+        if self.__size <= buckets:
+            return times, values, values, values
+        edges = np.linspace(times[0], times[-1], buckets + 1)
+        bucket = np.minimum(np.searchsorted(edges, times, side='right') - 1, buckets - 1)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])  # first reading of each bucket, in time order
+        counts = np.diff(np.r_[starts, self.__size])
+        return (np.add.reduceat(times, starts) / counts, np.minimum.reduceat(values, starts),
+                np.maximum.reduceat(values, starts), np.add.reduceat(values, starts) / counts)
+
+    def __appendRaw(self, timestamp, offset, value):
+        """
+        Write a reading into the next slot of the ring buffer
+        :param timestamp: seconds since the epoch
+        :param offset: UTC offset in minutes
+        :param value: the measurement
+        :return: None
+        """
+        if self.__size == len(self.__times) < self.__capacity:
+            self.__grow()
+        if self.__size < len(self.__times):
+            slot = (self.__start + self.__size) % len(self.__times)
+            self.__size += 1
+        else:
+            slot = self.__start
+            self.__start = (self.__start + 1) % len(self.__times)
+        self.__times[slot] = timestamp
+        self.__offsets[slot] = offset
+        self.__values[slot] = value
+        if self.__window is not None:
+            while self.__times[self.__start] < timestamp - self.__window:  # drop readings out of the window
+                self.__start = (self.__start + 1) % len(self.__times)
+                self.__size -= 1
+
+    def __grow(self):
+        """
+        Double the number of slots of the full ring buffer, up to the capacity, moving the oldest reading to slot 0
+        :return: None
+        """
+        slots = min(self.__capacity, 2 * len(self.__times))
+        self.__times = self.__unroll(self.__times, slots)
+        self.__offsets = self.__unroll(self.__offsets, slots)
+        self.__values = self.__unroll(self.__values, slots)
+        self.__start = 0
+
+    def __unroll(self, slotValues, slots):
+        """
+        Copy one array of the full ring buffer, oldest reading first, into a larger one
+        :param slotValues: array of the ring buffer
+        :param slots: number of slots of the new array
+        :return: the new array
+        """
+        unrolled = slotValues[self.__start:] + slotValues[:self.__start]
+        unrolled.extend(array(slotValues.typecode, bytes(slotValues.itemsize * (slots - len(slotValues)))))
+        return unrolled
+
+    def __slot(self, n):
+        """
+        Find the slot of the ring buffer holding the nth latest reading
+        :param n: The reading number, n=0 refers to the latest reading; negative n counts from the oldest
+        :return: index into the arrays
+        """
+        if n < 0:
+            n += self.__size
+        if not 0 <= n < self.__size:
+            raise IndexError("EncounterSeries index out of range")
+        return (self.__start + self.__size - 1 - n) % len(self.__times)
+
+    def __parseDateTime(self, date_time):
+        """
+        Convert an ISO 8601 datetime string to an epoch timestamp and UTC offset
+        :param date_time: datetime string such as "2020-05-01T10:00:00.000+10:00"; one without offset is taken as UTC
+        :return: seconds since the epoch, and the UTC offset in minutes
+        """
+        parsed = datetime.datetime.fromisoformat(date_time.replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return parsed.timestamp(), int(parsed.utcoffset().total_seconds() // 60)
+
+    def __len__(self):
+        return self.__size
+
+    def __eq__(self, other):
+        """
+        Two series are equal if they hold the same readings, whatever their capacity
+        :param other: the object compared to
+        :return: True if other is an EncounterSeries with the same times and values
+        """
+        if not isinstance(other, EncounterSeries):
+            return NotImplemented
+        if len(self) != len(other):
+            return False
+        return all(self.getTimestamp(n) == other.getTimestamp(n) and self.getRawValue(n) == other.getRawValue(n)
+                   for n in range(len(self)))
+
+    __hash__ = None
+
+    def __getitem__(self, n):
+        """
+        Get the nth latest reading as an Encounter, built on demand
+        :param n: The reading number (n=0 refers to the latest reading), or a slice of reading numbers
+        :return: Encounter subclass of the series, or a list of them for a slice
+        """
+        if isinstance(n, slice):
+            return [self[i] for i in range(*n.indices(self.__size))]
+        slot = self.__slot(n)
+        timezone = datetime.timezone(datetime.timedelta(minutes=self.__offsets[slot]))
+        date_time = datetime.datetime.fromtimestamp(self.__times[slot], timezone).isoformat(timespec='milliseconds')
+        value = self.__values[slot]
+        if value.is_integer():  # values are stored as floats; give back whole numbers as the server sent them
+            value = int(value)
+        return self.__encounterClass(date_time, value)
@@ -0,0 +1,44 @@
+class EventBus:
+    """
+    Publishes the changes of the model to the parts of the app that show them, so they only redraw what changed
+    instead of polling the model. Handlers are called synchronously, on the thread that made the change.
+    """
+    PATIENT_ADDED = "patientAdded"
+    PATIENT_REMOVED = "patientRemoved"
+    ENCOUNTER_CHANGED = "encounterChanged"
+    THRESHOLD_CHANGED = "thresholdChanged"
+
+    def __init__(self):
+        self.__handlers = dict()  # event type to list of handlers
+
+    def subscribe(self, eventType, handler):
+        """
+        Register a function called for every event of a type
+        :param eventType: the type of event, e.g. EventBus.PATIENT_ADDED
+        :param handler: function taking the event type, the object that changed (e.g. a MonitoringList) and the list
+        of IDs of the patients concerned, which is empty for THRESHOLD_CHANGED
+        :return: None
+        """
+        self.__handlers.setdefault(eventType, []).append(handler)
+
+    def unsubscribe(self, eventType, handler):
+        """
+        Unregister a function registered with subscribe
+        :param eventType: the type of event
+        :param handler: the function
+        :return: None
+        """
+        handlers = self.__handlers.get(eventType, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    def publish(self, eventType, source, patient_ids=()):
+        """
+        Call the handlers of an event type
+        :param eventType: the type of event
+        :param source: the object that changed
+        :param patient_ids: IDs of the patients concerned
+        :return: None
+        """
+        for handler in list(self.__handlers.get(eventType, ())):
+            handler(eventType, source, list(patient_ids))
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class HttpCacheEntry:
+    __slots__ = ("etag", "lastModified", "data", "parsed", "storedAt")
+
+    def __init__(self, etag, lastModified, data):
+        """
+        Constructor for a cached response
+        :param etag: ETag header of the response, or None
+        :param lastModified: Last-Modified header of the response, or None
+        :param data: Body of the response as a dictionary
+        """
+        self.etag = etag
+        self.lastModified = lastModified
+        self.data = data
+        self.parsed = {}  # Key of a parser to its result for data, kept so a revalidated response is not parsed again
+        self.storedAt = time.monotonic()
+
+
+class HttpCache:
+
+    def __init__(self, maxSize=512, ttl=3600):
+        """
+        Constructor for a bounded LRU cache of server responses, keyed by url
+        :param maxSize: Maximum number of urls kept; the least recently used is dropped first
+        :param ttl: Seconds after which an entry is dropped even if the server would still revalidate it
+        """
+        self.__maxSize = maxSize
+        self.__ttl = ttl
+        self.__entries = OrderedDict()  # url to HttpCacheEntry, least recently used first
+        self.__lock = threading.Lock()
+
+    def get(self, url):
+        """
+        Get the cached response of an url and mark it as recently used
+        :param url: the url requested
+        :return: the HttpCacheEntry, or None if the url is not cached or its entry expired
+        """
+        with self.__lock:
+            entry = self.__entries.get(url)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.storedAt > self.__ttl:
+                del self.__entries[url]
+                return None
+            self.__entries.move_to_end(url)
+            return entry
+
+    def store(self, url, etag, lastModified, data):
+        """
+        Cache a response that carries validators, replacing any previous response of the url
+        :param url: the url requested
+        :param etag: ETag header of the response, or None
+        :param lastModified: Last-Modified header of the response, or None
+        :param data: Body of the response as a dictionary
+        :return: the new HttpCacheEntry
+        """
+        entry = HttpCacheEntry(etag, lastModified, data)
+        with self.__lock:
+            self.__entries[url] = entry
+            self.__entries.move_to_end(url)
+            while len(self.__entries) > self.__maxSize:
+                self.__entries.popitem(last=False)
+        return entry
+
+    def revalidated(self, entry):
+        """
+        Restart the time to live of an entry the server confirmed is still current
+        :param entry: the HttpCacheEntry revalidated
+        :return: None
+        """
+        entry.storedAt = time.monotonic()
+
+    def clear(self):
+        """
+        Drop every cached response
+        :return: None
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
@@ -0,0 +1,211 @@
+import json
+import sqlite3
+import threading
+import time
+from .CholesterolEncounter import CholesterolEncounter
+from .DiastolicEncounter import DiastolicEncounter
+from .Patient import Patient
+from .SystolicEncounter import SystolicEncounter
+
+
+class LocalStore:
+    __schema = """
+        CREATE TABLE IF NOT EXISTS practitioner (
+            id TEXT PRIMARY KEY, identifier TEXT NOT NULL, fetchedAt REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS roster (
+            practitionerId TEXT NOT NULL, position INTEGER NOT NULL, patientId TEXT NOT NULL,
+            PRIMARY KEY (practitionerId, position));
+        CREATE TABLE IF NOT EXISTS patient (
+            id TEXT PRIMARY KEY, fname TEXT, lname TEXT, birthdate TEXT, gender TEXT, street TEXT, city TEXT,
+            state TEXT, country TEXT, fetchedAt REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS history (
+            patientId TEXT NOT NULL, type TEXT NOT NULL, fetchedAt REAL NOT NULL, PRIMARY KEY (patientId, type));
+        CREATE TABLE IF NOT EXISTS encounter (
+            patientId TEXT NOT NULL, type TEXT NOT NULL, position INTEGER NOT NULL, dateTime TEXT NOT NULL,
+            value REAL NOT NULL, PRIMARY KEY (patientId, type, position));
+        CREATE TABLE IF NOT EXISTS session (
+            practitionerId TEXT PRIMARY KEY, data TEXT NOT NULL, savedAt REAL NOT NULL);
+    """
+    __encounterClasses = {"cholesterol": CholesterolEncounter,
+                          "systolic": SystolicEncounter,
+                          "diastolic": DiastolicEncounter}
+
+    def __init__(self, path, maxAge=7 * 24 * 3600):
+        """
+        Constructor for the on-disk cache of practitioners, patients and their Encounters, kept in an SQLite database
+        so a restart can show the last known data before the server answers
+        :param path: Path of the database file, created if missing, or ":memory:" for a cache that is not kept
+        :param maxAge: Seconds after which stored data is ignored instead of being shown
+        """
+        self.__maxAge = maxAge
+        # Used from the Tk thread and from worker threads, one at a time
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        # Set by close. A login or fetch still running on a worker thread may finish after the window is closed, so
+        # the store then ignores it instead of raising sqlite3.ProgrammingError
+        self.__closed = False
+        with self.__lock, self.__connection:
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            self.__connection.execute("PRAGMA synchronous=NORMAL")
+            self.__connection.executescript(self.__schema)
+
+    def close(self):
+        """
+        Close the database. Saves made afterwards are ignored and loads find nothing
+        :return: None
+        """
+        with self.__lock:
+            self.__closed = True
+            self.__connection.close()
+
+    def __getOldest(self):
+        """
+        Get the oldest time at which stored data is still shown
+        :return: seconds since the epoch
+        """
+        return time.time() - self.__maxAge
+
+    def loadIdentifier(self, pracId):
+        """
+        Get the stored url of all encounters of a practitioner
+        :param pracId: Practitioner's ID
+        :return: the url, or None if it is not stored or too old
+        """
+        with self.__lock:
+            if self.__closed:
+                return None
+            row = self.__connection.execute("SELECT identifier FROM practitioner WHERE id = ? AND fetchedAt >= ?",
+                                            (pracId, self.__getOldest())).fetchone()
+        return row[0] if row else None
+
+    def saveIdentifier(self, pracId, identifier):
+        """
+        Store the url of all encounters of a practitioner
+        :param pracId: Practitioner's ID
+        :param identifier: the url returned by WebServiceManager.fetchPractitionerIdentifier
+        :return: None
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+            with self.__connection:
+                self.__connection.execute("INSERT OR REPLACE INTO practitioner VALUES (?, ?, ?)",
+                                          (pracId, identifier, time.time()))
+
+    def loadRoster(self, pracId):
+        """
+        Get the stored patients of a practitioner
+        :param pracId: Practitioner's ID
+        :return: list of Patients without Encounters, in the order they were stored; empty if the roster is not stored
+        or too old
+        """
+        with self.__lock:
+            if self.__closed:
+                return []
+            rows = self.__connection.execute(
+                "SELECT patient.id, fname, lname, birthdate, gender, street, city, state, country "
+                "FROM roster JOIN practitioner ON practitioner.id = roster.practitionerId "
+                "JOIN patient ON patient.id = roster.patientId "
+                "WHERE roster.practitionerId = ? AND practitioner.fetchedAt >= ? ORDER BY position",
+                (pracId, self.__getOldest())).fetchall()
+        return [Patient(*row) for row in rows]
+
+    def saveRoster(self, pracId, patients):
+        """
+        Store the patients of a practitioner, replacing the ones stored before
+        :param pracId: Practitioner's ID
+        :param patients: iterable of Patients, in display order
+        :return: None
+        """
+        now = time.time()
+        patients = list(patients)
+        with self.__lock:
+            if self.__closed:
+                return
+            with self.__connection:
+                self.__connection.executemany("INSERT OR REPLACE INTO patient VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                              [patient.getDetails() + (now,) for patient in patients])
+                self.__connection.execute("DELETE FROM roster WHERE practitionerId = ?", (pracId,))
+                self.__connection.executemany("INSERT INTO roster VALUES (?, ?, ?)",
+                                              [(pracId, position, patient.getId())
+                                               for position, patient in enumerate(patients)])
+                self.__connection.execute("UPDATE practitioner SET fetchedAt = ? WHERE id = ?", (now, pracId))
+
+    def loadEncounters(self, patient_ids, encounterTypes, num):
+        """
+        Get the stored Encounters of several patients, in the form returned by WebServiceManager.fetchEncountersBulk
+        :param patient_ids: List of patient IDs
+        :param encounterTypes: List of encounter types, e.g. ["cholesterol", "systolic"]
+        :param num: Maximum number of Encounters per patient and type
+        :return: map of patient ID to a map of encounter type to the list of Encounters, latest first. Patients or
+        types without a stored history that is recent enough are left out
+        """
+        results = {}
+        with self.__lock:
+            if self.__closed:
+                return results
+            for patient_id in patient_ids:
+                for encounterType in encounterTypes:
+                    fresh = self.__connection.execute(
+                        "SELECT 1 FROM history WHERE patientId = ? AND type = ? AND fetchedAt >= ?",
+                        (patient_id, encounterType, self.__getOldest())).fetchone()
+                    if not fresh:
+                        continue
+                    rows = self.__connection.execute(
+                        "SELECT dateTime, value FROM encounter WHERE patientId = ? AND type = ? "
+                        "ORDER BY position LIMIT ?", (patient_id, encounterType, num)).fetchall()
+                    encounterClass = self.__encounterClasses[encounterType]
+                    results.setdefault(patient_id, {})[encounterType] = \
+                        [encounterClass(date_time, int(value) if value.is_integer() else value)
+                         for date_time, value in rows]
+        return results
+
+    def saveEncounters(self, histories):
+        """
+        Store the Encounters of several patients, replacing the history stored for each patient and type
+        :param histories: map of patient ID to a map of encounter type to the Encounters to keep, latest first
+        :return: None
+        """
+        now = time.time()
+        with self.__lock:
+            if self.__closed:
+                return
+            with self.__connection:
+                for patient_id, encountersByType in histories.items():
+                    for encounterType, encounters in encountersByType.items():
+                        self.__connection.execute("DELETE FROM encounter WHERE patientId = ? AND type = ?",
+                                                  (patient_id, encounterType))
+                        self.__connection.executemany(
+                            "INSERT INTO encounter VALUES (?, ?, ?, ?, ?)",
+                            [(patient_id, encounterType, position, encounter.getDateTime(), encounter.getValue())
+                             for position, encounter in enumerate(encounters or ())])
+                        self.__connection.execute("INSERT OR REPLACE INTO history VALUES (?, ?, ?)",
+                                                  (patient_id, encounterType, now))
+
+    def loadSession(self, pracId):
+        """
+        Get the session saved by the last run of a practitioner. Sessions do not expire, since they only hold choices
+        made by the practitioner
+        :param pracId: Practitioner's ID
+        :return: the map given to saveSession, or None if no session was saved
+        """
+        with self.__lock:
+            if self.__closed:
+                return None
+            row = self.__connection.execute("SELECT data FROM session WHERE practitionerId = ?",
+                                            (pracId,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def saveSession(self, pracId, session):
+        """
+        Save the session of a practitioner, replacing the one saved before
+        :param pracId: Practitioner's ID
+        :param session: map of settings that can be written as JSON, e.g. the monitored patient IDs
+        :return: None
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+            with self.__connection:
+                self.__connection.execute("INSERT OR REPLACE INTO session VALUES (?, ?, ?)",
+                                          (pracId, json.dumps(session), time.time()))
@@ -0,0 +1,271 @@
+import datetime
+import time
+from .MyExceptions import ServerException
+
+
+class MonitoringGroup:
+
+    def __init__(self, wsm, monitoringLists, store=None, poller=None):
+        self.__wsm = wsm
+        self.__store = store  # optional LocalStore keeping the Encounters of monitored patients between runs
+        self.__poller = poller  # optional AdaptivePoller picking the patients polled on each fetch
+        self.__monitoringLists = list(monitoringLists)  # MonitoringLists refreshed together
+        # patient id to the _lastUpdated of the newest Observation seen for them, so updates only fetch newer ones
+        self.__watermarks = dict()
+        self.__pushEndpoint = None  # url the server notifies of new Observations, or None to only poll
+        self.__subscriptionTtl = 3600
+        self.__subscriptionIds = []  # Subscriptions currently notifying pushEndpoint
+        self.__subscribedTo = None  # (patient ids, encounter types) the Subscriptions were made for
+        self.__subscriptionRenewal = 0  # time.time() after which the Subscriptions are made again
+        self.__pushError = None  # why the last attempt to make the Subscriptions failed, or None
+
+    def enablePush(self, endpoint, subscriptionTtl=3600):
+        """
+        Have the server push new Observations of the polled patients to an endpoint, through Subscriptions kept in
+        step with the polled patients by fetch. Polling carries on, as the fallback if the server refuses
+        Subscriptions or notifications get lost
+        :param endpoint: url the server sends notifications to, e.g. NotificationReceiver.getEndpoint()
+        :param subscriptionTtl: Seconds the Subscriptions last; they are renewed before they end, and ones left behind
+        by a crash end by themselves
+        :return: None
+        """
+        self.__pushEndpoint = endpoint
+        self.__subscriptionTtl = subscriptionTtl
+        self.__subscribedTo = None
+
+    def disablePush(self):
+        """
+        Delete the Subscriptions and go back to polling only
+        :return: None
+        """
+        self.__pushEndpoint = None
+        self.__subscribedTo = None
+        self.__pushError = None
+        subscription_ids, self.__subscriptionIds = self.__subscriptionIds, []
+        self.__wsm.deleteSubscriptions(subscription_ids)
+
+    def isPushActive(self):
+        """
+        Checks if the server was asked to push the new Observations of the polled patients
+        :return: True if Subscriptions are active, False if updates rely on polling only
+        """
+        return bool(self.__subscriptionIds)
+
+    def getPushError(self):
+        """
+        Get why the server could not be asked to push new Observations, while the group polls instead
+        :return: the ServerException of the last failed attempt, or None if it succeeded or push is disabled
+        """
+        return self.__pushError
+
+    def update(self):
+        """
+        Called every N seconds to update every MonitoringList in the group from one shared bulk fetch. Lists whose
+        measurements come from the same Observation (e.g. systolic and diastolic) therefore share one download, and
+        after the first update only Observations newer than the last one seen are fetched and merged.
+        :return: None
+        :postcondition: Every list in the group has been updated as by MonitoringList.update
+        """
+        self.apply(self.fetch())
+
+    def fetch(self):
+        """
+        Fetch the new measurements of every list in the group without changing the lists, so the download can run on
+        a worker thread while the lists are only changed by apply on the thread that owns them. With a poller, only
+        the patients it finds due are fetched
+        :return: The fetched data to pass to apply, or None if no patient needs updating
+        """
+        nums, start_dates, encounter_types = self.__getWanted(
+            [(monitoringList, monitoringList.getUpdatePatientIds()) for monitoringList in self.__monitoringLists])
+        if self.__pushEndpoint is not None:
+            self.__subscribe(list(nums), encounter_types)
+        if len(self.__watermarks) > len(nums):  # forget patients no longer monitored
+            self.__watermarks = {patient_id: watermark for patient_id, watermark in self.__watermarks.items()
+                                 if patient_id in nums}
+        if not nums:
+            return None
+
+        patient_ids = list(nums)
+        if self.__poller is not None:
+            # the alerts are changed on the thread applying the results, so their snapshot is read here
+            urgent_ids = set()
+            for monitoringList in self.__monitoringLists:
+                urgent_ids.update(monitoringList.getAlerts().getRaisedSnapshot())
+            patient_ids = self.__poller.takeDue(nums, urgent_ids)
+            if not patient_ids:
+                return None
+        # one search for all, from the oldest watermark; what some patients had already seen is merged away
+        watermarks = [self.__watermarks[patient_id] for patient_id in patient_ids if patient_id in self.__watermarks]
+        since = min(watermarks, key=self.__parseInstant) if watermarks else None
+        # readings before the window of a patient not polled yet are left out rather than paged through and dropped
+        results, watermark = self.__wsm.fetchEncountersSince(
+            patient_ids, encounter_types, {patient_id: nums[patient_id] for patient_id in patient_ids}, since,
+            {patient_id: start_dates[patient_id] for patient_id in patient_ids
+             if patient_id in start_dates and patient_id not in self.__watermarks})
+        return patient_ids, results, since, watermark
+
+    def __parseInstant(self, instant):
+        """
+        Read a FHIR instant
+        :param instant: an instant string such as "2020-05-01T10:00:00.000+10:00"
+        :return: the datetime
+        """
+        return datetime.datetime.fromisoformat(instant.replace('Z', '+00:00'))
+
+    def __getTimestamps(self, patient_id):
+        """
+        Get the times of the readings the lists hold for a patient, whatever their type
+        :param patient_id: ID of the patient
+        :return: set of seconds since the epoch
+        """
+        timestamps = set()
+        for monitoringList in self.__monitoringLists:
+            patient = monitoringList.returnPatients().get(patient_id)
+            encounters = patient.getEncounters() if patient else None
+            if encounters:
+                timestamps.update(encounters.getTimestamp(n) for n in range(len(encounters)))
+        return timestamps
+
+    def fetchPatients(self, monitored):
+        """
+        Fetch the Encounters of patients about to be added to lists of the group, e.g. when a session is restored,
+        with one bulk fetch asking for as many encounters of each type, from the same window start, as fetch does
+        :param monitored: list of (MonitoringList, IDs of the patients it is going to monitor)
+        :return: map of patient id to a map of encounter type to list of Encounters, latest first
+        """
+        nums, start_dates, encounter_types = self.__getWanted(monitored)
+        if not nums:
+            return {}
+        return self.__wsm.fetchEncountersBulk(list(nums), encounter_types, nums, start_dates)
+
+    def __getWanted(self, monitored):
+        """
+        Work out which encounters to fetch for the patients of some lists. Where lists share a patient and type, the
+        most encounters and the earliest window start are wanted
+        :param monitored: list of (MonitoringList, IDs of its patients to fetch)
+        :return: map of patient id to encounter type to the number of encounters, map of patient id to encounter type
+        to the window start before which they are not needed, and the list of encounter types
+        """
+        nums = dict()  # patient id to encounter type to the most encounters kept for them by a list
+        starts = dict()  # patient id to encounter type to the earliest window start of the lists keeping it
+        # (patient id, encounter type) kept by a list with no window and more than one encounter, which needs the
+        # older encounters too. A list keeping one encounter has it even if it is before the start
+        unbounded = set()
+        encounter_types = []
+        for monitoringList, patient_ids in monitored:
+            if patient_ids:
+                encounterType = monitoringList.getEncounterType()
+                windowStart = monitoringList.getWindowStart()
+                for patient_id in patient_ids:
+                    byType = nums.setdefault(patient_id, {})
+                    byType[encounterType] = max(byType.get(encounterType, 1), monitoringList.getNumHistoric())
+                    if windowStart is not None:
+                        startByType = starts.setdefault(patient_id, {})
+                        startByType[encounterType] = min(startByType.get(encounterType, windowStart), windowStart)
+                    elif monitoringList.getNumHistoric() > 1:
+                        unbounded.add((patient_id, encounterType))
+                if encounterType not in encounter_types:
+                    encounter_types.append(encounterType)
+        start_dates = {patient_id: {encounterType: start for encounterType, start in startByType.items()
+                                    if (patient_id, encounterType) not in unbounded}
+                       for patient_id, startByType in starts.items()}
+        return nums, start_dates, encounter_types
+
+    def __subscribe(self, patient_ids, encounter_types):
+        """
+        Make the Subscriptions again if the polled patients changed or they are about to end. The new ones are made
+        before the old ones are deleted, so no notification is missed in between
+        :param patient_ids: IDs of the polled patients
+        :param encounter_types: types of encounter polled
+        :return: None
+        """
+        subscribedTo = (frozenset(patient_ids), tuple(encounter_types))
+        if subscribedTo == self.__subscribedTo and time.time() < self.__subscriptionRenewal:
+            return
+        old_ids, self.__subscriptionIds = self.__subscriptionIds, []
+        self.__subscribedTo = subscribedTo
+        if patient_ids:
+            end = time.time() + self.__subscriptionTtl
+            try:
+                self.__subscriptionIds = self.__wsm.createSubscriptions(
+                    patient_ids, encounter_types, self.__pushEndpoint,
+                    datetime.datetime.fromtimestamp(end, datetime.timezone.utc).isoformat())
+                self.__subscriptionRenewal = end - self.__subscriptionTtl / 10
+                self.__pushError = None
+            except ServerException as e:
+                self.__pushError = e
+                self.__subscriptionRenewal = end  # try again later rather than on every tick
+        self.__wsm.deleteSubscriptions(old_ids)
+
+    def applyNotification(self, data):
+        """
+        Merge the Observations pushed by the server into every list in the group
+        :param data: the body of a notification from NotificationReceiver.iterNotifications
+        :return: True if the notification was applied, False if it was a ping without Observations, after which the
+        lists should be updated by polling
+        """
+        if data is None:
+            return False
+        encounter_types = list(dict.fromkeys(monitoringList.getEncounterType()
+                                             for monitoringList in self.__monitoringLists))
+        results = self.__wsm.parseNotification(data, encounter_types)
+        for monitoringList in self.__monitoringLists:
+            monitoringList.applyEncounters(results, True)
+        self.__saveChanged(results)
+        return True
+
+    def apply(self, fetched):
+        """
+        Update every list in the group from the data returned by fetch
+        :param fetched: The data returned by fetch
+        :return: None
+        """
+        if fetched is None:
+            return
+        patient_ids, results, since, watermark = fetched
+        for monitoringList in self.__monitoringLists:
+            monitoringList.applyEncounters(results, since is not None)
+        if watermark is not None:
+            for patient_id in patient_ids:
+                if patient_id not in self.__watermarks or \
+                        self.__parseInstant(watermark) > self.__parseInstant(self.__watermarks[patient_id]):
+                    self.__watermarks[patient_id] = watermark
+        if self.__poller is not None:
+            for patient_id in patient_ids:
+                self.__poller.polled(patient_id, self.__getTimestamps(patient_id))
+        self.__saveChanged(results)
+
+    def __saveChanged(self, results):
+        """
+        Save the Encounters of the patients that got new ones. Every polled patient has an entry in the results, so
+        saving them all would rewrite the whole store on every tick, even when nothing changed
+        :param results: map of patient id to a map of encounter type to list of new Encounters
+        :return: None
+        """
+        changed = {patient_id for patient_id, byType in results.items() if any(byType.values())}
+        if changed:
+            self.saveEncounters(changed)
+
+    def saveEncounters(self, patient_ids=None):
+        """
+        Save the Encounters the lists hold to the store. Where lists share an encounter type, the longest history of
+        each patient is kept
+        :param patient_ids: IDs of the patients to save, or None to save every monitored patient
+        :return: None
+        """
+        if self.__store is None:
+            return
+        histories = {}
+        for monitoringList in self.__monitoringLists:
+            encounterType = monitoringList.getEncounterType()
+            patients = monitoringList.returnPatients()
+            for patient_id in (patients if patient_ids is None else patient_ids):
+                patient = patients.get(patient_id)
+                if patient is None:
+                    continue
+                encounters = patient.getEncounters() or ()
+                byType = histories.setdefault(patient_id, {})
+                if len(encounters) >= len(byType.get(encounterType, ())):
+                    byType[encounterType] = encounters
+        if histories:
+            self.__store.saveEncounters(histories)
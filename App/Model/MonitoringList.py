@@ -1,29 +1,115 @@
-import copy
+import datetime
+from types import MappingProxyType
+from .AlertEngine import AlertEngine
+from .EncounterSeries import EncounterSeries
+from .EventBus import EventBus
+from .ValueStatistics import ValueStatistics
 from .WebServiceManager import WebServiceManager
 
 
 class MonitoringList():
 
-    def __init__(self, encounterType, wsm, threshold=-1, num=1):
-        self.__patients = dict()  # Patient ID to Patient instances
+    def __init__(self, encounterType, wsm, threshold=-1, num=1, window=None, hysteresis=0, eventBus=None):
+        # Patient ID to Patient instances. The dictionary is replaced rather than modified, so views handed out by
+        # returnPatients stay consistent snapshots
+        self.__patients = dict()
         self.__encounterType = encounterType  # String denoting type of measurement being monitored
-        self.__threshold = threshold
+        self.__threshold = threshold  # fixed threshold, also used by the other modes while no patient has a value
+        self.__thresholdMode = "fixed"
+        self.__thresholdParameter = None
+        self.__statistics = ValueStatistics()  # latest value of each patient having one
+        self.__alerts = AlertEngine(threshold, hysteresis)  # follows the threshold, whatever its mode
+        self.__eventBus = eventBus  # optional EventBus the changes of the list are published on
         self.__wsm = wsm
         self.__numHistoric = num
+        self.__window = window  # seconds of readings kept before the latest one, or None to keep num readings
+        self.__watermark = None  # _lastUpdated of the newest Observation seen, so updates only fetch newer ones
 
     def add(self, patient):
         """
         Add a Patient to be monitored and get their Encounter
         :param patient: The Patient to be added
         :return: True if patient was added, false otherwise
-        :postcondition: Patient is now being monitored and average has been updated if measurement was found
+        :postcondition: Patient is now being monitored and average has been updated if measurement was found; their
+        Encounters are kept in an EncounterSeries holding the latest numHistoric of them, within the window
         """
         patient_id = patient.getId()
         if patient_id not in self.__patients:
-            self.__patients[patient_id] = patient
+            patients = dict(self.__patients)
+            patients[patient_id] = self.__withSeries(patient)
+            self.__patients = patients
+            self.__track([patients[patient_id]])
+            self.__publish(EventBus.PATIENT_ADDED, [patient_id])
             return True
         return False
 
+    def addAll(self, patients, replace=False):
+        """
+        Add several Patients to be monitored at once, e.g. when restoring a session
+        :param patients: iterable of Patients, holding their Encounters
+        :param replace: True to replace patients already monitored, False to leave them unchanged
+        :return: None
+        :postcondition: Patients are now being monitored, each keeping their place if they already were
+        """
+        updated_patients = dict(self.__patients)
+        added = []
+        replaced = []
+        for patient in patients:
+            if replace or patient.getId() not in updated_patients:
+                if patient.getId() in updated_patients:
+                    replaced.append(patient.getId())
+                updated_patients[patient.getId()] = self.__withSeries(patient)
+                added.append(updated_patients[patient.getId()])
+        self.__patients = updated_patients
+        self.__track(added)
+        if len(added) > len(replaced):
+            self.__publish(EventBus.PATIENT_ADDED,
+                           [patient.getId() for patient in added if patient.getId() not in replaced])
+        if replaced:
+            self.__publish(EventBus.ENCOUNTER_CHANGED, replaced)
+
+    def __withSeries(self, patient):
+        """
+        Get the patient in the form kept by the list, with their Encounters in an EncounterSeries
+        :param patient: The Patient to be kept
+        :return: The Patient, or a copy of it holding the latest numHistoric of its Encounters in an EncounterSeries
+        """
+        encounters = patient.getEncounters()
+        if encounters and not isinstance(encounters, EncounterSeries):
+            patient = patient.withEncounters(EncounterSeries.fromEncounters(encounters, self.__numHistoric,
+                                                                            self.__window))
+        return patient
+
+    def __track(self, patients):
+        """
+        Keep the statistics and alerts up to date with the latest values of patients
+        :param patients: The Patients as kept by the list
+        :return: None
+        """
+        threshold = self.getThreshold()
+        values = dict()  # patient ID to latest value, or None if they have none
+        for patient in patients:
+            encounters = patient.getEncounters()
+            if encounters:
+                values[patient.getId()] = encounters.getRawValue(0)
+                self.__statistics.set(patient.getId(), values[patient.getId()])
+            else:
+                values[patient.getId()] = None
+                self.__statistics.remove(patient.getId())
+        self.__alerts.apply(values, self.getThreshold())
+        if self.getThreshold() != threshold:  # e.g. the mean of the values moved
+            self.__publish(EventBus.THRESHOLD_CHANGED)
+
+    def __publish(self, eventType, patient_ids=()):
+        """
+        Publish a change of the list on the event bus, if it has one
+        :param eventType: the type of event, e.g. EventBus.PATIENT_ADDED
+        :param patient_ids: IDs of the patients concerned
+        :return: None
+        """
+        if self.__eventBus is not None:
+            self.__eventBus.publish(eventType, self, patient_ids)
+
     def remove(self, patient_id):
         """
         Unmonitor a patient
@@ -32,7 +118,15 @@ class MonitoringList():
         :precondition: patient_id must correspond to a patient in self.__patients
         """
         if patient_id in self.__patients:
-            del self.__patients[patient_id]
+            patients = dict(self.__patients)
+            del patients[patient_id]
+            self.__patients = patients
+            threshold = self.getThreshold()
+            self.__statistics.remove(patient_id)
+            self.__alerts.apply({patient_id: None}, self.getThreshold())
+            self.__publish(EventBus.PATIENT_REMOVED, [patient_id])
+            if self.getThreshold() != threshold:
+                self.__publish(EventBus.THRESHOLD_CHANGED)
 
     def contains(self, patient_id):
         """
@@ -45,26 +139,72 @@ class MonitoringList():
     def returnPatients(self):
         """
         Get the patients being monitored
-        :return: Deep copy of the patients dictionary to prevent security leaks
+        :return: Read-only snapshot of the patients dictionary; later changes to the list do not affect it
         """
-        return copy.deepcopy(self.__patients)
+        return MappingProxyType(self.__patients)
 
     def update(self):
         """
         Called every N seconds to look for new measurements only for patients who had no measurements upon login
-        (as we were instructed). Updates the data based on these new measurements.
+        (as we were instructed). Updates the data based on these new measurements. All the patients are looked up
+        with a single bulk fetch, and after the first update only Observations newer than the last one seen are asked
+        for and merged into each patient's encounters.
         :return: None
         :postcondition: Patient measurements are all updated (excluding those who had no measurements upon login)
         """
-        patient_ids = list(self.__patients.keys())  # to avoid change of iterable size while updating
-        for patient_id in patient_ids:
-            if patient_id in self.__patients:
-                encounters = self.__patients[patient_id].getEncounters()
-                if encounters: # Only look for new encounter if encounter already exists
-                    latest_curr_encounter = encounters[0]
-                    new_encounters = self.__wsm.fetchEncounter(patient_id, self.__encounterType, self.__numHistoric)
-                    if new_encounters and new_encounters[0].getDateTime() != latest_curr_encounter.getDateTime(): # only update if recent encounter is different
-                        self.__patients[patient_id].updateEncounters(new_encounters)
+        patient_ids = self.getUpdatePatientIds()
+        if patient_ids:
+            results, watermark = self.__wsm.fetchEncountersSince(patient_ids, [self.__encounterType],
+                                                                 self.__numHistoric, self.__watermark)
+            self.applyEncounters(results, self.__watermark is not None)
+            self.__watermark = watermark
+
+    def getUpdatePatientIds(self):
+        """
+        Get the IDs of the patients whose measurements are looked for on update, i.e. those who already have one
+        :return: list of patient ids
+        """
+        patient_ids = []
+        for patient_id, patient in self.__patients.items():
+            if patient.getEncounters():  # Only look for new encounter if encounter already exists
+                patient_ids.append(patient_id)
+        return patient_ids
+
+    def applyEncounters(self, results, merge=False):
+        """
+        Update the monitored patients from the result of a bulk fetch, which may have been shared with other lists
+        :param results: map of patient id to a map of encounter type to list of Encounters, latest first
+        :param merge: True if results only hold new Encounters, to be merged into the ones already kept
+        :return: None
+        :postcondition: Patients with new measurements have their latest numHistoric encounters replaced
+        """
+        updated_patients = dict()
+        for patient_id, encounters_by_type in results.items():
+            if patient_id in self.__patients and self.__encounterType in encounters_by_type:
+                patient = self.__patients[patient_id]
+                encounters = patient.getEncounters()
+                new_encounters = encounters_by_type[self.__encounterType]
+                if encounters and new_encounters:
+                    if merge:
+                        series = encounters.copy()
+                        series.merge(new_encounters)
+                    else:
+                        series = EncounterSeries.fromEncounters(new_encounters, self.__numHistoric, self.__window)
+                    if series != encounters:  # only update if encounters are different
+                        updated_patients[patient_id] = patient.withEncounters(series)
+        if updated_patients:
+            patients = dict(self.__patients)
+            patients.update(updated_patients)
+            self.__patients = patients
+            self.__track(updated_patients.values())
+            self.__publish(EventBus.ENCOUNTER_CHANGED, updated_patients)
+
+    def getWatermark(self):
+        """
+        Get the _lastUpdated watermark of the newest Observation seen by update
+        :return: watermark string, or None before the first update
+        """
+        return self.__watermark
 
     def getPatientIds(self):
         """
@@ -86,20 +226,113 @@ class MonitoringList():
             if encounters and len(encounters) > n:
                 return encounters[n]
 
+    def getEncounterType(self):
+        """
+        Get the type of measurement being monitored
+        :return: String denoting type of measurement
+        """
+        return self.__encounterType
+
+    def getNumHistoric(self):
+        """
+        Get the number of historic encounters kept for each patient
+        :return: Number of historic encounters
+        """
+        return self.__numHistoric
+
+    def getWindow(self):
+        """
+        Get the number of seconds of readings kept for each patient before their latest one
+        :return: window in seconds, or None if only the number of historic encounters is limited
+        """
+        return self.__window
+
+    def getWindowStart(self):
+        """
+        Get the date from which readings of a newly added patient are fetched, so a long window is filled with one
+        fetch of the readings it keeps
+        :return: ISO 8601 datetime string, or None if the list has no window
+        """
+        if self.__window is None:
+            return None
+        start = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self.__window)
+        return start.isoformat(timespec='seconds')
+
     def getThreshold(self):
         """
-        Get threshold value (e.g. for highlighting high values)
-        :return: tTreshold value
+        Get threshold value (e.g. for highlighting high values), following the threshold mode
+        :return: tTreshold value; the fixed threshold if the mode is a statistic and no patient has a value
         """
-        return self.__threshold
+        if self.__thresholdMode == "fixed" or not self.__statistics.getCount():
+            return self.__threshold
+        if self.__thresholdMode == "mean":
+            return self.__statistics.getMean()
+        if self.__thresholdMode == "median":
+            return self.__statistics.getMedian()
+        if self.__thresholdMode == "percentile":
+            return self.__statistics.getPercentile(self.__thresholdParameter)
+        # zscore: values more than thresholdParameter standard deviations above the mean
+        return self.__statistics.getMean() + self.__thresholdParameter * self.__statistics.getStandardDeviation()
 
     def setThreshold(self, newThreshold):
         """
-        Set new threshold value
+        Set new threshold value, used by the fixed threshold mode
         :param newThreshold: New threshold value
         :return: None
         """
+        threshold = self.getThreshold()
         self.__threshold = newThreshold
+        self.__alerts.setThreshold(self.getThreshold())
+        if self.getThreshold() != threshold:
+            self.__publish(EventBus.THRESHOLD_CHANGED)
+
+    def getThresholdMode(self):
+        """
+        Get how the threshold is found
+        :return: the mode and its parameter, as passed to setThresholdMode
+        """
+        return self.__thresholdMode, self.__thresholdParameter
+
+    def setThresholdMode(self, mode, parameter=None):
+        """
+        Set how the threshold is found from the latest values of the monitored patients
+        :param mode: "fixed" for the value set by setThreshold, "mean", "median", "percentile" for the given
+        percentile of the values, or "zscore" for the mean plus the given number of standard deviations
+        :param parameter: the percentile (0 to 100) or the number of standard deviations; unused by other modes
+        :return: None
+        """
+        if mode not in ("fixed", "mean", "median", "percentile", "zscore"):
+            raise ValueError("Unknown threshold mode: {0}".format(mode))
+        if mode in ("percentile", "zscore") and parameter is None:
+            raise ValueError("Threshold mode {0} needs a parameter".format(mode))
+        threshold = self.getThreshold()
+        self.__thresholdMode = mode
+        self.__thresholdParameter = parameter
+        self.__alerts.setThreshold(self.getThreshold())
+        if self.getThreshold() != threshold:
+            self.__publish(EventBus.THRESHOLD_CHANGED)
+
+    def getEventBus(self):
+        """
+        Get the event bus the changes of the list are published on
+        :return: the EventBus, or None if changes are not published
+        """
+        return self.__eventBus
+
+    def getAlerts(self):
+        """
+        Get the alerts raised on the latest values of the monitored patients, which follow the threshold. Register a
+        listener on it to be told when the alert of a patient is raised or cleared
+        :return: AlertEngine of the list
+        """
+        return self.__alerts
+
+    def getStatistics(self):
+        """
+        Get the statistics of the latest values of the monitored patients, e.g. for z-scores
+        :return: ValueStatistics of the list, updated as patients and their values change
+        """
+        return self.__statistics
 
     def getNumPatients(self):
         """
@@ -3,3 +3,10 @@ class LoginException(Exception):
     Raised when Practitioner ID does not match an existing practitioner
     """
     pass
+
+
+class ServerException(Exception):
+    """
+    Raised when the FHIR server cannot be reached, times out, or keeps failing after retries
+    """
+    pass
@@ -1,7 +1,10 @@
 import copy
+from .EncounterSeries import EncounterSeries
 
 
 class Patient:
+    __slots__ = ("__id", "__fname", "__lname", "__birthdate", "__gender", "__street", "__city", "__state", "__country",
+                 "__encounters")
 
     def __init__(self, id, fname, lname, birthdate, gender, street, city, state, country):
         self.__id = id
@@ -13,15 +16,29 @@ class Patient:
         self.__city = city
         self.__state = state
         self.__country = country
-        self.__encounters = [] # Encounter instance of measurement to be monitored
+        self.__encounters = ()  # Encounters of measurement to be monitored, latest first, or their EncounterSeries
 
-    def updateEncounters(self, encounters):
+    def withEncounters(self, encounters):
         """
-        Replace or set current encounters with another (new) list of Encounters
-        :param encounters: List of Encounters
-        :return: None
+        Get a copy of the patient holding another list of Encounters. The patient itself is left unchanged, so it can
+        be shared with readers instead of being copied for each of them
+        :param encounters: List of Encounters, or an EncounterSeries
+        :return: New Patient with the same details and the given Encounters
         """
-        self.__encounters = encounters
+        patient = copy.copy(self)
+        patient.__encounters = self.__freeze(encounters)
+        return patient
+
+    def __freeze(self, encounters):
+        """
+        Get the form in which Encounters are kept: an EncounterSeries as is, since it is not changed once a patient
+        holds it, and any other list as a tuple
+        :param encounters: List of Encounters, an EncounterSeries, or None
+        :return: The EncounterSeries or tuple of Encounters
+        """
+        if isinstance(encounters, EncounterSeries):
+            return encounters
+        return tuple(encounters) if encounters else ()
 
     def getFullName(self):
         """
@@ -47,11 +64,20 @@ class Patient:
         """
         return self.__id
 
+    def getDetails(self):
+        """
+        Get the details of the patient, in the order taken by the constructor, e.g. to store them
+        :return: Tuple of ID, first and last names, birthdate, gender, street, city, state and country
+        """
+        return (self.__id, self.__fname, self.__lname, self.__birthdate, self.__gender, self.__street, self.__city,
+                self.__state, self.__country)
+
     def getEncounters(self):
         """
         Get the Encounters list in the patient
-        :return: Deep copy of the Encounter list to prevent security leaks
+        :return: Tuple or EncounterSeries of the Encounters, latest first, or None if there are none. It is never
+        modified, so it is shared rather than copied
         """
         if self.__encounters:
-            return copy.deepcopy(self.__encounters)
+            return self.__encounters
         return
@@ -1,31 +1,82 @@
 from .WebServiceManager import WebServiceManager
 from .MyExceptions import LoginException
-import copy
+from types import MappingProxyType
 
 
 class Practitioner:
 
-    def __init__(self, pracId, wsm):
+    def __init__(self, pracId, wsm, load=True, store=None):
+        """
+        Constructor for the logged in practitioner. With a store, the identifier and patients stored by the last login
+        are used straight away, without waiting for the server
+        :param pracId: Practitioner's ID
+        :param wsm: WebServiceManager instance for making calls to server
+        :param load: True to fetch all the patients straight away, False to fetch them later with loadPatients
+        :param store: optional LocalStore keeping the identifier and patients between runs
+        """
+        self.__pracId = pracId
         self.__wsm = wsm  # WebServiceManager instance for making calls to server
-        self.__identifier = self.__wsm.fetchPractitionerIdentifier(pracId)  # use the ID to get the identifier using wsm
+        self.__store = store
+        self.__identifier = store.loadIdentifier(pracId) if store else None
         if not self.__identifier:
-            raise LoginException
-        self.__patients = self.__wsm.fetchAllPatients(self.__identifier)  # use wsm to get all patients in a dictionary
+            self.__identifier = self.__wsm.fetchPractitionerIdentifier(pracId)  # use the ID to get the identifier
+            if not self.__identifier:
+                raise LoginException
+            if store:
+                store.saveIdentifier(pracId, self.__identifier)
+        # Patient ID to Patient instances, starting with the stored ones and filled as they arrive. Once a view has
+        # been handed out by returnPatients, the dictionary is copied before the next patient is added, so every view
+        # stays a consistent snapshot
+        self.__patients = {patient.getId(): patient for patient in store.loadRoster(pracId)} if store else dict()
+        self.__shared = False  # True while the current dictionary is seen through a view from returnPatients
+        if load:
+            for patient in self.loadPatients():
+                pass
+
+    def loadPatients(self):
+        """
+        This generator uses wsm to get all the patients, adding each one to the practitioner as it arrives. Once all
+        have arrived, they replace the patients known before, dropping stored ones the server no longer lists, and
+        are saved to the store
+        :return: generator of the Patients that were not known before
+        """
+        fetched = dict()
+        for patient in self.__wsm.iterAllPatients(self.__identifier):
+            fetched[patient.getId()] = patient
+            if patient.getId() not in self.__patients:
+                if self.__shared:
+                    self.__patients = dict(self.__patients)
+                    self.__shared = False
+                self.__patients[patient.getId()] = patient
+                yield patient
+        self.__patients = fetched  # replaced rather than changed, so views of the old roster stay valid
+        self.__shared = False
+        if self.__store:
+            self.__store.saveRoster(self.__pracId, fetched.values())
+
+    def getId(self):
+        """
+        Get the ID of the practitioner
+        :return: the practitioner's ID
+        """
+        return self.__pracId
 
     def returnPatients(self):
         """
         Get all the patients of the practitioner
-        :return: Deep copy of the dictionary containing all the patients of the practitioner
+        :return: Read-only snapshot of the dictionary containing all the patients of the practitioner; patients loaded
+        afterwards by loadPatients do not appear in it, so call again to see them
         """
-        return copy.deepcopy(self.__patients)
+        self.__shared = True
+        return MappingProxyType(self.__patients)
 
     def getPatient(self, patient_id):
         """
         Get a particular patient of the practitioner
         :param patient_id: ID of patient to get
-        :return: Deep copy of Patient with ID of patient_id
+        :return: Patient with ID of patient_id, shared with the roster; use Patient.withEncounters to attach Encounters
         :precondition: patient_id must match the iD of a patient of the practitioner
         """
 
         if patient_id in self.__patients:
-            return copy.deepcopy(self.__patients[patient_id])
+            return self.__patients[patient_id]
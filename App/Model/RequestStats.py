@@ -0,0 +1,44 @@
+import threading
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.__lock = threading.Lock()  # requests are recorded from the worker threads of WebServiceManager
+        self.__endpoints = dict()  # Endpoint name to [request count, error count, total latency, max latency]
+
+    def record(self, endpoint, latency, success):
+        """
+        Record one request made to the server
+        :param endpoint: Name of the endpoint called, e.g. "Observation"
+        :param latency: Time taken by the request in seconds
+        :param success: False if the request failed or the server answered with an error
+        :return: None
+        """
+        with self.__lock:
+            counts = self.__endpoints.setdefault(endpoint, [0, 0, 0.0, 0.0])
+            counts[0] += 1
+            if not success:
+                counts[1] += 1
+            counts[2] += latency
+            counts[3] = max(counts[3], latency)
+
+    def getStats(self):
+        """
+        Get the statistics recorded so far for every endpoint
+        :return: map of endpoint name to a map with the request count, error count, and mean and max latency in seconds
+        """
+        with self.__lock:
+            return {endpoint: {"requests": counts[0],
+                               "errors": counts[1],
+                               "meanLatency": counts[2] / counts[0],
+                               "maxLatency": counts[3]}
+                    for endpoint, counts in self.__endpoints.items()}
+
+    def reset(self):
+        """
+        Forget all the statistics recorded so far
+        :return: None
+        """
+        with self.__lock:
+            self.__endpoints.clear()
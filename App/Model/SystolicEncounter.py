@@ -2,7 +2,7 @@ from .Encounter import Encounter
 
 
 class SystolicEncounter(Encounter):
-
+    __slots__ = ("__systolic",)
 
     def __init__(self, date_time, systolic):
         """
@@ -0,0 +1,160 @@
+import numpy as np
+
+
+class ValueStatistics:
+    """
+    Latest measurement of each monitored patient, kept in a NumPy array with one slot per patient. Count, sum and sum
+    of squares are kept up to date on every change, so the mean and standard deviation cost O(1); median, percentiles
+    and z-scores are computed over the array in one vectorized pass.
+    """
+
+    def __init__(self, capacity=64):
+        """
+        Constructor for empty statistics
+        :param capacity: Number of slots allocated at first; the array doubles in size when it is full
+        """
+        self.__values = np.empty(max(1, capacity), dtype=np.float64)
+        self.__ids = []  # patient ID in each used slot; slots 0 to len(self.__ids) - 1 are used
+        self.__slots = dict()  # patient ID to slot
+        self.__sum = 0.0
+        self.__sumSquares = 0.0
+
+    def set(self, patient_id, value):
+        """
+        Set the latest value of a patient, adding the patient if needed
+        :param patient_id: ID of the patient
+        :param value: the measurement
+        :return: None
+        """
+        value = float(value)
+        slot = self.__slots.get(patient_id)
+        if slot is None:
+            slot = len(self.__ids)
+            if slot == len(self.__values):
+                self.__values = np.concatenate((self.__values, np.empty(len(self.__values), dtype=np.float64)))
+            self.__ids.append(patient_id)
+            self.__slots[patient_id] = slot
+        else:
+            old = self.__values[slot]
+            self.__sum -= old
+            self.__sumSquares -= old * old
+        self.__values[slot] = value
+        self.__sum += value
+        self.__sumSquares += value * value
+
+    def remove(self, patient_id):
+        """
+        Remove the value of a patient. The value in the last slot is moved into the freed one, so used slots stay
+        contiguous
+        :param patient_id: ID of the patient; nothing happens if the patient has no value
+        :return: None
+        """
+        slot = self.__slots.pop(patient_id, None)
+        if slot is None:
+            return
+        old = self.__values[slot]
+        self.__sum -= old
+        self.__sumSquares -= old * old
+        last = len(self.__ids) - 1
+        last_id = self.__ids.pop()
+        if slot != last:
+            self.__values[slot] = self.__values[last]
+            self.__ids[slot] = last_id
+            self.__slots[last_id] = slot
+        if not self.__ids:  # start again from exact sums once empty, so rounding errors do not build up
+            self.__sum = 0.0
+            self.__sumSquares = 0.0
+
+    def contains(self, patient_id):
+        """
+        Checks if a patient has a value
+        :param patient_id: ID of the patient
+        :return: True if a value was set for the patient, False otherwise
+        """
+        return patient_id in self.__slots
+
+    def getValue(self, patient_id):
+        """
+        Get the value of a patient
+        :param patient_id: ID of the patient
+        :return: the value, or None if the patient has no value
+        """
+        slot = self.__slots.get(patient_id)
+        return None if slot is None else float(self.__values[slot])
+
+    def getCount(self):
+        """
+        Get the number of patients with a value
+        :return: number of values
+        """
+        return len(self.__ids)
+
+    def getValues(self):
+        """
+        Get the values of all patients
+        :return: read-only NumPy array of the values, in slot order
+        """
+        values = self.__values[:len(self.__ids)]
+        values.flags.writeable = False
+        return values
+
+    def getMean(self):
+        """
+        Get the mean of the values in O(1)
+        :return: the mean, or None if there are no values
+        """
+        if not self.__ids:
+            return None
+        return self.__sum / len(self.__ids)
+
+    def getStandardDeviation(self):
+        """
+        Get the population standard deviation of the values in O(1)
+        :return: the standard deviation, or None if there are no values
+        """
+        if not self.__ids:
+            return None
+        mean = self.__sum / len(self.__ids)
+        return max(0.0, self.__sumSquares / len(self.__ids) - mean * mean) ** 0.5
+
+    def getMedian(self):
+        """
+        Get the median of the values
+        :return: the median, or None if there are no values
+        """
+        return self.getPercentile(50)
+
+    def getPercentile(self, percentile):
+        """
+        Get a percentile of the values, interpolated linearly between the closest values
+        :param percentile: percentile between 0 and 100
+        :return: the percentile, or None if there are no values
+        """
+        if not self.__ids:
+            return None
+        return float(np.percentile(self.__values[:len(self.__ids)], percentile))
+
+    def getZScore(self, patient_id):
+        """
+        Get the number of standard deviations the value of a patient is above the mean
+        :param patient_id: ID of the patient
+        :return: the z-score, 0 if all values are equal, or None if the patient has no value
+        """
+        value = self.getValue(patient_id)
+        if value is None:
+            return None
+        deviation = self.getStandardDeviation()
+        return (value - self.getMean()) / deviation if deviation else 0.0
+
+    def getZScores(self):
+        """
+        Get the z-score of every patient in one vectorized pass
+        :return: map of patient ID to z-score
+        """
+        if not self.__ids:
+            return {}
+        deviation = self.getStandardDeviation()
+        if not deviation:
+            return dict.fromkeys(self.__ids, 0.0)
+        scores = (self.__values[:len(self.__ids)] - self.getMean()) / deviation
+        return dict(zip(self.__ids, scores.tolist()))
@@ -0,0 +1,122 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from .Practitioner import Practitioner
+
+
+class Ward:
+
+    def __init__(self, pracIds, wsm, load=True, store=None, maxWorkers=4):
+        """
+        Constructor for a ward watched by several practitioners at once. Their rosters are loaded concurrently and
+        merged into one patient index, where a patient shared by several practitioners appears once. A Ward can be used
+        wherever a Practitioner is, so its patients are monitored with the same batched polls as a single roster
+        :param pracIds: list of the practitioners' IDs
+        :param wsm: WebServiceManager instance for making calls to server
+        :param load: True to fetch all the patients straight away, False to fetch them later with loadPatients
+        :param store: optional LocalStore keeping the identifiers and patients between runs
+        :param maxWorkers: Maximum number of practitioners whose rosters are fetched at once
+        :raise LoginException: if one of the practitioners is not found
+        """
+        self.__pracIds = list(dict.fromkeys(pracIds))  # duplicated IDs would fetch the same roster twice
+        self.__maxWorkers = max(1, min(maxWorkers, len(self.__pracIds)))
+        with ThreadPoolExecutor(max_workers=self.__maxWorkers) as executor:
+            self.__practitioners = list(executor.map(lambda pracId: Practitioner(pracId, wsm, False, store),
+                                                     self.__pracIds))
+        # Patient ID to Patient instances, starting with the stored ones and filled as they arrive. As in Practitioner,
+        # the dictionary is copied before a patient is added once a view of it has been handed out
+        self.__patients = dict()
+        self.__shared = False  # True while the current dictionary is seen through a view from returnPatients
+        self.__practitionerIds = dict()  # patient ID to the IDs of the practitioners listing them
+        self.__index(self.__practitioners)
+        if load:
+            for patient in self.loadPatients():
+                pass
+
+    def __index(self, practitioners):
+        """
+        Merge the rosters of the practitioners into the patient index, replacing the one built before
+        :param practitioners: list of Practitioners
+        :return: None
+        """
+        patients = dict()
+        practitionerIds = dict()
+        for practitioner in practitioners:
+            for patient_id, patient in practitioner.returnPatients().items():
+                patients.setdefault(patient_id, patient)
+                practitionerIds.setdefault(patient_id, []).append(practitioner.getId())
+        self.__patients = patients  # replaced rather than changed, so views of the old index stay valid
+        self.__shared = False
+        self.__practitionerIds = practitionerIds
+
+    def loadPatients(self):
+        """
+        This generator fetches the rosters of all the practitioners concurrently, adding each patient to the ward as
+        it arrives from any of them. Once all have arrived, the index is rebuilt from the final rosters, dropping
+        stored patients the server no longer lists
+        :return: generator of the Patients that were not known before, each patient yielded once
+        """
+        items = queue.Queue()  # patients from any roster, then one None per finished roster
+
+        def loadRoster(practitioner):
+            try:
+                for patient in practitioner.loadPatients():
+                    items.put(patient)
+            finally:
+                items.put(None)
+
+        with ThreadPoolExecutor(max_workers=self.__maxWorkers) as executor:
+            futures = [executor.submit(loadRoster, practitioner) for practitioner in self.__practitioners]
+            running = len(futures)
+            while running:
+                patient = items.get()
+                if patient is None:
+                    running -= 1
+                elif patient.getId() not in self.__patients:
+                    if self.__shared:
+                        self.__patients = dict(self.__patients)
+                        self.__shared = False
+                    self.__patients[patient.getId()] = patient
+                    yield patient
+            for future in futures:
+                future.result()  # raise the error of a roster that failed
+        self.__index(self.__practitioners)
+
+    def getId(self):
+        """
+        Get the ID the ward is known by, made of the IDs of its practitioners
+        :return: the IDs separated by commas
+        """
+        return ",".join(self.__pracIds)
+
+    def getPractitioners(self):
+        """
+        Get the practitioners of the ward
+        :return: list of Practitioners
+        """
+        return list(self.__practitioners)
+
+    def getPractitionerIds(self, patient_id):
+        """
+        Get the practitioners listing a patient
+        :param patient_id: ID of the patient
+        :return: list of practitioner IDs, empty if the patient is not in the ward
+        """
+        return list(self.__practitionerIds.get(patient_id, ()))
+
+    def returnPatients(self):
+        """
+        Get all the patients of the ward
+        :return: Read-only snapshot of the dictionary containing all the patients of the ward; patients loaded
+        afterwards by loadPatients do not appear in it, so call again to see them
+        """
+        self.__shared = True
+        return MappingProxyType(self.__patients)
+
+    def getPatient(self, patient_id):
+        """
+        Get a particular patient of the ward
+        :param patient_id: ID of patient to get
+        :return: Patient with ID of patient_id, shared with the rosters, or None if the patient is not in the ward
+        """
+        return self.__patients.get(patient_id)
@@ -1,32 +1,172 @@
+import time
+import datetime
 import requests
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from .CholesterolEncounter import CholesterolEncounter
+from .HttpCache import HttpCache
 from .SystolicEncounter import SystolicEncounter
 from .DiastolicEncounter import DiastolicEncounter
+from .MyExceptions import ServerException
 from .Patient import Patient
+from .RequestStats import RequestStats
 
 
 class WebServiceManager:
-    def __init__(self):
+    def __init__(self, maxWorkers=8, poolSize=10, connectTimeout=5, readTimeout=30, retries=3, backoffFactor=0.5,
+                 cacheSize=512, cacheTtl=3600, baseUrl="https://fhir.monash.edu/hapi-fhir-jpaserver/fhir/"):
+        """
+        Constructor for the manager of all calls made to the FHIR server. All calls share one pooled keep-alive session
+        :param maxWorkers: Maximum number of requests that may be in flight at once when fetching concurrently
+        :param poolSize: Maximum number of connections kept open to the server
+        :param connectTimeout: Seconds to wait for a connection to the server
+        :param readTimeout: Seconds to wait for the server to send data
+        :param retries: Number of retries on connection errors and 429/5xx answers
+        :param backoffFactor: Retries wait backoffFactor * 2 ** (retry number - 1) seconds
+        :param cacheSize: Maximum number of responses kept for conditional requests
+        :param cacheTtl: Seconds a cached response may be revalidated for before it is dropped
+        :param baseUrl: Base url of the FHIR server, ending with a slash
+        """
+        self.__maxWorkers = max(1, maxWorkers)
+        self.__timeout = (connectTimeout, readTimeout)
+        retry = Retry(total=retries, backoff_factor=backoffFactor, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=max(poolSize, self.__maxWorkers),
+                              max_retries=retry)
+        self.__session = requests.Session()
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
+        self.__session.headers.update({"Accept": "application/fhir+json", "Accept-Encoding": "gzip, deflate"})
+        self.__stats = RequestStats()
+        self.__cache = HttpCache(cacheSize, cacheTtl)
         # Set up all the base URL components when class initialize
-        self.__baseUrl = "https://fhir.monash.edu/hapi-fhir-jpaserver/fhir/"
+        self.__baseUrl = baseUrl
         self.__practitionerUrl = "Practitioner/"
         self.__patientUrl = "Patient/"
-        self.__allEntriesUrl = "Encounter?participant.identifier={0}|{1}&_include=Encounter.participant.individual"
+        # include the subject of each Encounter so the patients arrive in the same bundle page
+        self.__allEntriesUrl = "Encounter?participant.identifier={0}|{1}&_include=Encounter.participant.individual" \
+                               "&_include=Encounter.subject"
         # code 2093-3 is cholesterol value; sort by descending date; count = 1 returns only 1 result
         self.__encounterUrl = "Observation?patient={0}&code={1}&_sort=-date&_count={2}"
+        self.__lastUpdatedFilter = "&_lastUpdated=gt{0}"
+        self.__dateFilter = "&date=ge{0}"
+        self.__subscriptionUrl = "Subscription"
+        self.__subscriptionCriteria = "Observation?patient={0}&code={1}"
+        # bulk searches list many patients and codes in one url, so patients are split into chunks to bound its length
+        self.__bulkChunkSize = 50
+        self.__bulkPageSize = 100
         self.__codes = {
             "cholesterol": "2093-3",
             "systolic": "55284-4",
             "diastolic": "55284-4"
         }
 
+    def __get(self, url, parser=None, parserKey=None, endpoint=None):
+        """
+        This function makes a GET request on the pooled session and records its latency and outcome. Responses with an
+        ETag or Last-Modified header are cached, and repeated requests of their url are made conditional, so an
+        unchanged resource costs a 304 and is neither downloaded nor parsed again
+        :param url: the url to request
+        :param parser: optional function turning the body into the value to return, cached along with the body
+        :param parserKey: key telling parsers apart, since one url can be parsed in several ways (e.g. systolic and
+        diastolic values come from the same Observations)
+        :param endpoint: name the request is recorded under, or None to name it from the url
+        :return: the body of the response as a dictionary, or what parser returned for it
+        :raises ServerException: if the server cannot be reached, times out or keeps failing after retries
+        """
+        endpoint = endpoint or self.__getEndpoint(url)
+        entry = self.__cache.get(url)
+        headers = {}
+        if entry:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.lastModified:
+                headers["If-Modified-Since"] = entry.lastModified
+        start = time.perf_counter()
+        try:
+            response = self.__session.get(url, headers=headers, timeout=self.__timeout)
+            if entry and response.status_code == 304:
+                self.__cache.revalidated(entry)
+            else:
+                entry = None
+                data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.__stats.record(endpoint, time.perf_counter() - start, False)
+            raise ServerException("GET {0} failed: {1}".format(url, e)) from e
+        self.__stats.record(endpoint, time.perf_counter() - start, response.ok)
+
+        if entry is None:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if not response.ok or not (etag or last_modified):
+                return parser(data) if parser else data
+            entry = self.__cache.store(url, etag, last_modified, data)
+        if parser is None:
+            return entry.data
+        if parserKey not in entry.parsed:
+            entry.parsed[parserKey] = parser(entry.data)
+        return entry.parsed[parserKey]
+
+    def __send(self, method, url, body=None):
+        """
+        This function makes a request other than GET on the pooled session and records its latency and outcome.
+        Such requests change the server, so they are neither cached nor retried on errors answered by the server
+        :param method: the HTTP method, e.g. "POST"
+        :param url: the url to request
+        :param body: optional dictionary sent as JSON
+        :return: the body of the response as a dictionary, or None if it has none
+        :raises ServerException: if the server cannot be reached, times out or answers with an error
+        """
+        endpoint = self.__getEndpoint(url)
+        start = time.perf_counter()
+        try:
+            response = self.__session.request(method, url, json=body, timeout=self.__timeout,
+                                              headers={"Content-Type": "application/fhir+json"})
+        except requests.RequestException as e:
+            self.__stats.record(endpoint, time.perf_counter() - start, False)
+            raise ServerException("{0} {1} failed: {2}".format(method, url, e)) from e
+        self.__stats.record(endpoint, time.perf_counter() - start, response.ok)
+        if not response.ok:
+            raise ServerException("{0} {1} failed: HTTP {2}".format(method, url, response.status_code))
+        try:
+            return response.json() if response.content else None
+        except ValueError as e:
+            raise ServerException("{0} {1} failed: {2}".format(method, url, e)) from e
+
+    def __getEndpoint(self, url):
+        """
+        This function names the endpoint of an url, e.g. "Observation" for an Observation search
+        :param url: the url requested
+        :return: the resource type requested, or "paging" for other urls such as bundle page links
+        """
+        if url.startswith(self.__baseUrl):
+            endpoint = url[len(self.__baseUrl):].split('?')[0].split('/')[0]
+            if endpoint:
+                return endpoint
+        return "paging"
+
+    def getBulkChunkSize(self):
+        """
+        This function tells how many patients a bulk Observation search asks for at once
+        :return: the number of patients per search
+        """
+        return self.__bulkChunkSize
+
+    def getRequestStats(self):
+        """
+        This function reports the latency and error count of the requests made so far, per endpoint
+        :return: map of endpoint name to a map with the request count, error count, and mean and max latency in seconds
+        """
+        return self.__stats.getStats()
+
     def fetchPractitionerIdentifier(self, id):
         """
         This function builds an url to access all encounters of a certain practitioner
         :param id: Practitioner's ID
         :return: the url to access all encounters
         """
-        data = requests.get(url=(self.__baseUrl + self.__practitionerUrl + id)).json()
+        data = self.__get(self.__baseUrl + self.__practitionerUrl + id)
         if data["resourceType"] == "Practitioner":
             identifier = data["identifier"][0]
             identifier_url = self.__baseUrl + self.__allEntriesUrl.format(identifier["system"], identifier["value"])
@@ -36,37 +176,71 @@ class WebServiceManager:
     def fetchAllPatients(self, url):
         """
         This function will get a map of Patient object
-        :param url:
+        :param url: the url to access all encounters of a practitioner
         :return: map of id to patient
         """
+        existing_patients = {}
+        for patient in self.iterAllPatients(url):
+            existing_patients[patient.getId()] = patient
+        return existing_patients
+
+    def iterAllPatients(self, url):
+        """
+        This generator yields the Patients of all encounters as each bundle page is processed. Patients included in a
+        page are built straight from that page; only subjects the server did not include are fetched, concurrently by
+        a bounded pool of workers while the pages are walked, and yielded as soon as they arrive
+        :param url: the url to access all encounters of a practitioner
+        :return: generator of Patient, each patient yielded once
+        """
         # practitioner_name = data["entry"][0]["resource"]["participant"][0]["individual"]["display"]
         # print("Practitioner: " + practitioner_name)
-        existing_patients = {}
-        next_page = True
-        page_count = 0
+        seen_ids = set()  # ids of patients yielded or being fetched
+        pending = []  # Futures fetching patients not included in their page, in order of discovery
         next_url = url
 
-        while next_page:
-            data = requests.get(url=next_url).json()
-            next_page = False
-            if 'link' in data:
-                links = data['link']
-                for link in links:
-                    if link['relation'] == 'next':
-                        next_page = True
-                        next_url = link['url']
-                        page_count += 1
-
-                if "entry" in data:
-                    encounters = data["entry"]
-                    for encounter in encounters:
-                        patient = encounter["resource"]["subject"]
-                        patient_id = patient["reference"].split('/')[1]
-                        if patient_id not in existing_patients:  # check if this id has been stored
-                            existing_patients[patient_id] = self.fetchPatient(patient_id)
-            else:
-                next_page = False  # error in FHIR server
-        return existing_patients
+        with ThreadPoolExecutor(max_workers=self.__maxWorkers) as executor:
+            while next_url:
+                data = self.__get(next_url)
+                next_url = None
+                if 'link' in data:
+                    links = data['link']
+                    for link in links:
+                        if link['relation'] == 'next':
+                            next_url = link['url']
+
+                    if "entry" in data:
+                        subject_ids, included = self.__parseEncounterPage(data["entry"])
+                        for patient_id in subject_ids:
+                            if patient_id not in seen_ids:  # check if this id has been yielded or requested
+                                seen_ids.add(patient_id)
+                                if patient_id in included:
+                                    yield included[patient_id]
+                                else:
+                                    pending.append(executor.submit(self.fetchPatient, patient_id))
+                # else error in FHIR server, stop walking the pages
+
+                while pending and pending[0].done():  # patients fetched while the page was being walked
+                    yield pending.pop(0).result()
+
+            for future in pending:
+                yield future.result()
+
+    def __parseEncounterPage(self, entries):
+        """
+        This function splits the entries of one Encounter bundle page into the subjects referenced by the Encounters
+        and the Patient resources included alongside them
+        :param entries: the entry list of the bundle page
+        :return: list of subject patient IDs in page order, and map of id to Patient built from included resources
+        """
+        subject_ids = []
+        included = {}
+        for entry in entries:
+            resource = entry["resource"]
+            if resource["resourceType"] == "Encounter" and "subject" in resource:
+                subject_ids.append(resource["subject"]["reference"].split('/')[1])
+            elif resource["resourceType"] == "Patient":
+                included[resource["id"]] = self.__createPatient(resource["id"], resource)
+        return subject_ids, included
 
     def fetchPatient(self, id):
         """
@@ -74,7 +248,16 @@ class WebServiceManager:
         :param id: patient's ID
         :return: a Patient object
         """
-        data = requests.get(url=(self.__baseUrl + self.__patientUrl + id)).json()
+        data = self.__get(self.__baseUrl + self.__patientUrl + id)
+        return self.__createPatient(id, data)
+
+    def __createPatient(self, id, data):
+        """
+        This function creates a Patient object from a Patient resource
+        :param id: patient's ID
+        :param data: the Patient resource as a dictionary
+        :return: a Patient object
+        """
         birthdate = data["birthDate"]
         gender = data["gender"]
 
@@ -91,67 +274,315 @@ class WebServiceManager:
         patient = Patient(id, fname, lname, birthdate, gender, street, city, state, country)
         return patient
 
-    def fetchEncounter(self, id, encounterType, num):
+    def fetchEncounter(self, id, encounterType, num, startDate=None):
         """
         This function takes a patient ID and will return his/her latest cholesterol values
         :param id: the ID of a patient
         :param encounterType: Type of encounter to fetch
         :param num: Number of historic encounters to fetch
+        :param startDate: optional ISO 8601 datetime; encounters before it are not fetched. More than one page is then
+        fetched if needed, up to num encounters
         :return: List of Encounter subclass defined by encounterType
         """
         if encounterType in self.__codes:
+            if startDate is not None:
+                return self.fetchEncountersSince([id], [encounterType], num, None, startDate)[0][id][encounterType]
             code = self.__codes[encounterType]
             # Code represents cholesterol observation. Sort in decreasing order to get the last cholesterol value
             encounterUrl = self.__baseUrl + self.__encounterUrl.format(id, code, num)
-            data = requests.get(encounterUrl).json()
-
             # If patient has observation
-            if "entry" in data:
-                entries = data["entry"]
-                if len(entries) > 0:
-                    encounters = []
-                    for entry in entries:
-                        item = entry['resource']
-                        date = item['issued']
-                        if encounterType == "cholesterol":
-                            cholesterol = item['valueQuantity']['value']
-                            encounters.append(CholesterolEncounter(date, cholesterol))
-                        elif encounterType == "systolic":
-                            components = item['component']
-                            for component in components:
-                                if component['code']['coding'][0]['code'] == '8480-6':  # Systolic Blood Pressure code
-                                    sbp = component['valueQuantity']['value']
-                            encounters.append(SystolicEncounter(date, sbp))
-                        elif encounterType == "diastolic":
-                            components = item['component']
-                            for component in components:
-                                if component['code']['coding'][0]['code'] == '8462-4':  # Diastolic Blood Pressure code
-                                    dbp = component['valueQuantity']['value']
-                            encounters.append(DiastolicEncounter(date, dbp))
-                        else:
-                            return []
-                            
-                    return encounters
+            return list(self.__get(encounterUrl, lambda data: self.__parseEncounters(data, encounterType),
+                                   ("encounters", encounterType)))
 
         return []
 
+    def __parseEncounters(self, data, encounterType):
+        """
+        This function creates the Encounters of one type found in an Observation bundle
+        :param data: the Observation bundle as a dictionary
+        :param encounterType: Type of encounter to create
+        :return: tuple of Encounter subclass defined by encounterType, in bundle order
+        """
+        encounters = []
+        if "entry" in data:
+            for entry in data["entry"]:
+                encounter = self.__createEncounter(entry['resource'], encounterType)
+                if encounter:
+                    encounters.append(encounter)
+        return tuple(encounters)
+
+    def fetchBloodPressureEncounters(self, id, num):
+        """
+        This function takes a patient ID and returns his/her latest systolic and diastolic values. Both come from the
+        components of the same blood pressure Observation, so they are parsed from a single download
+        :param id: the ID of a patient
+        :param num: Number of historic encounters to fetch
+        :return: pair of lists of SystolicEncounter and DiastolicEncounter, latest first
+        """
+        encounters = self.fetchEncountersBulk([id], ["systolic", "diastolic"], num)[id]
+        return encounters["systolic"], encounters["diastolic"]
+
+    def fetchEncountersBulk(self, patient_ids, encounterTypes, num, startDate=None):
+        """
+        This function fetches the latest encounters of several types for many patients at once. Each chunk of patients
+        costs a single Observation search for all the codes, paged until every patient has num encounters of each type
+        :param patient_ids: IDs of the patients
+        :param encounterTypes: List of types of encounter to fetch
+        :param num: Number of historic encounters to fetch per patient and type, or a map of them as taken by
+        fetchEncountersSince
+        :param startDate: optional ISO 8601 datetime, or map of them, as taken by fetchEncountersSince
+        :return: map of patient id to a map of encounter type to list of Encounter subclass, latest first
+        """
+        return self.fetchEncountersSince(patient_ids, encounterTypes, num, None, startDate)[0]
+
+    def fetchEncountersSince(self, patient_ids, encounterTypes, num, since, startDate=None):
+        """
+        This function works like fetchEncountersBulk but only asks for Observations updated on the server after a
+        watermark, so polling for changes costs one small search per chunk of patients when nothing is new
+        :param patient_ids: IDs of the patients
+        :param encounterTypes: List of types of encounter to fetch
+        :param num: Number of historic encounters to fetch per patient and type, map of patient id to that number, or
+        map of patient id to a map of encounter type to that number, where types left out are not fetched
+        :param since: _lastUpdated watermark returned by a previous call, or None to fetch the latest encounters
+        :param startDate: optional ISO 8601 datetime; encounters before it are not fetched. Or a map of patient id to a
+        map of encounter type to one, where a list is complete at its first encounter before the date, which is kept
+        only if the list is still empty, so the latest reading is never lost
+        :return: map of patient id to a map of encounter type to list of Encounter subclass, latest first, and the
+        watermark to pass on the next call
+        """
+        types = [encounterType for encounterType in encounterTypes if encounterType in self.__codes]
+        results = {patient_id: {encounterType: [] for encounterType in types} for patient_id in patient_ids}
+        nums = dict()  # (patient id, encounter type) to the number of encounters wanted
+        starts = dict()  # (patient id, encounter type) to the datetime at which paging for that list stops
+        for patient_id in results:
+            count = num.get(patient_id, 1) if isinstance(num, dict) else num
+            start = startDate.get(patient_id, {}) if isinstance(startDate, dict) else {}
+            for encounterType in types:
+                wanted = count.get(encounterType, 0) if isinstance(count, dict) else count
+                if wanted > 0:
+                    nums[patient_id, encounterType] = wanted
+                    if start.get(encounterType):
+                        starts[patient_id, encounterType] = self.__parseInstant(start[encounterType])
+        code_types = {}  # Observation code to the encounter types read from it
+        for encounterType in types:
+            code_types.setdefault(self.__codes[encounterType], []).append(encounterType)
+        if not code_types:
+            return results, since
+        # pages of the same url are parsed differently for different types, e.g. systolic and diastolic
+        parser_key = ("observationPage", tuple((code, tuple(read)) for code, read in code_types.items()))
+
+        watermark = since
+        ids = list(results.keys())
+        for start in range(0, len(ids), self.__bulkChunkSize):
+            chunk = ids[start:start + self.__bulkChunkSize]
+            wanted = [key for key in ((patient_id, encounterType) for patient_id in chunk for encounterType in types)
+                      if key in nums]
+            remaining = len(wanted)  # number of patient and type lists still short of their number and start date
+            if not remaining:
+                continue
+            # a page can never hold fewer observations than the results wanted, so small lookups take one page
+            page_size = min(self.__bulkPageSize,
+                            sum(max(nums.get((patient_id, encounterType), 0) for encounterType in read)
+                                for patient_id in chunk for read in code_types.values()))
+            next_url = self.__baseUrl + self.__encounterUrl.format(",".join(chunk), ",".join(code_types), page_size)
+            if since:
+                next_url += self.__lastUpdatedFilter.format(quote(since, safe=''))
+            if startDate and not isinstance(startDate, dict):
+                next_url += self.__dateFilter.format(quote(startDate, safe=''))
+            done = set()
+            while next_url and remaining > 0:
+                # next pages are recorded as Observation requests too, so budgets count every page fetched
+                next_url, page, last_updated = self.__get(next_url,
+                                                          lambda data: self.__parseObservationPage(data, code_types),
+                                                          parser_key, "Observation")
+                watermark = self.__getLatestInstant(watermark, last_updated)
+                for patient_id, encounterType, encounter in page:
+                    key = (patient_id, encounterType)
+                    if key not in nums or key in done:
+                        continue
+                    encounters = results[patient_id][encounterType]
+                    # pages are latest first, so after an encounter before the start the rest of this list is older
+                    before_start = key in starts and self.__parseInstant(encounter.getDateTime()) < starts[key]
+                    if not before_start or not encounters:
+                        encounters.append(encounter)
+                    if before_start or len(encounters) == nums[key]:
+                        done.add(key)
+                        remaining -= 1
+        return results, watermark
+
+    def createSubscriptions(self, patient_ids, encounterTypes, endpoint, end=None):
+        """
+        This function asks the server to notify an endpoint of every new Observation of some patients, with FHIR R4
+        rest-hook Subscriptions. Each chunk of patients gets one Subscription for all the codes
+        :param patient_ids: IDs of the patients
+        :param encounterTypes: List of types of encounter to be notified of
+        :param endpoint: url the server sends the Observations to, e.g. NotificationReceiver.getEndpoint()
+        :param end: optional ISO 8601 instant after which the server drops the Subscriptions, so ones left behind by a
+        crash do not live on
+        :return: list of the IDs of the Subscriptions created
+        :raises ServerException: if a Subscription is refused; the ones already created are then deleted
+        """
+        codes = list(dict.fromkeys(self.__codes[encounterType] for encounterType in encounterTypes
+                                   if encounterType in self.__codes))
+        subscription_ids = []
+        if not codes:
+            return subscription_ids
+        ids = list(patient_ids)
+        try:
+            for start in range(0, len(ids), self.__bulkChunkSize):
+                chunk = ids[start:start + self.__bulkChunkSize]
+                subscription = {"resourceType": "Subscription",
+                                "status": "requested",
+                                "reason": "Patient monitor",
+                                "criteria": self.__subscriptionCriteria.format(",".join(chunk), ",".join(codes)),
+                                "channel": {"type": "rest-hook", "endpoint": endpoint,
+                                            "payload": "application/fhir+json"}}
+                if end:
+                    subscription["end"] = end
+                created = self.__send("POST", self.__baseUrl + self.__subscriptionUrl, subscription)
+                if not created or "id" not in created:
+                    raise ServerException("Subscription was not created")
+                subscription_ids.append(created["id"])
+        except ServerException:
+            self.deleteSubscriptions(subscription_ids)
+            raise
+        return subscription_ids
+
+    def deleteSubscriptions(self, subscription_ids):
+        """
+        This function deletes Subscriptions created by createSubscriptions. Failures are ignored, the Subscriptions
+        then end by themselves if they were given an end
+        :param subscription_ids: IDs of the Subscriptions
+        :return: None
+        """
+        for subscription_id in subscription_ids:
+            try:
+                self.__send("DELETE", self.__baseUrl + self.__subscriptionUrl + "/" + subscription_id)
+            except ServerException:
+                pass
+
+    def parseNotification(self, data, encounterTypes):
+        """
+        This function creates the Encounters sent by a rest-hook notification, in the form returned by
+        fetchEncountersBulk so they can be merged into the monitors
+        :param data: the body of the notification as a dictionary: one Observation, or a Bundle of them
+        :param encounterTypes: List of types of encounter to read
+        :return: map of patient id to a map of encounter type to list of Encounter subclass, latest first. Patients and
+        types without a new Encounter are left out
+        """
+        code_types = {}  # Observation code to the encounter types read from it
+        for encounterType in encounterTypes:
+            if encounterType in self.__codes:
+                code_types.setdefault(self.__codes[encounterType], []).append(encounterType)
+        if data.get("resourceType") == "Observation":
+            data = {"entry": [{"resource": data}]}
+        entries = [entry for entry in data.get("entry", [])
+                   if entry.get("resource", {}).get("resourceType") == "Observation"]
+        results = {}
+        for patient_id, encounterType, encounter in self.__parseObservationPage({"entry": entries}, code_types)[1]:
+            results.setdefault(patient_id, {}).setdefault(encounterType, []).append(encounter)
+        for encounters_by_type in results.values():
+            for encounters in encounters_by_type.values():
+                encounters.sort(key=lambda encounter: self.__parseInstant(encounter.getDateTime()), reverse=True)
+        return results
+
+    def __parseObservationPage(self, data, code_types):
+        """
+        This function creates the Encounters found in one page of a bulk Observation search
+        :param data: the bundle page as a dictionary
+        :param code_types: map of Observation code to the encounter types read from it
+        :return: the url of the next page or None, a tuple of (patient id, encounter type, Encounter) in page order, and
+        the latest meta.lastUpdated of the Observations in the page or None
+        """
+        next_url = None
+        for link in data.get('link', []):
+            if link['relation'] == 'next':
+                next_url = link['url']
+
+        page = []
+        last_updated = None
+        for entry in data.get("entry", []):
+            item = entry['resource']
+            last_updated = self.__getLatestInstant(last_updated, item.get('meta', {}).get('lastUpdated'))
+            patient_id = item['subject']['reference'].split('/')[1]
+            for encounterType in code_types.get(self.__getObservationCode(item, code_types), []):
+                encounter = self.__createEncounter(item, encounterType)
+                if encounter:
+                    page.append((patient_id, encounterType, encounter))
+        return next_url, tuple(page), last_updated
+
+    def __getLatestInstant(self, first, second):
+        """
+        This function picks the later of two FHIR instants, either of which may be missing
+        :param first: an instant string such as "2020-05-01T10:00:00.000+10:00", or None
+        :param second: an instant string, or None
+        :return: the later instant string, or None if both are missing
+        """
+        if first is None or second is None:
+            return first or second
+        return second if self.__parseInstant(second) > self.__parseInstant(first) else first
+
+    def __parseInstant(self, instant):
+        """
+        This function reads a FHIR instant
+        :param instant: an instant string such as "2020-05-01T10:00:00.000+10:00"
+        :return: the datetime
+        """
+        return datetime.datetime.fromisoformat(instant.replace('Z', '+00:00'))
+
+    def __getObservationCode(self, item, codes):
+        """
+        This function finds which of the given codes an Observation is coded with
+        :param item: the Observation resource as a dictionary
+        :param codes: the codes being looked for
+        :return: the matching code, or None if the Observation has none of them
+        """
+        for coding in item['code']['coding']:
+            if coding['code'] in codes:
+                return coding['code']
+        return None
+
+    def __createEncounter(self, item, encounterType):
+        """
+        This function creates an Encounter subclass defined by encounterType from an Observation resource
+        :param item: the Observation resource as a dictionary
+        :param encounterType: Type of encounter to create
+        :return: the Encounter, or None if the Observation has no value for encounterType
+        """
+        date = item['issued']
+        if encounterType == "cholesterol":
+            if 'valueQuantity' in item:
+                return CholesterolEncounter(date, item['valueQuantity']['value'])
+        elif encounterType == "systolic":
+            for component in item.get('component', []):
+                if component['code']['coding'][0]['code'] == '8480-6':  # Systolic Blood Pressure code
+                    return SystolicEncounter(date, component['valueQuantity']['value'])
+        elif encounterType == "diastolic":
+            for component in item.get('component', []):
+                if component['code']['coding'][0]['code'] == '8462-4':  # Diastolic Blood Pressure code
+                    return DiastolicEncounter(date, component['valueQuantity']['value'])
+        return None
+
 
 if __name__ == "__main__":
-    webServiceManager = WebServiceManager()
-    identifier_url = webServiceManager.fetchPractitionerIdentifier("3337")
+    # Smoke test against a server, e.g. python -m App.Model.WebServiceManager 3337 http://127.0.0.1:8078/fhir/
+    import sys
+    pracId = sys.argv[1] if len(sys.argv) > 1 else "3337"
+    webServiceManager = WebServiceManager(baseUrl=sys.argv[2]) if len(sys.argv) > 2 else WebServiceManager()
+    identifier_url = webServiceManager.fetchPractitionerIdentifier(pracId)
     patients = webServiceManager.fetchAllPatients(identifier_url)
-    patient_id_mock = '3335'
-    print("patient id is: {0}".format(patient_id_mock))
-    patient_mock = webServiceManager.fetchPatient(patients[patient_id_mock].getId())
-    # cholesterol test
-    patient_mock.updateEncounter('cholesterol', webServiceManager.fetchEncounter(patient_mock.getId(), 'cholesterol'))
-    print("Cholesterol Test: {0}, {1}, {2}".format(patient_mock.getId(), patient_mock.getFullName(),
-                                                   patient_mock.getEncounter('cholesterol').getValue()["cholesterol"]))
-
-    # blood pressure test
-    patient_mock.updateEncounter('bloodPressure',
-                                 webServiceManager.fetchEncounter(patient_mock.getId(), 'bloodPressure'))
-    print("Cholesterol Test: {0}, {1}, diastolicBloodPressure: {2}, systolicBloodPressure: {3}".format(
-        patient_mock.getId(), patient_mock.getFullName(),
-        patient_mock.getEncounter('bloodPressure').getValue()["diastolicBloodPressure"],
-        patient_mock.getEncounter('bloodPressure').getValue()['systolicBloodPressure']))
+    print("Practitioner {0} has {1} patients".format(pracId, len(patients)))
+    patient_mock = webServiceManager.fetchPatient(next(iter(patients))) if patients else None
+    if patient_mock:
+        print("patient id is: {0}".format(patient_mock.getId()))
+        # cholesterol test
+        cholesterol = webServiceManager.fetchEncounter(patient_mock.getId(), "cholesterol", 1)
+        print("Cholesterol Test: {0}, {1}, {2}".format(patient_mock.getId(), patient_mock.getFullName(),
+                                                       cholesterol[0].getValue() if cholesterol else "No Data"))
+
+        # blood pressure test
+        systolic, diastolic = webServiceManager.fetchBloodPressureEncounters(patient_mock.getId(), 1)
+        print("Blood Pressure Test: {0}, {1}, diastolicBloodPressure: {2}, systolicBloodPressure: {3}".format(
+            patient_mock.getId(), patient_mock.getFullName(), diastolic[0].getValue() if diastolic else "No Data",
+            systolic[0].getValue() if systolic else "No Data"))
+    print(webServiceManager.getRequestStats())
@@ -1,10 +1,18 @@
+from .AdaptivePoller import AdaptivePoller
+from .AlertEngine import AlertEngine
 from .CholesterolEncounter import CholesterolEncounter
 from .DiastolicEncounter import DiastolicEncounter
 from .Encounter import Encounter
+from .EventBus import EventBus
+from .LocalStore import LocalStore
+from .MonitoringGroup import MonitoringGroup
 from .MonitoringList import MonitoringList
 from .MonitoringListAverage import MonitoringListAverage
-from .MyExceptions import LoginException
+from .MyExceptions import LoginException, ServerException
 from .Patient import Patient
 from .Practitioner import Practitioner
+from .RequestStats import RequestStats
 from .SystolicEncounter import SystolicEncounter
+from .ValueStatistics import ValueStatistics
+from .Ward import Ward
 from .WebServiceManager import WebServiceManager
@@ -0,0 +1,301 @@
+import datetime
+import threading
+import time
+
+from ..Model.AdaptivePoller import AdaptivePoller
+from ..Model.MonitoringGroup import MonitoringGroup
+from ..Model.MonitoringList import MonitoringList
+from ..Model.MonitoringListAverage import MonitoringListAverage
+from ..Model.MyExceptions import LoginException, ServerException
+from ..Model.Practitioner import Practitioner
+from ..Model.Ward import Ward
+
+
+class MonitoringService:
+
+    def __init__(self, wsm, store=None, interval=20, xValue=None, yValue=None, historicDays=90,
+                 historicReadings=500, bloodPressureHysteresis=2, receiver=None, pushFallbackInterval=300,
+                 requestsPerMinute=60):
+        """
+        Constructor for the monitoring loop run without a GUI. It keeps the same monitors as the app and refreshes
+        them from one shared bulk fetch every interval seconds on its own thread, so any number of viewers can read
+        the latest values through the query methods while the FHIR server is polled once
+        :param wsm: WebServiceManager instance for making calls to server
+        :param store: optional LocalStore with the rosters, Encounters and sessions saved by the app
+        :param interval: Seconds between updates
+        :param xValue: Systolic threshold, or None to use the one of the saved session, or 140
+        :param yValue: Diastolic threshold, or None to use the one of the saved session, or 90
+        :param historicDays: Days of historic systolic readings kept
+        :param historicReadings: Maximum number of historic systolic readings kept per patient
+        :param bloodPressureHysteresis: mmHg below X or Y a reading must go to clear its alert
+        :param receiver: optional started NotificationReceiver; the server is then asked to push new readings to it,
+        and polling only runs every pushFallbackInterval seconds while it does
+        :param pushFallbackInterval: Seconds between updates while the server pushes new readings
+        :param requestsPerMinute: Budget of Observation requests per minute, pages included; patients whose readings
+        rarely change are polled less often than every interval, so the budget goes to the active and alerting ones
+        """
+        self.__wsm = wsm
+        self.__store = store
+        self.__interval = interval
+        self.__receiver = receiver
+        self.__pushFallbackInterval = pushFallbackInterval
+        self.__xValue = xValue
+        self.__yValue = yValue
+        self.__practitioner = None
+        self.__monitoringList = MonitoringListAverage("cholesterol", wsm)
+        self.__systolicMonitor = MonitoringList("systolic", wsm, 140, 1, None, bloodPressureHysteresis)
+        self.__systolicMonitorHistoric = MonitoringList("systolic", wsm, 140, historicReadings,
+                                                        historicDays * 24 * 3600)
+        self.__diastolicMonitor = MonitoringList("diastolic", wsm, 90, 1, None, bloodPressureHysteresis)
+        self.__monitoringGroup = MonitoringGroup(wsm, [self.__monitoringList, self.__systolicMonitor,
+                                                       self.__systolicMonitorHistoric, self.__diastolicMonitor],
+                                                 store, AdaptivePoller(wsm, interval,
+                                                                       requestsPerMinute=requestsPerMinute))
+        # Monitors by the name their patients are saved under in a session, as in the app
+        self.__monitors = {"cholesterol": self.__monitoringList, "systolic": self.__systolicMonitor,
+                           "systolicHistoric": self.__systolicMonitorHistoric, "diastolic": self.__diastolicMonitor}
+        # The monitors are changed by the service thread and read by the threads answering queries
+        self.__lock = threading.RLock()
+        self.__stopped = threading.Event()
+        self.__wake = threading.Event()  # set to update before the interval is over, e.g. when stopping
+        self.__thread = None
+        self.__notificationThread = None
+        self.__lastUpdated = None
+        self.__lastError = None
+        self.__pushError = None  # last Subscription failure reported, so each is only printed once
+
+    def start(self, pracIds, monitorAll=False):
+        """
+        Log in and start updating on the service thread. The patients monitored are the ones of the session saved by
+        the app for the same IDs, and with monitorAll, every patient of the roster
+        :param pracIds: list of practitioner IDs; several IDs watch a whole ward
+        :param monitorAll: True to monitor the cholesterol and blood pressure of every patient of the roster
+        :return: None
+        """
+        self.__stopped.clear()
+        if self.__receiver is not None:
+            self.__monitoringGroup.enablePush(self.__receiver.getEndpoint())
+            self.__notificationThread = threading.Thread(target=self.__receive, daemon=True)
+            self.__notificationThread.start()
+        self.__thread = threading.Thread(target=self.__run, args=(list(pracIds), monitorAll), daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stop updating, waiting for an update in progress to finish, and save the monitored Encounters
+        :return: None
+        """
+        self.__stopped.set()
+        self.__wake.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        with self.__lock:
+            if self.__receiver is not None:
+                self.__monitoringGroup.disablePush()
+            self.__monitoringGroup.saveEncounters()
+
+    def isRunning(self):
+        """
+        Checks if the service thread is running
+        :return: True if it is running, False otherwise
+        """
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def __run(self, pracIds, monitorAll):
+        """
+        Log in, fetch the monitored patients, then update every interval seconds until stopped
+        :param pracIds: list of practitioner IDs
+        :param monitorAll: True to monitor every patient of the roster
+        :return: None
+        """
+        try:
+            if len(pracIds) > 1:
+                practitioner = Ward(pracIds, self.__wsm, True, self.__store)
+            else:
+                practitioner = Practitioner(pracIds[0], self.__wsm, True, self.__store)
+        except (LoginException, ServerException) as e:
+            self.__lastError = "Login failed: {0}".format(e)
+            print(self.__lastError)
+            return
+        with self.__lock:
+            self.__practitioner = practitioner
+            monitored = self.__restoreSession(",".join(pracIds))
+        if monitorAll:
+            patient_ids = list(practitioner.returnPatients())
+            for name in ("cholesterol", "systolic", "diastolic"):
+                monitored[name] = list(dict.fromkeys(monitored.get(name, []) + patient_ids))
+        self.__monitorPatients(monitored)
+
+        while not self.__stopped.is_set():
+            start = time.monotonic()
+            self.update()
+            interval = self.__interval
+            if self.__monitoringGroup.isPushActive():  # polling only catches what notifications missed
+                interval = max(interval, self.__pushFallbackInterval)
+            self.__wake.wait(max(0, start + interval - time.monotonic()))
+            self.__wake.clear()
+
+    def __receive(self):
+        """
+        Apply the readings pushed by the server as they arrive, until the receiver is stopped. A notification without
+        readings asks for an update straight away
+        :return: None
+        """
+        for data in self.__receiver.iterNotifications():
+            with self.__lock:
+                applied = self.__monitoringGroup.applyNotification(data)
+                if applied:
+                    self.__lastUpdated = datetime.datetime.now()
+            if not applied:
+                self.__wake.set()
+
+    def __restoreSession(self, pracId):
+        """
+        Apply the thresholds of the session saved by the app, unless given to the service
+        :param pracId: the ID the session is saved under
+        :return: map of monitor name to the IDs of the patients monitored in the session
+        """
+        session = self.__store.loadSession(pracId) if self.__store else None
+        if session is None:
+            session = {"X": 140, "Y": 90, "monitors": {}}
+        if self.__xValue is None:
+            self.__xValue = session["X"]
+        if self.__yValue is None:
+            self.__yValue = session["Y"]
+        monitored = {}
+        for name, saved in session["monitors"].items():
+            monitor = self.__monitors[name]
+            mode, parameter = saved.get("thresholdMode", ("fixed", None))
+            if mode == "fixed":
+                monitor.setThreshold(saved["threshold"])
+            monitor.setThresholdMode(mode, parameter)
+            monitored[name] = list(saved["patients"])
+        self.__systolicMonitor.setThreshold(self.__xValue)
+        self.__systolicMonitorHistoric.setThreshold(self.__xValue)
+        self.__diastolicMonitor.setThreshold(self.__yValue)
+        return monitored
+
+    def __monitorPatients(self, monitored):
+        """
+        Fetch the Encounters of the patients to monitor in one bulk fetch and add them to their monitors
+        :param monitored: map of monitor name to the IDs of the patients it monitors
+        :return: None
+        """
+        wanted = [(self.__monitors[name], [patient_id for patient_id in patient_ids
+                                           if self.__practitioner.getPatient(patient_id)])
+                  for name, patient_ids in monitored.items()]
+        try:
+            # the same encounters of each type, from the same window start, as the monitoring group polls for
+            results = self.__monitoringGroup.fetchPatients(wanted)
+        except ServerException as e:
+            self.__lastError = str(e)
+            results = {}
+        with self.__lock:
+            for name, patient_ids in monitored.items():
+                monitor = self.__monitors[name]
+                patients = []
+                for patient_id in patient_ids:
+                    patient = self.__practitioner.getPatient(patient_id)
+                    if patient:
+                        encounters = results.get(patient_id, {})
+                        if monitor is self.__diastolicMonitor and not encounters.get("systolic"):
+                            patients.append(patient.withEncounters(None))  # as the app, no systolic means no data
+                        else:
+                            patients.append(patient.withEncounters(encounters.get(monitor.getEncounterType())))
+                monitor.addAll(patients)
+            self.__monitoringGroup.saveEncounters()
+
+    def update(self):
+        """
+        Fetch the new measurements of every monitor and apply them. A failed fetch keeps the last known values
+        :return: None
+        """
+        try:
+            fetched = self.__monitoringGroup.fetch()
+        except ServerException as e:
+            self.__lastError = str(e)
+            print("Update failed: {0}".format(e))
+            return
+        pushError = self.__monitoringGroup.getPushError()
+        if pushError is not None and pushError is not self.__pushError:
+            print("Subscription failed, polling only: {0}".format(pushError))
+        self.__pushError = pushError
+        with self.__lock:
+            self.__monitoringGroup.apply(fetched)
+            self.__lastUpdated = datetime.datetime.now()
+            self.__lastError = None
+
+    def getPatients(self):
+        """
+        Get the latest measurements of every monitored patient
+        :return: list of maps with the patient's id, name, and for each encounter type a map with the value, date and
+        alert state of the latest measurement, or None if the patient has no measurement or is not monitored for it
+        """
+        with self.__lock:
+            patients = dict()
+            for name in ("cholesterol", "systolic", "diastolic"):
+                monitor = self.__monitors[name]
+                for patient_id, patient in monitor.returnPatients().items():
+                    row = patients.setdefault(patient_id, {"id": patient_id, "name": patient.getFullName(),
+                                                           "cholesterol": None, "systolic": None, "diastolic": None})
+                    encounters = patient.getEncounters()
+                    if encounters:
+                        row[name] = {"value": encounters[0].getValue(), "dateTime": encounters[0].getDateTime(),
+                                     "alert": monitor.getAlerts().isRaised(patient_id)}
+            return list(patients.values())
+
+    def getAlerts(self):
+        """
+        Get the raised alerts of every encounter type
+        :return: map of encounter type to a map with the threshold and the list of patients whose alert is raised,
+        highest value first
+        """
+        with self.__lock:
+            alerts = dict()
+            for name in ("cholesterol", "systolic", "diastolic"):
+                monitor = self.__monitors[name]
+                patients = monitor.returnPatients()
+                raised = []
+                for patient_id in reversed(monitor.getAlerts().getRaised()):
+                    raised.append({"id": patient_id, "name": patients[patient_id].getFullName(),
+                                   "value": patients[patient_id].getEncounters()[0].getValue()})
+                alerts[name] = {"threshold": monitor.getThreshold(), "raised": raised}
+            return alerts
+
+    def getHistory(self, patient_id=None):
+        """
+        Get the historic systolic readings of the patients monitored over time
+        :param patient_id: ID of a patient, or None for every patient
+        :return: map of patient ID to the list of readings as maps with the value and date, latest first
+        """
+        with self.__lock:
+            history = dict()
+            for monitored_id, patient in self.__systolicMonitorHistoric.returnPatients().items():
+                if patient_id is None or monitored_id == patient_id:
+                    history[monitored_id] = [{"value": encounter.getValue(), "dateTime": encounter.getDateTime()}
+                                             for encounter in (patient.getEncounters() or ())]
+            return history
+
+    def getStats(self):
+        """
+        Get the statistics of every encounter type and of the requests made to the server
+        :return: map with the statistics of each encounter type, the request statistics, the time of the last update,
+        the error of the last update if it failed, and whether the server pushes new readings
+        """
+        with self.__lock:
+            stats = {"lastUpdated": self.__lastUpdated.isoformat() if self.__lastUpdated else None,
+                     "lastError": self.__lastError,
+                     "push": {"active": self.__monitoringGroup.isPushActive(),
+                              "error": str(self.__pushError) if self.__pushError else None},
+                     "roster": len(self.__practitioner.returnPatients()) if self.__practitioner else 0,
+                     "requests": self.__wsm.getRequestStats()}
+            for name in ("cholesterol", "systolic", "diastolic"):
+                statistics = self.__monitors[name].getStatistics()
+                stats[name] = {"monitored": self.__monitors[name].getNumPatients(),
+                               "count": statistics.getCount(),
+                               "mean": statistics.getMean(),
+                               "standardDeviation": statistics.getStandardDeviation(),
+                               "median": statistics.getMedian(),
+                               "threshold": self.__monitors[name].getThreshold()}
+            return stats
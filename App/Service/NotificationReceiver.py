@@ -0,0 +1,103 @@
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class NotificationHandler(BaseHTTPRequestHandler):
+    """
+    Accepts the rest-hook notifications of a FHIR server. With a payload, the server sends each new resource with a
+    POST or PUT, e.g. to <endpoint>/Observation/<id>; without one, it POSTs an empty body, a ping asking to poll
+    """
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        try:
+            data = json.loads(body) if body.strip() else None
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        self.server.receive(data)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_PUT = do_POST
+
+    def log_message(self, format, *args):
+        pass  # one line per reading would flood the console, errors are still reported by log_error
+
+
+class NotificationReceiver(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, publicUrl=None):
+        """
+        Constructor for the local HTTP server receiving the Observations a FHIR server pushes to Subscriptions. The
+        notifications are queued and consumed with iterNotifications, on whatever thread owns the monitors
+        :param host: Address to listen on
+        :param port: Port to listen on, or 0 to pick a free one
+        :param publicUrl: url the FHIR server reaches this receiver at, if not http://host:port/ (e.g. behind a proxy)
+        """
+        super().__init__((host, port), NotificationHandler)
+        self.__publicUrl = publicUrl
+        self.__notifications = queue.Queue()  # bodies as dictionaries, None for pings
+        self.__stopped = object()  # queued by stop to end iterNotifications
+        self.__thread = None
+        self.__lastReceived = None
+
+    def getEndpoint(self):
+        """
+        Get the url to give to WebServiceManager.createSubscriptions
+        :return: the url notifications are sent to
+        """
+        if self.__publicUrl:
+            return self.__publicUrl.rstrip("/") + "/notify"
+        return "http://{0}:{1}/notify".format(self.server_address[0], self.server_address[1])
+
+    def getLastReceived(self):
+        """
+        Get the time the last notification arrived
+        :return: seconds since the epoch, or None if no notification arrived yet
+        """
+        return self.__lastReceived
+
+    def receive(self, data):
+        """
+        Queue a notification; called by the handler of each request
+        :param data: the body of the notification as a dictionary, or None for a ping
+        :return: None
+        """
+        self.__lastReceived = time.time()
+        self.__notifications.put(data)
+
+    def iterNotifications(self):
+        """
+        This generator waits for notifications and yields them as they arrive, until stop is called
+        :return: generator of the bodies of the notifications as dictionaries, or None for a ping
+        """
+        while True:
+            data = self.__notifications.get()
+            if data is self.__stopped:
+                return
+            yield data
+
+    def start(self):
+        """
+        Start receiving notifications on a background thread
+        :return: None
+        """
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stop receiving notifications, close the socket and end iterNotifications
+        :return: None
+        """
+        self.shutdown()
+        self.server_close()
+        self.__notifications.put(self.__stopped)
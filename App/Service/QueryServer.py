@@ -0,0 +1,91 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers the GET requests of the query API with JSON:
+    /patients  latest measurements of every monitored patient
+    /alerts    threshold and raised alerts of every encounter type
+    /history   historic systolic readings, of one patient with ?patient=ID
+    /stats     statistics of every encounter type and of the requests made to the FHIR server
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        service = self.server.getService()
+        routes = {"/patients": service.getPatients,
+                  "/alerts": service.getAlerts,
+                  "/history": lambda: service.getHistory(query.get("patient", [None])[0]),
+                  "/stats": service.getStats}
+        route = routes.get(url.path.rstrip("/") or "/")
+        if route is None:
+            self.__send(404, {"error": "Unknown path {0}, try one of {1}".format(url.path, sorted(routes))})
+        else:
+            self.__send(200, route())
+
+    def __send(self, status, body):
+        """
+        Send a JSON answer
+        :param status: HTTP status code
+        :param body: object that can be written as JSON
+        :return: None
+        """
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # queries are frequent and uneventful, errors are still reported by log_error
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service, host="127.0.0.1", port=8077):
+        """
+        Constructor for the local HTTP server answering queries about a MonitoringService. Each request is answered on
+        its own thread from the values the service already holds, so viewers never cause requests to the FHIR server
+        :param service: the MonitoringService queried
+        :param host: Address to listen on; the default only accepts connections from this machine
+        :param port: Port to listen on, or 0 to pick a free one
+        """
+        super().__init__((host, port), QueryHandler)
+        self.__service = service
+        self.__thread = None
+
+    def getService(self):
+        """
+        Get the service queried
+        :return: the MonitoringService
+        """
+        return self.__service
+
+    def getPort(self):
+        """
+        Get the port the server listens on
+        :return: the port number
+        """
+        return self.server_address[1]
+
+    def start(self):
+        """
+        Start answering requests on a background thread
+        :return: None
+        """
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stop answering requests and close the socket
+        :return: None
+        """
+        self.shutdown()
+        self.server_close()
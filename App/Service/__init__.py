@@ -0,0 +1,3 @@
+from .MonitoringService import MonitoringService
+from .NotificationReceiver import NotificationReceiver
+from .QueryServer import QueryServer
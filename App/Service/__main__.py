@@ -0,0 +1,76 @@
+import argparse
+import os
+import signal
+import threading
+
+from ..Model.LocalStore import LocalStore
+from ..Model.WebServiceManager import WebServiceManager
+from .MonitoringService import MonitoringService
+from .NotificationReceiver import NotificationReceiver
+from .QueryServer import QueryServer
+
+
+def main():
+    """
+    Run the monitoring service without a GUI until interrupted, answering queries on a local HTTP port
+    """
+    parser = argparse.ArgumentParser(prog="python -m App.Service",
+                                     description="Monitor patients without a GUI and share the latest values, alerts "
+                                                 "and histories over a local HTTP API.")
+    parser.add_argument("practitioner", help="practitioner ID, or several IDs separated by commas to watch a ward")
+    parser.add_argument("--all", action="store_true",
+                        help="monitor every patient of the roster, not only those of the saved session")
+    parser.add_argument("-n", "--interval", type=int, default=20, help="seconds between updates (default 20)")
+    parser.add_argument("--budget", type=int, default=60,
+                        help="most Observation requests per minute, pages included; quiet patients are polled less "
+                             "often (default 60)")
+    parser.add_argument("-x", type=int, default=None, help="systolic threshold (default: saved session, or 140)")
+    parser.add_argument("-y", type=int, default=None, help="diastolic threshold (default: saved session, or 90)")
+    parser.add_argument("--host", default="127.0.0.1", help="address the API listens on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8077, help="port the API listens on (default 8077)")
+    parser.add_argument("--server", default="https://fhir.monash.edu/hapi-fhir-jpaserver/fhir/",
+                        help="base url of the FHIR server, e.g. http://127.0.0.1:8078/fhir/ for App.Simulator")
+    parser.add_argument("--push-port", type=int, default=None,
+                        help="ask the server to push new readings to this port, polling only as a fallback")
+    parser.add_argument("--push-host", default="127.0.0.1", help="address notifications are received on")
+    parser.add_argument("--push-url", default=None,
+                        help="url the server reaches the notification port at, if not http://push-host:push-port/")
+    parser.add_argument("--fallback-interval", type=int, default=300,
+                        help="seconds between updates while the server pushes new readings (default 300)")
+    parser.add_argument("--database", default=os.path.join(os.path.expanduser("~"), ".patient_monitor.sqlite3"),
+                        help="local store shared with the app (default ~/.patient_monitor.sqlite3)")
+    args = parser.parse_args()
+
+    pracIds = list(dict.fromkeys(pracId.strip() for pracId in args.practitioner.split(",") if pracId.strip()))
+    if not pracIds:
+        parser.error("no practitioner ID given")
+    store = LocalStore(args.database)
+    receiver = None
+    if args.push_port is not None:
+        receiver = NotificationReceiver(args.push_host, args.push_port, args.push_url)
+        receiver.start()
+    service = MonitoringService(WebServiceManager(baseUrl=args.server), store, args.interval, args.x, args.y,
+                                receiver=receiver, pushFallbackInterval=args.fallback_interval,
+                                requestsPerMinute=args.budget)
+    server = QueryServer(service, args.host, args.port)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stopped.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    service.start(pracIds, args.all)
+    server.start()
+    print("Monitoring {0}, answering on http://{1}:{2}/ (/patients, /alerts, /history, /stats)"
+          .format(", ".join(pracIds), args.host, server.getPort()))
+    try:
+        while not stopped.wait(1):
+            pass
+    finally:
+        server.stop()
+        service.stop()
+        if receiver is not None:
+            receiver.stop()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from ..Model.AdaptivePoller import AdaptivePoller
+from ..Model.EventBus import EventBus
+from ..Model.LocalStore import LocalStore
+from ..Model.MonitoringGroup import MonitoringGroup
+from ..Model.MonitoringList import MonitoringList
+from ..Model.MonitoringListAverage import MonitoringListAverage
+from ..Model.Practitioner import Practitioner
+from ..Model.WebServiceManager import WebServiceManager
+from .FhirStandIn import FhirStandIn
+from .Synthetic import Synthetic
+
+
+class Benchmark:
+    # Measures reported for each number of patients, with their unit, in the order they are printed
+    measures = [("login", "ms"), ("loginRequests", ""), ("storedLogin", "ms"), ("tick", "ms"), ("tickRequests", ""),
+                ("memoryPerPatient", "KB"), ("render", "ms")]
+    __encounterTypes = ["cholesterol", "systolic", "diastolic"]
+    # Historic systolic readings kept as by the app, for this many days, up to this many readings
+    __historicDays = 90
+    __historicReadings = 500
+
+    def __init__(self, latency=0.0, readings=6, ticks=3, changed=0.01, seed=0, render=True):
+        """
+        Constructor for the offline benchmark of the app against a FhirStandIn filled with synthetic patients. Each
+        number of patients is measured on a fresh stand-in, with every patient monitored for cholesterol, blood
+        pressure and historic systolic blood pressure
+        :param latency: Seconds each request to the stand-in waits before being answered, to mimic a remote server
+        :param readings: Number of past readings of each type per patient
+        :param ticks: Number of update ticks averaged
+        :param changed: Fraction of the patients given a new reading before each tick, at least one
+        :param seed: Seed of the synthetic data, so runs compare the same data
+        :param render: False to skip drawing the window, which needs a display
+        """
+        self.__latency = latency
+        self.__readings = readings
+        self.__ticks = ticks
+        self.__changed = changed
+        self.__seed = seed
+        self.__render = render
+
+    def run(self, patients):
+        """
+        Measure the app with a number of patients
+        :param patients: number of patients of the practitioner, all of them monitored
+        :return: map of measure name to value, None for a measure that could not be taken
+        """
+        standIn = FhirStandIn()
+        synthetic = Synthetic(standIn, self.__seed)
+        pracId = synthetic.populate(1, patients, self.__readings)[0]
+        standIn.start()
+        standIn.setLatency(self.__latency)
+        directory = tempfile.mkdtemp()
+        try:
+            results = dict()
+            practitioner = self.__measureLogin(standIn, pracId, results)
+            self.__measureStoredLogin(standIn, pracId, os.path.join(directory, "login.sqlite3"), results)
+            roster = list(practitioner.returnPatients().values())
+            encounters = WebServiceManager(baseUrl=standIn.getBaseUrl()).fetchEncountersBulk(
+                [patient.getId() for patient in roster], self.__encounterTypes,
+                {patient.getId(): {"cholesterol": 1, "systolic": self.__historicReadings, "diastolic": 1}
+                 for patient in roster})
+            self.__measureMemory(roster, encounters, results)
+            self.__measureTick(standIn, synthetic, roster, encounters, os.path.join(directory, "tick.sqlite3"),
+                               results)
+            results["render"] = self.__measureRender(standIn, roster, encounters,
+                                                     os.path.join(directory, "render.sqlite3")) \
+                if self.__render else None
+            return results
+        finally:
+            standIn.stop()
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+
+    def __measureLogin(self, standIn, pracId, results):
+        """
+        Measure the login of a practitioner without a store, until the whole roster is known
+        :param standIn: the FhirStandIn serving the practitioner
+        :param pracId: ID of the practitioner
+        :param results: map the login time and number of requests are added to
+        :return: the Practitioner logged in
+        """
+        standIn.resetRequestCounts()
+        start = time.perf_counter()
+        practitioner = Practitioner(pracId, WebServiceManager(baseUrl=standIn.getBaseUrl()))
+        results["login"] = (time.perf_counter() - start) * 1000
+        results["loginRequests"] = sum(standIn.getRequestCounts().values())
+        return practitioner
+
+    def __measureStoredLogin(self, standIn, pracId, path, results):
+        """
+        Measure the login of a practitioner whose roster was stored by the last login, until it can be shown
+        :param standIn: the FhirStandIn serving the practitioner
+        :param pracId: ID of the practitioner
+        :param path: path of the LocalStore to create
+        :param results: map the login time is added to
+        :return: None
+        """
+        store = LocalStore(path)
+        try:
+            Practitioner(pracId, WebServiceManager(baseUrl=standIn.getBaseUrl()), True, store)
+            start = time.perf_counter()
+            Practitioner(pracId, WebServiceManager(baseUrl=standIn.getBaseUrl()), False, store).returnPatients()
+            results["storedLogin"] = (time.perf_counter() - start) * 1000
+        finally:
+            store.close()
+
+    def __createMonitors(self, wsm, roster, encounters):
+        """
+        Create the monitors of the app as ViewController does, each monitoring every patient of the roster
+        :param wsm: WebServiceManager of the monitors
+        :param roster: list of Patients
+        :param encounters: map of patient id to a map of encounter type to list of Encounters, latest first
+        :return: list of the MonitoringLists
+        """
+        eventBus = EventBus()
+        monitors = [MonitoringListAverage("cholesterol", wsm, eventBus),
+                    MonitoringList("systolic", wsm, 140, 1, None, 2, eventBus),
+                    MonitoringList("systolic", wsm, 140, self.__historicReadings, self.__historicDays * 24 * 3600, 0,
+                                   eventBus),
+                    MonitoringList("diastolic", wsm, 90, 1, None, 2, eventBus)]
+        for monitor in monitors:
+            encounterType = monitor.getEncounterType()
+            monitor.addAll([patient.withEncounters(
+                (encounters.get(patient.getId(), {}).get(encounterType) or [])[:monitor.getNumHistoric()])
+                for patient in roster])
+        return monitors
+
+    def __measureMemory(self, roster, encounters, results):
+        """
+        Measure the memory the monitors take per patient, the roster and the downloaded Encounters aside
+        :param roster: list of Patients
+        :param encounters: map of patient id to a map of encounter type to list of Encounters, latest first
+        :param results: map the memory per patient is added to
+        :return: None
+        """
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            monitors = self.__createMonitors(None, roster, encounters)
+            results["memoryPerPatient"] = (tracemalloc.get_traced_memory()[0] - before) / len(roster) / 1024
+            del monitors  # only kept alive until the memory they take was measured
+        finally:
+            tracemalloc.stop()
+
+    def __measureTick(self, standIn, synthetic, roster, encounters, path, results):
+        """
+        Measure an update tick, fetching and applying the new readings of a few patients, with the monitors, store and
+        poller of the app, and every patient polled
+        :param standIn: the FhirStandIn serving the patients
+        :param synthetic: the Synthetic the patients were added with
+        :param roster: list of Patients
+        :param encounters: map of patient id to a map of encounter type to list of Encounters, latest first
+        :param path: path of the LocalStore to create
+        :param results: map the mean tick time and number of requests are added to
+        :return: None
+        """
+        wsm = WebServiceManager(baseUrl=standIn.getBaseUrl())
+        store = LocalStore(path)
+        try:
+            # every patient is due on every tick and the budget never runs out, so each tick is the worst case
+            poller = AdaptivePoller(wsm, 0, requestsPerMinute=10 ** 9)
+            group = MonitoringGroup(wsm, self.__createMonitors(wsm, roster, encounters), store, poller)
+            group.apply(group.fetch())  # the first tick only sets the watermarks
+            elapsed = 0.0
+            standIn.resetRequestCounts()
+            for _ in range(self.__ticks):
+                synthetic.addRandomReadings(max(1, int(len(roster) * self.__changed)))
+                start = time.perf_counter()
+                group.apply(group.fetch())
+                elapsed += time.perf_counter() - start
+            results["tick"] = elapsed / self.__ticks * 1000
+            results["tickRequests"] = sum(standIn.getRequestCounts().values()) / self.__ticks
+        finally:
+            store.close()
+
+    def __measureRender(self, standIn, roster, encounters, path):
+        """
+        Measure the app drawing its tables and graph once every patient is monitored, as when a session is restored
+        :param standIn: the FhirStandIn serving the patients
+        :param roster: list of Patients
+        :param encounters: map of patient id to a map of encounter type to list of Encounters, latest first
+        :param path: path of the LocalStore to create
+        :return: milliseconds, or None without a display
+        """
+        import tkinter as tk
+        from ..Controller.ViewController import ViewController  # needs tkinter and matplotlib, unlike the rest
+        try:
+            root = tk.Tk()
+        except tk.TclError:
+            return None
+        viewController = ViewController(root, WebServiceManager(baseUrl=standIn.getBaseUrl()), LocalStore(path))
+        root.update()
+        start = time.perf_counter()
+        viewController.addSessionPatients({name: roster for name in self.__encounterTypes}, encounters, False)
+        root.update()
+        elapsed = (time.perf_counter() - start) * 1000
+        viewController.close()
+        return elapsed
+
+
+def compare(results, baseline, tolerance):
+    """
+    Find the measures worse than a baseline run
+    :param results: map of number of patients to the results of Benchmark.run
+    :param baseline: results of an earlier run, in the same form
+    :param tolerance: ratio to the baseline above which a measure is reported
+    :return: list of (number of patients, measure, value, baseline value)
+    """
+    regressions = []
+    for patients, measures in results.items():
+        for measure, value in measures.items():
+            old = baseline.get(patients, {}).get(measure)
+            if value is not None and old and value > old * tolerance:
+                regressions.append((patients, measure, value, old))
+    return regressions
+
+
+def main():
+    """
+    Run the benchmark for several numbers of patients, print a table, and compare it with a baseline if given
+    """
+    parser = argparse.ArgumentParser(prog="python -m App.Simulator.Benchmark",
+                                     description="Measure login time, update cost, memory and render time of the app "
+                                                 "against a local stand-in FHIR server with synthetic patients.")
+    parser.add_argument("sizes", type=int, nargs="*", default=[10, 100, 1000, 10000],
+                        help="numbers of patients to measure (default 10 100 1000 10000)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds each request waits before being answered (default 0)")
+    parser.add_argument("--readings", type=int, default=6, help="past readings per patient and type (default 6)")
+    parser.add_argument("--ticks", type=int, default=3, help="update ticks averaged (default 3)")
+    parser.add_argument("--changed", type=float, default=0.01,
+                        help="fraction of the patients with a new reading at each tick (default 0.01)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data (default 0)")
+    parser.add_argument("--no-render", action="store_true", help="skip the render time, which needs a display")
+    parser.add_argument("--save", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON file written by --save with the same options to compare with; exits with 1 on a "
+                             "regression")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="ratio to the baseline reported as a regression (default 1.5)")
+    args = parser.parse_args()
+
+    benchmark = Benchmark(args.latency, args.readings, args.ticks, args.changed, args.seed, not args.no_render)
+    headers = ["patients"] + ["{0} ({1})".format(measure, unit) if unit else measure
+                              for measure, unit in Benchmark.measures]
+    print("  ".join(headers))
+    results = dict()
+    for size in args.sizes:
+        results[str(size)] = benchmark.run(size)
+        values = [str(size)] + ["n/a" if results[str(size)][measure] is None else
+                                "{0:.1f}".format(results[str(size)][measure]) for measure, unit in Benchmark.measures]
+        print("  ".join(value.rjust(len(header)) for header, value in zip(headers, values)), flush=True)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for patients, measure, value, old in regressions:
+            print("Regression with {0} patients: {1} {2:.1f}, was {3:.1f}".format(patients, measure, value, old))
+        if regressions:
+            sys.exit(1)
+        print("No regression against {0}".format(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,486 @@
+import datetime
+import hashlib
+import json
+import queue
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+class FhirStandInHandler(BaseHTTPRequestHandler):
+    """
+    Answers the requests made by WebServiceManager from the data of a FhirStandIn
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        status, body = self.server.handleGet(url.path, parse_qs(url.query))
+        self.__answer(status, body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            data = json.loads(self.rfile.read(length)) if length else None
+        except ValueError:
+            data = None
+        status, body = self.server.handlePost(urlparse(self.path).path, data)
+        self.__answer(status, body)
+
+    def do_DELETE(self):
+        status, body = self.server.handleDelete(urlparse(self.path).path)
+        self.__answer(status, body)
+
+    def __answer(self, status, body):
+        """
+        Send a JSON answer with an ETag, or 304 if the client already has it
+        :param status: HTTP status code
+        :param body: dictionary to send, or None for no body
+        :return: None
+        """
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        etag = 'W/"{0}"'.format(hashlib.md5(data).hexdigest())
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        if body is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "application/fhir+json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # benchmarks make thousands of requests, errors are still reported by log_error
+
+
+class FhirStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+    __identifierSystem = "http://standin.local/practitioner"
+    __cholesterolCode = "2093-3"
+    __bloodPressureCode = "55284-4"
+    __systolicCode = "8480-6"
+    __diastolicCode = "8462-4"
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, pageSize=50):
+        """
+        Constructor for an in-memory FHIR server answering the searches made by WebServiceManager, so the app can be
+        run and measured offline. It also accepts rest-hook Subscriptions and pushes matching Observations to them as
+        they are added
+        :param host: Address to listen on
+        :param port: Port to listen on, or 0 to pick a free one
+        :param latency: Seconds each request waits before being answered, to mimic a remote server
+        :param pageSize: Number of Encounters per page of a practitioner's roster
+        """
+        super().__init__((host, port), FhirStandInHandler)
+        self.__latency = latency
+        self.__pageSize = pageSize
+        self.__lock = threading.Lock()
+        self.__rosters = dict()  # practitioner ID to the IDs of their patients
+        self.__patients = dict()  # patient ID to Patient resource
+        self.__observations = dict()  # patient ID to list of (issued timestamp, lastUpdated timestamp, resource)
+        self.__lastUpdated = 0.0  # lastUpdated of the newest Observation, kept strictly increasing
+        self.__subscriptions = dict()  # Subscription ID to (resource, patient IDs, codes)
+        self.__subscriptionCount = 0  # Subscriptions created, numbering their IDs
+        self.__deliveries = queue.Queue()  # (endpoint, Observation) to push, or None to stop
+        self.__requestCounts = dict()  # resource type to number of requests
+        self.__threads = []
+
+    def getBaseUrl(self):
+        """
+        Get the base url to give to WebServiceManager
+        :return: the url, ending with a slash
+        """
+        return "http://{0}:{1}/fhir/".format(self.server_address[0], self.server_address[1])
+
+    def getRequestCounts(self):
+        """
+        Get the number of requests answered so far
+        :return: map of resource type (e.g. "Observation") to number of requests
+        """
+        with self.__lock:
+            return dict(self.__requestCounts)
+
+    def resetRequestCounts(self):
+        """
+        Forget the requests answered so far
+        :return: None
+        """
+        with self.__lock:
+            self.__requestCounts.clear()
+
+    def setLatency(self, latency):
+        """
+        Change the seconds each request waits before being answered
+        :param latency: seconds
+        :return: None
+        """
+        self.__latency = latency
+
+    def start(self):
+        """
+        Start answering requests and pushing notifications on background threads
+        :return: None
+        """
+        self.__threads = [threading.Thread(target=self.serve_forever, daemon=True),
+                          threading.Thread(target=self.__deliver, daemon=True)]
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stop answering requests and pushing notifications, and close the socket
+        :return: None
+        """
+        self.shutdown()
+        self.server_close()
+        self.__deliveries.put(None)
+
+    def addPractitioner(self, pracId, patient_ids):
+        """
+        Add a practitioner, or add patients to the roster of one
+        :param pracId: ID of the practitioner
+        :param patient_ids: IDs of patients added with addPatient
+        :return: None
+        """
+        with self.__lock:
+            roster = self.__rosters.setdefault(pracId, [])
+            roster.extend(patient_id for patient_id in patient_ids if patient_id not in roster)
+
+    def getRoster(self, pracId):
+        """
+        Get the patients of a practitioner
+        :param pracId: ID of the practitioner
+        :return: list of patient IDs, empty for an unknown practitioner
+        """
+        with self.__lock:
+            return list(self.__rosters.get(pracId, ()))
+
+    def addPatient(self, patient_id, given, family, birthDate="1970-01-01", gender="unknown", street="1 Main St",
+                   city="Clayton", state="VIC", country="AU"):
+        """
+        Add a patient
+        :param patient_id: ID of the patient
+        :param given: given name
+        :param family: family name
+        :param birthDate: date of birth in ISO 8601 format
+        :param gender: gender
+        :param street: street of the address
+        :param city: city of the address
+        :param state: state of the address
+        :param country: country of the address
+        :return: None
+        """
+        with self.__lock:
+            self.__patients[patient_id] = {
+                "resourceType": "Patient", "id": patient_id, "birthDate": birthDate, "gender": gender,
+                "name": [{"given": [given], "family": family}],
+                "address": [{"line": [street], "city": city, "state": state, "country": country}]}
+
+    def addCholesterol(self, patient_id, issued, value):
+        """
+        Add a total cholesterol Observation, pushed to the matching Subscriptions
+        :param patient_id: ID of the patient
+        :param issued: date and time of the reading in ISO 8601 format
+        :param value: the reading in mg/dL
+        :return: the Observation resource
+        """
+        return self.__addObservation(patient_id, issued, self.__cholesterolCode,
+                                     {"valueQuantity": {"value": value, "unit": "mg/dL"}})
+
+    def addBloodPressure(self, patient_id, issued, systolic, diastolic):
+        """
+        Add a blood pressure Observation, pushed to the matching Subscriptions
+        :param patient_id: ID of the patient
+        :param issued: date and time of the reading in ISO 8601 format
+        :param systolic: systolic reading in mmHg
+        :param diastolic: diastolic reading in mmHg
+        :return: the Observation resource
+        """
+        return self.__addObservation(patient_id, issued, self.__bloodPressureCode, {"component": [
+            {"code": {"coding": [{"code": self.__systolicCode}]},
+             "valueQuantity": {"value": systolic, "unit": "mm[Hg]"}},
+            {"code": {"coding": [{"code": self.__diastolicCode}]},
+             "valueQuantity": {"value": diastolic, "unit": "mm[Hg]"}}]})
+
+    def __addObservation(self, patient_id, issued, code, values):
+        """
+        Add an Observation and queue it for the Subscriptions it matches
+        :param patient_id: ID of the patient
+        :param issued: date and time of the reading in ISO 8601 format
+        :param code: LOINC code of the Observation
+        :param values: the value fields of the resource, e.g. valueQuantity
+        :return: the Observation resource
+        """
+        with self.__lock:
+            # kept as written in the resource, so a client's _lastUpdated=gt filter excludes it exactly
+            self.__lastUpdated = self.__parseInstant(self.__formatInstant(max(time.time(),
+                                                                              self.__lastUpdated + 0.001)))
+            observations = self.__observations.setdefault(patient_id, [])
+            resource = {"resourceType": "Observation",
+                        "id": "{0}-{1}".format(patient_id, len(observations)),
+                        "status": "final",
+                        "meta": {"lastUpdated": self.__formatInstant(self.__lastUpdated)},
+                        "code": {"coding": [{"system": "http://loinc.org", "code": code}]},
+                        "subject": {"reference": "Patient/" + patient_id},
+                        "issued": issued}
+            resource.update(values)
+            observations.append((self.__parseInstant(issued), self.__lastUpdated, resource))
+            now = time.time()
+            for subscription, patient_ids, codes in list(self.__subscriptions.values()):
+                if "end" in subscription and self.__parseInstant(subscription["end"]) < now:
+                    del self.__subscriptions[subscription["id"]]
+                elif patient_id in patient_ids and code in codes:
+                    self.__deliveries.put((subscription["channel"]["endpoint"], resource))
+        return resource
+
+    def saveFixture(self, path):
+        """
+        Record the practitioners, patients and Observations served, so the same data can be served again with
+        loadFixture, e.g. to compare benchmark runs or share a reproducible case
+        :param path: path of the JSON file to write
+        :return: None
+        """
+        with self.__lock:
+            fixture = {"rosters": self.__rosters, "patients": list(self.__patients.values()),
+                       "observations": [resource for observations in self.__observations.values()
+                                        for issued, lastUpdated, resource in observations]}
+            with open(path, "w") as file:
+                json.dump(fixture, file)
+
+    def loadFixture(self, path):
+        """
+        Serve the practitioners, patients and Observations recorded by saveFixture, in addition to the ones already
+        added. Observations keep their lastUpdated, and the ones added later come after them
+        :param path: path of the JSON file to read
+        :return: list of the practitioner IDs loaded
+        """
+        with open(path) as file:
+            fixture = json.load(file)
+        with self.__lock:
+            for pracId, patient_ids in fixture["rosters"].items():
+                roster = self.__rosters.setdefault(pracId, [])
+                roster.extend(patient_id for patient_id in patient_ids if patient_id not in roster)
+            for resource in fixture["patients"]:
+                self.__patients[resource["id"]] = resource
+            for resource in fixture["observations"]:
+                patient_id = resource["subject"]["reference"].split("/")[-1]
+                lastUpdated = self.__parseInstant(resource["meta"]["lastUpdated"])
+                self.__observations.setdefault(patient_id, []).append((self.__parseInstant(resource["issued"]),
+                                                                        lastUpdated, resource))
+                self.__lastUpdated = max(self.__lastUpdated, lastUpdated)
+        return list(fixture["rosters"])
+
+    def __deliver(self):
+        """
+        Push the queued Observations to their Subscriptions' endpoints, as a FHIR server does for rest-hook channels
+        with a payload
+        :return: None
+        """
+        while True:
+            delivery = self.__deliveries.get()
+            if delivery is None:
+                return
+            endpoint, resource = delivery
+            request = urllib.request.Request("{0}/Observation/{1}".format(endpoint.rstrip("/"), resource["id"]),
+                                             data=json.dumps(resource).encode("utf-8"), method="PUT",
+                                             headers={"Content-Type": "application/fhir+json"})
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+            except OSError:
+                pass  # the subscriber is gone; a real server would retry, then mark the Subscription as errored
+
+    def __formatInstant(self, timestamp):
+        """
+        Write a FHIR instant
+        :param timestamp: seconds since the epoch
+        :return: the instant in ISO 8601 format with a UTC offset
+        """
+        return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat(timespec="microseconds")
+
+    def __parseInstant(self, instant):
+        """
+        Read a FHIR instant
+        :param instant: the instant in ISO 8601 format
+        :return: seconds since the epoch
+        """
+        return datetime.datetime.fromisoformat(instant.replace("Z", "+00:00")).timestamp()
+
+    def __resourcePath(self, path):
+        """
+        Split the path of a request below /fhir/
+        :param path: the path of the request
+        :return: list of the path segments, e.g. ["Patient", "1000"]
+        """
+        path = path.strip("/")
+        if path.startswith("fhir"):
+            path = path[len("fhir"):]
+        parts = [part for part in path.split("/") if part]
+        if self.__latency:
+            time.sleep(self.__latency)
+        with self.__lock:
+            resource_type = parts[0] if parts else ""
+            self.__requestCounts[resource_type] = self.__requestCounts.get(resource_type, 0) + 1
+        return parts
+
+    def __notFound(self, message):
+        """
+        Build the answer for a resource or search that does not exist
+        :param message: what is missing
+        :return: status and OperationOutcome
+        """
+        return 404, {"resourceType": "OperationOutcome",
+                     "issue": [{"severity": "error", "code": "not-found", "diagnostics": message}]}
+
+    def handleGet(self, path, query):
+        """
+        Answer a read or a search
+        :param path: the path of the request
+        :param query: the parameters of the request, as returned by parse_qs
+        :return: status and body
+        """
+        parts = self.__resourcePath(path)
+        with self.__lock:
+            if len(parts) == 2 and parts[0] == "Practitioner" and parts[1] in self.__rosters:
+                return 200, {"resourceType": "Practitioner", "id": parts[1],
+                             "identifier": [{"system": self.__identifierSystem, "value": parts[1]}]}
+            if len(parts) == 2 and parts[0] == "Patient" and parts[1] in self.__patients:
+                return 200, self.__patients[parts[1]]
+            if parts == ["Encounter"]:
+                return self.__searchEncounters(path, query)
+            if parts == ["Observation"]:
+                return self.__searchObservations(path, query)
+        return self.__notFound("/".join(parts))
+
+    def handlePost(self, path, data):
+        """
+        Create a Subscription
+        :param path: the path of the request
+        :param data: the body of the request as a dictionary
+        :return: status and body
+        """
+        parts = self.__resourcePath(path)
+        if parts != ["Subscription"] or not data or data.get("resourceType") != "Subscription":
+            return 400, {"resourceType": "OperationOutcome",
+                         "issue": [{"severity": "error", "code": "not-supported"}]}
+        criteria = urlparse(data.get("criteria", ""))
+        channel = data.get("channel", {})
+        if criteria.path != "Observation" or channel.get("type") != "rest-hook" or not channel.get("endpoint"):
+            return 422, {"resourceType": "OperationOutcome",
+                         "issue": [{"severity": "error", "code": "invalid",
+                                    "diagnostics": "Only rest-hook Subscriptions to Observations are supported"}]}
+        parameters = parse_qs(criteria.query)
+        patient_ids = set(",".join(parameters.get("patient", [])).split(","))
+        codes = set(",".join(parameters.get("code", [])).split(","))
+        with self.__lock:
+            self.__subscriptionCount += 1
+            subscription = dict(data, id=str(self.__subscriptionCount), status="active")
+            self.__subscriptions[subscription["id"]] = (subscription, patient_ids, codes)
+        return 201, subscription
+
+    def getSubscriptionCount(self):
+        """
+        Get the number of active Subscriptions
+        :return: number of Subscriptions
+        """
+        with self.__lock:
+            return len(self.__subscriptions)
+
+    def handleDelete(self, path):
+        """
+        Delete a Subscription
+        :param path: the path of the request
+        :return: status and body
+        """
+        parts = self.__resourcePath(path)
+        with self.__lock:
+            if len(parts) == 2 and parts[0] == "Subscription" and parts[1] in self.__subscriptions:
+                del self.__subscriptions[parts[1]]
+                return 204, None
+        return self.__notFound("/".join(parts))
+
+    def __nextLink(self, path, query, offset):
+        """
+        Build the url of the next page of a search
+        :param path: the path of the request
+        :param query: the parameters of the request
+        :param offset: index of the first result of the next page
+        :return: the url
+        """
+        parameters = dict(query, _offset=[str(offset)])
+        return "http://{0}:{1}{2}?{3}".format(self.server_address[0], self.server_address[1], path,
+                                              urlencode(parameters, doseq=True))
+
+    def __searchEncounters(self, path, query):
+        """
+        Answer the search of a practitioner's Encounters, with their subjects included
+        :param path: the path of the request
+        :param query: the parameters of the request
+        :return: status and Bundle
+        """
+        identifier = query.get("participant.identifier", [""])[0]
+        pracId = identifier.split("|")[-1]
+        if pracId not in self.__rosters:
+            return 200, {"resourceType": "Bundle", "type": "searchset", "total": 0,
+                         "link": [{"relation": "self", "url": path}]}
+        roster = self.__rosters[pracId]
+        offset = int(query.get("_offset", ["0"])[0])
+        page = roster[offset:offset + self.__pageSize]
+        entries = [{"resource": {"resourceType": "Encounter", "id": "{0}-{1}".format(pracId, patient_id),
+                                 "subject": {"reference": "Patient/" + patient_id},
+                                 "participant": [{"individual": {"reference": "Practitioner/" + pracId}}]}}
+                   for patient_id in page]
+        includes = query.get("_include", [])
+        if "Encounter.subject" in includes:
+            entries += [{"resource": self.__patients[patient_id], "search": {"mode": "include"}}
+                        for patient_id in page if patient_id in self.__patients]
+        links = [{"relation": "self", "url": path}]
+        if offset + self.__pageSize < len(roster):
+            links.append({"relation": "next", "url": self.__nextLink(path, query, offset + self.__pageSize)})
+        return 200, {"resourceType": "Bundle", "type": "searchset", "total": len(roster), "link": links,
+                     "entry": entries}
+
+    def __searchObservations(self, path, query):
+        """
+        Answer the search of the Observations of some patients and codes, latest first
+        :param path: the path of the request
+        :param query: the parameters of the request
+        :return: status and Bundle
+        """
+        patient_ids = ",".join(query.get("patient", [])).split(",")
+        codes = set(",".join(query.get("code", [])).split(","))
+        updatedAfter = None
+        for value in query.get("_lastUpdated", []):
+            if value.startswith("gt"):
+                updatedAfter = self.__parseInstant(value[2:])
+        issuedFrom = None
+        for value in query.get("date", []):
+            if value.startswith("ge"):
+                issuedFrom = self.__parseInstant(value[2:])
+
+        matches = []
+        for patient_id in dict.fromkeys(patient_ids):
+            for issued, lastUpdated, resource in self.__observations.get(patient_id, ()):
+                if resource["code"]["coding"][0]["code"] not in codes:
+                    continue
+                if updatedAfter is not None and lastUpdated <= updatedAfter:
+                    continue
+                if issuedFrom is not None and issued < issuedFrom:
+                    continue
+                matches.append((issued, resource))
+        matches.sort(key=lambda match: match[0], reverse=True)
+
+        count = int(query.get("_count", ["100"])[0])
+        offset = int(query.get("_offset", ["0"])[0])
+        page = matches[offset:offset + count]
+        links = [{"relation": "self", "url": path}]
+        if offset + count < len(matches):
+            links.append({"relation": "next", "url": self.__nextLink(path, query, offset + count)})
+        bundle = {"resourceType": "Bundle", "type": "searchset", "total": len(matches), "link": links}
+        if page:
+            bundle["entry"] = [{"resource": resource} for issued, resource in page]
+        return 200, bundle
@@ -0,0 +1,105 @@
+import datetime
+import random
+
+
+class Synthetic:
+    __givenNames = ["Ava", "Ben", "Chloe", "Dan", "Ella", "Finn", "Grace", "Hugo", "Isla", "Jack", "Kate", "Liam",
+                    "Mia", "Noah", "Olivia", "Patrick", "Ruby", "Sam", "Tara", "Will"]
+    __familyNames = ["Nguyen", "Smith", "Jones", "Williams", "Brown", "Wilson", "Taylor", "Johnson", "White",
+                     "Martin", "Anderson", "Thompson", "Walker", "Harris", "Lee", "Ryan", "Robinson", "Kelly"]
+
+    def __init__(self, standIn, seed=0):
+        """
+        Constructor for the generator of realistic looking practitioners, patients and readings for a FhirStandIn.
+        The same seed always gives the same data
+        :param standIn: the FhirStandIn to fill
+        :param seed: seed of the random numbers
+        """
+        self.__standIn = standIn
+        self.__random = random.Random(seed)
+        self.__levels = dict()  # patient ID to (cholesterol, systolic, diastolic) the readings wander around
+        self.__nextPatientId = 10000
+
+    def populate(self, practitioners=1, patients=20, readings=6, interval=7 * 24 * 3600, shared=0, firstPracId=3337):
+        """
+        Add practitioners, each with their own patients, and a history of cholesterol and blood pressure readings
+        :param practitioners: number of practitioners
+        :param patients: number of patients of each practitioner
+        :param readings: number of readings of each type per patient
+        :param interval: seconds between two readings of a patient, the latest being now
+        :param shared: number of patients of each practitioner also in the roster of the next one, as in a ward
+        :param firstPracId: ID of the first practitioner; the others follow
+        :return: list of the practitioner IDs added
+        """
+        pracIds = []
+        previous = []
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for n in range(practitioners):
+            pracId = str(firstPracId + n)
+            roster = previous[:shared]
+            for _ in range(patients - len(roster)):
+                patient_id = self.addPatient()
+                for k in range(readings - 1, -1, -1):
+                    self.addReadings(patient_id, now - datetime.timedelta(seconds=k * interval))
+                roster.append(patient_id)
+            self.__standIn.addPractitioner(pracId, roster)
+            pracIds.append(pracId)
+            previous = roster[len(roster) - shared:] if shared else []
+        return pracIds
+
+    def addPatient(self):
+        """
+        Add a patient with a random name and the levels their readings wander around
+        :return: the ID of the patient
+        """
+        patient_id = str(self.__nextPatientId)
+        self.__nextPatientId += 1
+        self.__standIn.addPatient(patient_id, self.__random.choice(self.__givenNames),
+                                  self.__random.choice(self.__familyNames),
+                                  "{0}-{1:02d}-{2:02d}".format(self.__random.randint(1930, 2000),
+                                                               self.__random.randint(1, 12),
+                                                               self.__random.randint(1, 28)),
+                                  self.__random.choice(["male", "female"]))
+        self.__levels[patient_id] = (self.__random.gauss(190, 30), self.__random.gauss(128, 14),
+                                     self.__random.gauss(82, 8))
+        return patient_id
+
+    def adoptPatients(self, patient_ids):
+        """
+        Give patients already served, e.g. loaded from a fixture, levels their new readings wander around, so
+        addRandomReadings also picks them. Patients added later get IDs after theirs
+        :param patient_ids: IDs of the patients
+        :return: None
+        """
+        for patient_id in patient_ids:
+            if patient_id not in self.__levels:
+                self.__levels[patient_id] = (self.__random.gauss(190, 30), self.__random.gauss(128, 14),
+                                             self.__random.gauss(82, 8))
+            if patient_id.isdigit():
+                self.__nextPatientId = max(self.__nextPatientId, int(patient_id) + 1)
+
+    def addReadings(self, patient_id, issued=None):
+        """
+        Add a cholesterol and a blood pressure reading close to the levels of a patient
+        :param patient_id: ID of a patient added with addPatient
+        :param issued: datetime of the readings, now if None
+        :return: None
+        """
+        if issued is None:
+            issued = datetime.datetime.now(datetime.timezone.utc)
+        cholesterol, systolic, diastolic = self.__levels[patient_id]
+        issued = issued.isoformat(timespec="milliseconds")
+        self.__standIn.addCholesterol(patient_id, issued, round(self.__random.gauss(cholesterol, 8), 1))
+        self.__standIn.addBloodPressure(patient_id, issued, round(self.__random.gauss(systolic, 6)),
+                                        round(self.__random.gauss(diastolic, 4)))
+
+    def addRandomReadings(self, count=1):
+        """
+        Add readings taken now for patients picked at random, e.g. to watch the monitors react
+        :param count: number of patients given new readings
+        :return: list of the IDs of the patients given new readings
+        """
+        patient_ids = self.__random.sample(list(self.__levels), min(count, len(self.__levels)))
+        for patient_id in patient_ids:
+            self.addReadings(patient_id)
+        return patient_ids
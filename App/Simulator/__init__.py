@@ -0,0 +1,2 @@
+from .FhirStandIn import FhirStandIn
+from .Synthetic import Synthetic
@@ -0,0 +1,54 @@
+import argparse
+import threading
+
+from .FhirStandIn import FhirStandIn
+from .Synthetic import Synthetic
+
+
+def main():
+    """
+    Run a stand-in FHIR server with synthetic or recorded patients until interrupted, adding new readings as time
+    goes by
+    """
+    parser = argparse.ArgumentParser(prog="python -m App.Simulator",
+                                     description="Serve synthetic practitioners, patients and readings as a local "
+                                                 "FHIR server, which also pushes new readings to Subscriptions.")
+    parser.add_argument("--port", type=int, default=8078, help="port to listen on (default 8078)")
+    parser.add_argument("--practitioners", type=int, default=1, help="number of practitioners (default 1)")
+    parser.add_argument("--patients", type=int, default=20, help="patients per practitioner (default 20)")
+    parser.add_argument("--readings", type=int, default=6, help="past readings per patient and type (default 6)")
+    parser.add_argument("--every", type=float, default=5, help="seconds between new readings (default 5)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds each request waits before being answered (default 0)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data (default 0)")
+    parser.add_argument("--fixture", default=None,
+                        help="serve the data recorded in this JSON file instead of generating it")
+    parser.add_argument("--record", default=None, help="record the data served at start to this JSON file")
+    args = parser.parse_args()
+
+    standIn = FhirStandIn(port=args.port, latency=args.latency)
+    synthetic = Synthetic(standIn, args.seed)
+    if args.fixture:
+        pracIds = standIn.loadFixture(args.fixture)
+        for pracId in pracIds:
+            synthetic.adoptPatients(standIn.getRoster(pracId))
+    else:
+        pracIds = synthetic.populate(args.practitioners, args.patients, args.readings)
+    if args.record:
+        standIn.saveFixture(args.record)
+    standIn.start()
+    print("Serving {0} patients on {1} for practitioner(s) {2}".format(
+        len({patient_id for pracId in pracIds for patient_id in standIn.getRoster(pracId)}), standIn.getBaseUrl(),
+        ", ".join(pracIds)))
+    stopped = threading.Event()
+    try:
+        while not stopped.wait(args.every):
+            print("New readings for patient(s) {0}".format(", ".join(synthetic.addRandomReadings())))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standIn.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+class TreeReconciler:
+
+    def __init__(self, tree):
+        """
+        Constructor for the keyed renderer of a Treeview. Rows are identified by their iid, and each render only
+        inserts, changes or deletes the rows that differ from the previous render, keeping scroll position and selection
+        :param tree: the ttk.Treeview to render into
+        """
+        self.__tree = tree
+        self.__rows = dict()  # iid to (values, tags) as last rendered
+        self.__order = []  # iids in the order last rendered
+
+    def render(self, rows):
+        """
+        This function makes the tree show exactly the given rows
+        :param rows: list of (iid, values, tags) in display order, where iid is a unique string such as a patient ID
+        """
+        new_rows = dict()
+        inserted = []
+        for iid, values, tags in rows:
+            row = (tuple(values), tuple(tags))
+            new_rows[iid] = row
+            old_row = self.__rows.get(iid)
+            if old_row is None:
+                self.__tree.insert("", "end", iid=iid, values=row[0], tags=row[1])
+                inserted.append(iid)
+            elif old_row != row:
+                self.__tree.item(iid, values=row[0], tags=row[1])
+
+        current_order = []
+        for iid in self.__order:
+            if iid in new_rows:
+                current_order.append(iid)
+            else:
+                self.__tree.delete(iid)
+        current_order.extend(inserted)
+
+        order = list(new_rows)
+        if current_order != order:  # only move rows when the order actually changed
+            for index, iid in enumerate(order):
+                if current_order[index] != iid:
+                    self.__tree.move(iid, "", index)
+                    current_order.remove(iid)
+                    current_order.insert(index, iid)
+        self.__rows = new_rows
+        self.__order = order
+
+    def update(self, rows):
+        """
+        This function changes the given rows in place, without looking at the others, so updating k rows costs O(k)
+        whatever the size of the tree. Rows that are not shown are ignored; render adds them
+        :param rows: list of (iid, values, tags) of rows already shown
+        """
+        for iid, values, tags in rows:
+            row = (tuple(values), tuple(tags))
+            old_row = self.__rows.get(iid)
+            if old_row is not None and old_row != row:
+                self.__tree.item(iid, values=row[0], tags=row[1])
+                self.__rows[iid] = row
+
+    def clear(self):
+        """
+        This function removes every row from the tree
+        """
+        self.render([])
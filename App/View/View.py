@@ -1,9 +1,15 @@
+import datetime
 import tkinter as tk
 from tkinter import ttk
 
 import matplotlib
 matplotlib.use("TkAgg")
+from matplotlib import dates
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from .TreeReconciler import TreeReconciler
+from .VirtualTreeList import VirtualTreeList
 
 
 class View:
@@ -15,8 +21,16 @@ class View:
         self.canvas = tk.Canvas(self.frame)
         self.innerFrame = tk.Frame(self.canvas)
 
+        # Graphs are created once and their artists updated in place on each display
         self.__cholesterolGraph = None
+        self.__cholesterolAxes = None
+        self.__cholesterolBars = None
+        self.__cholesterolData = None  # (names, values) last drawn
         self.__bloodGraph = None
+        self.__bloodAxes = None
+        self.__bloodLines = dict()  # line key to Line2D
+        self.__bloodBands = dict()  # line key to the PolyCollection shading its lowest to highest values
+        self.__bloodData = None  # lines last drawn
 
         # Main horizontal and vertical scrollbars
         self.scrollbar = tk.Scrollbar(self.frame, orient="horizontal", command=self.canvas.xview)
@@ -35,7 +49,7 @@ class View:
             height=600))
 
         # Setup prac ID UI
-        tk.Label(self.innerFrame, text="Enter practitioner ID").grid(column=0, row=0)
+        tk.Label(self.innerFrame, text="Enter practitioner ID(s)").grid(column=0, row=0)
         self.pracIdInput = tk.Entry(self.innerFrame)
         self.pracIdButton = tk.Button(
             self.innerFrame,
@@ -69,9 +83,9 @@ class View:
         for col in allPatientCol:
             self.allPatientTree.heading(col, text=col)
 
-        # set up patient scroll bar
-        self.patientScrollbar = tk.Scrollbar(self.innerFrame, orient="vertical", command=self.allPatientTree.yview)
-        self.allPatientTree.configure(yscrollcommand=self.patientScrollbar.set)
+        # set up patient scroll bar; the list only materializes the rows in view, so it drives the scroll bar
+        self.patientScrollbar = tk.Scrollbar(self.innerFrame, orient="vertical")
+        self.allPatientRows = VirtualTreeList(self.allPatientTree, self.patientScrollbar)
 
         # Set Monitored Cholesterol Patient
         tk.Label(self.innerFrame, text='Monitored Cholesterol Patients', relief="ridge").grid(column=5, row=0)
@@ -120,6 +134,11 @@ class View:
         self.bloodPressurePatientTree.tag_configure("blue font", foreground="#00FFFF")
         self.bloodPressurePatientTree.tag_configure("purple font", foreground="#9400D3")
 
+        # keyed renderers so refreshes only touch the rows that changed
+        self.cholesterolPatientRows = TreeReconciler(self.cholesterolPatientTree)
+        self.bloodPressurePatientRows = TreeReconciler(self.bloodPressurePatientTree)
+        self.historicalRows = TreeReconciler(self.historicalTree)
+
         self.__setUpGrid()
 
     def __setUpGrid(self):
@@ -157,27 +176,92 @@ class View:
         tk.Label(window, text='Extra Information', relief="ridge").grid(column=0, row=0)
         tk.Label(window, text=extraInfo, relief="ridge").grid(column=0, row=1)
 
-    def displayCholesterolGraph(self, figure=None, update=False):
+    def displayCholesterolGraph(self, names=(), values=()):
         """
-        This function display the cholesterol graph
-        :param figure: a Figure object that holds the image
-        :param update: Bool, see if there is any update from last figure
+        This function display the cholesterol graph. The figure and canvas are reused, and are only redrawn when the
+        data changed since the last display
+        :param names: names of the patients, one bar each
+        :param values: cholesterol value of each patient
         """
-        if self.__cholesterolGraph:
-            self.__cholesterolGraph.get_tk_widget().grid_forget()
-        if update:
+        data = (tuple(names), tuple(values))
+        if not names:
+            if self.__cholesterolGraph:
+                self.__cholesterolGraph.get_tk_widget().grid_remove()
+            self.__cholesterolData = None
+            return
+        if self.__cholesterolGraph is None:
+            figure = Figure(figsize=(8, 2))
+            self.__cholesterolAxes = figure.add_subplot(111)
+            self.__cholesterolAxes.set_title("Total Cholesterol mg/dL")
             self.__cholesterolGraph = FigureCanvasTkAgg(figure, self.innerFrame)
-            self.__cholesterolGraph.get_tk_widget().grid(column=3, row=6)
+        self.__cholesterolGraph.get_tk_widget().grid(column=3, row=6)
+        if data == self.__cholesterolData:
+            return
+
+        axes = self.__cholesterolAxes
+        if self.__cholesterolData and self.__cholesterolData[0] == data[0]:
+            for bar, value in zip(self.__cholesterolBars, values):  # same patients, only heights changed
+                bar.set_height(value)
+        else:
+            if self.__cholesterolBars:
+                self.__cholesterolBars.remove()
+            positions = range(len(names))
+            self.__cholesterolBars = axes.bar(positions, values)
+            axes.set_xticks(positions)
+            axes.set_xticklabels(names)
+        axes.relim()
+        axes.autoscale_view()
+        self.__cholesterolData = data
+        self.__cholesterolGraph.draw_idle()
 
-    def displayBloodGraph(self, figure=None, update=False):
+    def displayBloodGraph(self, lines=()):
         """
-        This function display the blood pressure graph
-        :param figure: a Figure object that holds the image
-        :param update: Bool, see if there is any update from last figure
+        This function display the blood pressure graph against time. The figure and canvas are reused, lines are
+        updated in place, and it is only redrawn when the data changed since the last display
+        :param lines: list of (key, name, times, means, lows, highs), one line each, where key identifies the line,
+        times are seconds since the epoch and the line is shaded between lows and highs where they differ
         """
-        if self.__bloodGraph:
-            self.__bloodGraph.get_tk_widget().grid_forget()
-        if update:
+        data = tuple((key, name, tuple(xs), tuple(ys), tuple(lows), tuple(highs))
+                     for key, name, xs, ys, lows, highs in lines)
+        if not lines:
+            if self.__bloodGraph:
+                self.__bloodGraph.get_tk_widget().grid_remove()
+            self.__bloodData = None
+            return
+        if self.__bloodGraph is None:
+            figure = Figure(figsize=(8, 2))
+            self.__bloodAxes = figure.add_subplot(111)
+            self.__bloodAxes.set_title("Systolic BP (mmHg)")
+            locator = dates.AutoDateLocator()
+            self.__bloodAxes.xaxis.set_major_locator(locator)
+            self.__bloodAxes.xaxis.set_major_formatter(dates.ConciseDateFormatter(locator))
             self.__bloodGraph = FigureCanvasTkAgg(figure, self.innerFrame)
-            self.__bloodGraph.get_tk_widget().grid(column=3, row=8)
+        self.__bloodGraph.get_tk_widget().grid(column=3, row=8)
+        if data == self.__bloodData:
+            return
 
+        axes = self.__bloodAxes
+        keys = set()
+        for key, name, xs, ys, lows, highs in lines:
+            keys.add(key)
+            times = [datetime.datetime.fromtimestamp(x, datetime.timezone.utc) for x in xs]
+            if key in self.__bloodLines:
+                self.__bloodLines[key].set_data(times, ys)
+            else:
+                self.__bloodLines[key], = axes.plot(times, ys, marker='.')
+            self.__bloodLines[key].set_label(name)
+            if key in self.__bloodBands:
+                self.__bloodBands.pop(key).remove()
+            if list(lows) != list(highs):
+                self.__bloodBands[key] = axes.fill_between(times, lows, highs, alpha=0.2,
+                                                           color=self.__bloodLines[key].get_color())
+        for key in list(self.__bloodLines):
+            if key not in keys:
+                self.__bloodLines.pop(key).remove()
+                if key in self.__bloodBands:
+                    self.__bloodBands.pop(key).remove()
+        axes.legend(loc='best')
+        axes.relim()
+        axes.autoscale_view()
+        self.__bloodData = data
+        self.__bloodGraph.draw_idle()
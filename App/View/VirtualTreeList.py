@@ -0,0 +1,125 @@
+class VirtualTreeList:
+
+    def __init__(self, tree, scrollbar):
+        """
+        Constructor for a virtualized list shown in a Treeview. All rows are kept as plain values, and only the window
+        of rows that fits in the tree is materialized as tree items, which are reused as the list scrolls
+        :param tree: the ttk.Treeview showing the visible rows
+        :param scrollbar: the vertical tk.Scrollbar of the tree, driven by the list instead of the tree
+        """
+        self.__tree = tree
+        self.__scrollbar = scrollbar
+        self.__rows = []  # values of every row, in display order
+        self.__first = 0  # index in self.__rows of the first visible row
+        self.__height = int(tree.cget("height"))  # number of rows the tree shows
+        self.__items = []  # iids of the tree items, reused for whatever rows are visible
+        self.__shown = []  # values each tree item currently shows
+
+        self.__scrollbar.configure(command=self.__onScroll)
+        self.__tree.configure(yscrollcommand="")
+        self.__tree.bind("<MouseWheel>", self.__onMouseWheel)
+        self.__tree.bind("<Button-4>", lambda event: self.__scrollBy(-1))
+        self.__tree.bind("<Button-5>", lambda event: self.__scrollBy(1))
+        self.__updateScrollbar()
+
+    def setRows(self, rows):
+        """
+        This function replaces every row of the list
+        :param rows: list of row values in display order
+        """
+        self.__rows = [tuple(values) for values in rows]
+        self.__first = min(self.__first, self.__getMaxFirst())
+        self.__render()
+
+    def extend(self, rows):
+        """
+        This function appends rows to the list, e.g. as pages of a roster arrive. The tree is only touched if the new
+        rows fall in the visible window
+        :param rows: list of row values to append
+        """
+        start = len(self.__rows)
+        self.__rows.extend(tuple(values) for values in rows)
+        if start < self.__first + self.__height:
+            self.__render()
+        else:
+            self.__updateScrollbar()
+
+    def __len__(self):
+        return len(self.__rows)
+
+    def __getMaxFirst(self):
+        """
+        This function gets the largest index the first visible row can have
+        :return: index of the first visible row when the list is scrolled to the bottom
+        """
+        return max(0, len(self.__rows) - self.__height)
+
+    def __render(self):
+        """
+        This function shows the visible window of rows, reusing the existing tree items
+        """
+        visible = self.__rows[self.__first:self.__first + self.__height]
+        while len(self.__items) < len(visible):
+            values = visible[len(self.__items)]
+            self.__items.append(self.__tree.insert("", "end", values=values))
+            self.__shown.append(values)
+        while len(self.__items) > len(visible):
+            self.__tree.delete(self.__items.pop())
+            self.__shown.pop()
+        for index, values in enumerate(visible):
+            if self.__shown[index] != values:
+                self.__tree.item(self.__items[index], values=values)
+                self.__shown[index] = values
+        self.__updateScrollbar()
+
+    def __updateScrollbar(self):
+        """
+        This function sets the scrollbar to show the position of the visible window in the list
+        """
+        total = len(self.__rows)
+        if total == 0:
+            self.__scrollbar.set(0, 1)
+        else:
+            self.__scrollbar.set(self.__first / total, min(1, (self.__first + self.__height) / total))
+
+    def __scrollTo(self, first):
+        """
+        This function moves the visible window so that it starts at the given row
+        :param first: index of the row to show first
+        """
+        first = max(0, min(int(first), self.__getMaxFirst()))
+        if first != self.__first:
+            self.__first = first
+            self.__tree.selection_remove(*self.__tree.selection())  # items now show other rows
+            self.__render()
+
+    def __scrollBy(self, rows):
+        """
+        This function moves the visible window by a number of rows
+        :param rows: number of rows to move, negative to move up
+        :return: "break" so the tree does not handle the event itself
+        """
+        self.__scrollTo(self.__first + rows)
+        return "break"
+
+    def __onScroll(self, action, amount, unit=None):
+        """
+        This function is the command of the scrollbar
+        :param action: "moveto" or "scroll"
+        :param amount: fraction of the list to move to, or number of units or pages to scroll by
+        :param unit: "units" or "pages" when scrolling
+        """
+        if action == "moveto":
+            self.__scrollTo(float(amount) * len(self.__rows))
+        elif action == "scroll":
+            step = self.__height if unit == "pages" else 1
+            self.__scrollTo(self.__first + int(amount) * step)
+
+    def __onMouseWheel(self, event):
+        """
+        This function is the handler of the mouse wheel over the tree
+        :param event: the wheel event, whose delta is a multiple of 120 per notch on Windows and small steps on macOS
+        :return: "break" so the tree does not handle the event itself
+        """
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self.__scrollBy(-notches)
@@ -1 +1,3 @@
 from .View import View
+from .TreeReconciler import TreeReconciler
+from .VirtualTreeList import VirtualTreeList
@@ -0,0 +1,125 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeFhirServerHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        status, headers, body = self.server.respond(url.path, query, self.headers)
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/fhir+json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeFhirServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, respond):
+        """
+        Constructor for a local HTTP server whose answers are chosen by the test, so WebServiceManager can be tested
+        without the FHIR server
+        :param respond: function taking the path, the map of query parameters and the request headers, and returning
+        the status, a map of response headers and the JSON body as a dictionary, or None for no body
+        """
+        super().__init__(("127.0.0.1", 0), FakeFhirServerHandler)
+        self.__respond = respond
+        self.__lock = threading.Lock()
+        self.__requests = []  # (path, query) of each request, in the order they arrived
+
+    def getBaseUrl(self):
+        """
+        Get the base url to give to WebServiceManager
+        :return: the url, ending with a slash
+        """
+        return "http://{0}:{1}/fhir/".format(self.server_address[0], self.server_address[1])
+
+    def getRequests(self):
+        """
+        Get the requests answered so far
+        :return: list of (path, map of query parameters)
+        """
+        with self.__lock:
+            return list(self.__requests)
+
+    def respond(self, path, query, headers):
+        """
+        Record a request and answer it with the function of the test
+        :param path: path of the url, e.g. "/fhir/Observation"
+        :param query: map of query parameter to value
+        :param headers: the request headers
+        :return: the status, map of response headers and body
+        """
+        with self.__lock:
+            self.__requests.append((path, query))
+        return self.__respond(path, query, headers)
+
+    def start(self):
+        """
+        Start answering requests on a background thread
+        :return: None
+        """
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    def stop(self):
+        """
+        Stop answering requests and close the socket
+        :return: None
+        """
+        self.shutdown()
+        self.server_close()
+
+
+def cholesterolObservation(patient_id, issued, value, lastUpdated=None):
+    """
+    Build a total cholesterol Observation resource
+    :param patient_id: ID of the patient
+    :param issued: date and time of the reading in ISO 8601 format
+    :param value: the reading in mg/dL
+    :param lastUpdated: optional instant the server last changed the resource, defaults to issued
+    :return: the resource as a dictionary
+    """
+    return {"resourceType": "Observation", "meta": {"lastUpdated": lastUpdated or issued},
+            "code": {"coding": [{"code": "2093-3"}]}, "subject": {"reference": "Patient/" + patient_id},
+            "issued": issued, "valueQuantity": {"value": value, "unit": "mg/dL"}}
+
+
+def bloodPressureObservation(patient_id, issued, systolic, diastolic, lastUpdated=None):
+    """
+    Build a blood pressure Observation resource
+    :param patient_id: ID of the patient
+    :param issued: date and time of the reading in ISO 8601 format
+    :param systolic: systolic reading in mmHg
+    :param diastolic: diastolic reading in mmHg
+    :param lastUpdated: optional instant the server last changed the resource, defaults to issued
+    :return: the resource as a dictionary
+    """
+    return {"resourceType": "Observation", "meta": {"lastUpdated": lastUpdated or issued},
+            "code": {"coding": [{"code": "55284-4"}]}, "subject": {"reference": "Patient/" + patient_id},
+            "issued": issued,
+            "component": [{"code": {"coding": [{"code": "8480-6"}]}, "valueQuantity": {"value": systolic}},
+                          {"code": {"coding": [{"code": "8462-4"}]}, "valueQuantity": {"value": diastolic}}]}
+
+
+def bundle(resources, nextUrl=None):
+    """
+    Build a searchset Bundle page
+    :param resources: resources of the page
+    :param nextUrl: url of the next page, or None for the last page
+    :return: the Bundle as a dictionary
+    """
+    data = {"resourceType": "Bundle", "type": "searchset", "entry": [{"resource": resource} for resource in resources]}
+    if nextUrl:
+        data["link"] = [{"relation": "next", "url": nextUrl}]
+    return data
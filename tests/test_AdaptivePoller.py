@@ -0,0 +1,122 @@
+import time
+import unittest
+from unittest import mock
+
+from App.Model.AdaptivePoller import AdaptivePoller
+
+
+class CountingWebServiceManager:
+    """
+    Stands in for WebServiceManager, reporting a chunk size and a count of Observation requests set by the test
+    """
+
+    def __init__(self, chunkSize=3):
+        """
+        :param chunkSize: number of patients searched for per request
+        """
+        self.chunkSize = chunkSize
+        self.requests = 0
+
+    def getBulkChunkSize(self):
+        return self.chunkSize
+
+    def getRequestStats(self):
+        return {"Observation": {"requests": self.requests}}
+
+
+class Clock:
+    """
+    Stands in for time.monotonic, moved on by the test
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAdaptivePoller(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.wsm = CountingWebServiceManager()
+        self.patient_ids = ["p{0}".format(n) for n in range(10)]
+
+    def testAdmitsChunksWithinBudget(self):
+        poller = AdaptivePoller(self.wsm, requestsPerMinute=2)
+        # 2 requests of 3 patients, urgent patients first
+        self.assertEqual(poller.takeDue(self.patient_ids, ["p9"], now=1000), ["p9", "p0", "p1", "p2", "p3", "p4"])
+
+    def testPagedRequestsAreCharged(self):
+        poller = AdaptivePoller(self.wsm, requestsPerMinute=2)
+        self.wsm.requests += 2  # the first page and a next page of the same search
+        self.assertEqual(poller.takeDue(self.patient_ids, now=1000), [])
+        self.clock.now += 30  # one request refilled
+        self.assertEqual(poller.takeDue(self.patient_ids, now=1000), ["p0", "p1", "p2"])
+
+    def testBalanceGoesNegativeAfterLongSearch(self):
+        poller = AdaptivePoller(self.wsm, requestsPerMinute=60)
+        self.wsm.requests += 70
+        self.assertEqual(poller.takeDue(self.patient_ids, now=1000), [])
+        self.clock.now += 10  # back to zero, still nothing
+        self.assertEqual(poller.takeDue(self.patient_ids, now=1000), [])
+        self.clock.now += 1
+        self.assertEqual(poller.takeDue(self.patient_ids, now=1000), ["p0", "p1", "p2"])
+
+    def testRequestsMadeBeforePollerAreNotCharged(self):
+        self.wsm.requests = 500
+        poller = AdaptivePoller(self.wsm, requestsPerMinute=1)
+        self.assertEqual(poller.takeDue(self.patient_ids, now=1000), ["p0", "p1", "p2"])
+
+    def testCadenceIsMovingAverageOfGaps(self):
+        poller = AdaptivePoller(self.wsm, smoothing=0.3)
+        poller.polled("p1", [0])
+        self.assertIsNone(poller.getCadence("p1"))
+        poller.polled("p1", [100, 0])
+        self.assertEqual(poller.getCadence("p1"), 100)
+        poller.polled("p1", [0, 100, 300])  # readings already seen are not counted again
+        self.assertAlmostEqual(poller.getCadence("p1"), 0.3 * 200 + 0.7 * 100)
+
+    def testBacksOffWhileNothingNewUpToMaxInterval(self):
+        poller = AdaptivePoller(self.wsm, interval=20, maxInterval=100, backoff=2.0)
+        self.assertEqual(poller.getPeriod("p1"), 0)
+        periods = []
+        for _ in range(5):
+            poller.polled("p1", [0], now=0)  # the first poll reads the history, the others find nothing new
+            periods.append(poller.getPeriod("p1"))
+        self.assertEqual(periods, [20, 40, 80, 100, 100])
+        poller.polled("p1", [0, 50], now=0)
+        self.assertEqual(poller.getPeriod("p1"), 20)
+        poller.setInterval(30)
+        self.assertEqual(poller.getPeriod("p1"), 30)
+
+    def testBackoffBoundedByCadence(self):
+        poller = AdaptivePoller(self.wsm, interval=20, maxInterval=3600, backoff=2.0, cadenceFraction=0.25)
+        poller.polled("p1", [0, 200], now=0)
+        poller.polled("p1", [0, 200], now=0)
+        self.assertEqual(poller.getPeriod("p1"), 40)
+        poller.polled("p1", [0, 200], now=0)
+        self.assertEqual(poller.getPeriod("p1"), 50)  # a quarter of the cadence
+
+    def testDueAfterPeriodAndUrgentEveryInterval(self):
+        poller = AdaptivePoller(self.wsm, interval=20)
+        poller.polled("p1", [0], now=1000)
+        poller.polled("p1", [0], now=1000)  # period 40
+        self.assertEqual(poller.takeDue(["p1"], now=1030), [])
+        self.assertEqual(poller.takeDue(["p1"], ["p1"], now=1030), ["p1"])
+        self.assertEqual(poller.takeDue(["p1"], now=1040), ["p1"])
+
+    def testPatientsNoLongerMonitoredAreForgotten(self):
+        poller = AdaptivePoller(self.wsm)
+        poller.polled("p1", [0, 100])
+        poller.takeDue(["p2"])
+        self.assertIsNone(poller.getCadence("p1"))
+        self.assertEqual(poller.getPeriod("p1"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from App.Model.AlertEngine import AlertEngine
+
+
+class TestAlertEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = AlertEngine(100, 10)
+        self.changes = []
+        self.engine.addListener(lambda patient_id, raised, value: self.changes.append((patient_id, raised)))
+        self.engine.apply({"low": 80, "band": 95, "high": 120})
+        self.changes.clear()
+
+    def testRaisesAboveThreshold(self):
+        self.assertEqual(self.engine.getRaised(), ["high"])
+        self.assertTrue(self.engine.isRaised("high"))
+        self.assertFalse(self.engine.isRaised("band"))
+
+    def testHysteresisKeepsAlertRaised(self):
+        self.engine.update("high", 95)
+        self.assertTrue(self.engine.isRaised("high"))
+        self.assertEqual(self.changes, [])
+        self.engine.update("high", 90)
+        self.assertFalse(self.engine.isRaised("high"))
+        self.assertEqual(self.changes, [("high", False)])
+
+    def testLoweringThresholdRaisesOnlyPatientsAbove(self):
+        self.engine.setThreshold(90)
+        self.assertEqual(self.engine.getRaised(), ["band", "high"])
+        self.assertEqual(sorted(self.changes), [("band", True)])
+
+    def testRaisingThresholdClearsOnlyBelowHysteresis(self):
+        self.engine.apply({"band": 105})
+        self.changes.clear()
+        self.engine.setThreshold(110)  # 105 is within the hysteresis of 110, so its alert stays raised
+        self.assertEqual(self.engine.getRaised(), ["band", "high"])
+        self.assertEqual(self.changes, [])
+        self.engine.setThreshold(135)
+        self.assertEqual(self.engine.getRaised(), [])
+        self.assertEqual(sorted(self.changes), [("band", False), ("high", False)])
+
+    def testNoThresholdClearsEveryAlert(self):
+        self.engine.setThreshold(None)
+        self.assertEqual(self.engine.getRaised(), [])
+        self.assertEqual(self.changes, [("high", False)])
+        self.engine.update("low", 500)
+        self.assertEqual(self.engine.getRaised(), [])
+
+    def testChangesWithinOneApplyAreNotifiedOnce(self):
+        self.engine.apply({"high": 50, "band": 130}, 90)
+        self.assertEqual(sorted(self.changes), [("band", True), ("high", False)])
+        self.changes.clear()
+        self.engine.apply({"high": 200}, 250)  # raised by its value then cleared by the threshold within the call
+        self.assertEqual(self.changes, [("band", False)])
+
+    def testRemoveClearsAlert(self):
+        self.engine.remove("high")
+        self.assertEqual(self.changes, [("high", False)])
+        self.assertEqual(self.engine.getPatientsAbove(0), ["low", "band"])
+
+    def testRaisedSnapshotIsReplacedOnChange(self):
+        snapshot = self.engine.getRaisedSnapshot()
+        self.assertEqual(snapshot, frozenset(["high"]))
+        self.engine.update("low", 85)
+        self.assertIs(self.engine.getRaisedSnapshot(), snapshot)  # nothing raised or cleared
+        self.engine.setThreshold(90)
+        self.assertEqual(self.engine.getRaisedSnapshot(), frozenset(["band", "high"]))
+        self.assertEqual(snapshot, frozenset(["high"]))  # snapshots handed out earlier do not change
+
+
+if __name__ == "__main__":
+    unittest.main()
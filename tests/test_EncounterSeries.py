@@ -0,0 +1,106 @@
+import unittest
+
+from App.Model.CholesterolEncounter import CholesterolEncounter
+from App.Model.EncounterSeries import EncounterSeries
+
+
+def encounter(day, value):
+    """
+    Build a cholesterol Encounter on a day of May 2020
+    :param day: day of the month
+    :param value: the reading
+    :return: CholesterolEncounter at 10:00 UTC that day
+    """
+    return CholesterolEncounter("2020-05-{0:02d}T10:00:00.000+00:00".format(day), value)
+
+
+def values(series):
+    """
+    Get the values held by a series
+    :param series: an EncounterSeries
+    :return: list of values, latest first
+    """
+    return [reading.getValue() for reading in series]
+
+
+class TestEncounterSeries(unittest.TestCase):
+
+    def testFromEncountersKeepsLatestFirst(self):
+        series = EncounterSeries.fromEncounters([encounter(3, 300), encounter(2, 200), encounter(1, 100)], 10)
+        self.assertEqual(values(series), [300, 200, 100])
+        self.assertEqual(series[0].getDateTime(), "2020-05-03T10:00:00.000+00:00")
+        self.assertEqual(values(series[1:]), [200, 100])
+        self.assertIsNone(EncounterSeries.fromEncounters([], 10))
+
+    def testMergeAppendsNewerReadings(self):
+        series = EncounterSeries.fromEncounters([encounter(2, 200), encounter(1, 100)], 10)
+        self.assertTrue(series.merge([encounter(4, 400), encounter(3, 300)]))
+        self.assertEqual(values(series), [400, 300, 200, 100])
+
+    def testMergeReplacesReadingAtSameTime(self):
+        series = EncounterSeries.fromEncounters([encounter(2, 200), encounter(1, 100)], 10)
+        self.assertTrue(series.merge([encounter(2, 250)]))
+        self.assertEqual(values(series), [250, 100])
+
+    def testMergeOlderAndUnchangedReadings(self):
+        series = EncounterSeries.fromEncounters([encounter(3, 300), encounter(1, 100)], 10)
+        self.assertTrue(series.merge([encounter(2, 200)]))
+        self.assertEqual(values(series), [300, 200, 100])
+        self.assertFalse(series.merge([encounter(3, 300), encounter(2, 200)]))
+        self.assertFalse(series.merge([]))
+
+    def testCapacityEvictsOldest(self):
+        series = EncounterSeries(CholesterolEncounter, 3)
+        for day in range(1, 21):  # wraps around the ring buffer several times
+            series.append(encounter(day, day).getDateTime(), day)
+        self.assertEqual(len(series), 3)
+        self.assertEqual(values(series), [20, 19, 18])
+        self.assertTrue(series.merge([encounter(21, 21)]))
+        self.assertEqual(values(series), [21, 20, 19])
+        self.assertTrue(series.merge([encounter(19, 190)]))
+        self.assertEqual(values(series), [21, 20, 190])
+
+    def testMergeOlderThanCapacityIsDropped(self):
+        series = EncounterSeries.fromEncounters([encounter(3, 300), encounter(2, 200)], 2)
+        self.assertFalse(series.merge([encounter(1, 100)]))
+        self.assertEqual(values(series), [300, 200])
+
+    def testCopyIsIndependent(self):
+        series = EncounterSeries.fromEncounters([encounter(1, 100)], 10)
+        copy = series.copy()
+        copy.merge([encounter(2, 200)])
+        self.assertEqual(len(series), 1)
+        self.assertEqual(len(copy), 2)
+        self.assertNotEqual(series, copy)
+        self.assertEqual(series, EncounterSeries.fromEncounters([encounter(1, 100)], 5))
+
+    def testKeepsUtcOffsetAndFractionalValues(self):
+        series = EncounterSeries.fromEncounters([CholesterolEncounter("2020-05-01T10:00:00.000+10:00", 180.5)], 1)
+        self.assertEqual(series[0].getDateTime(), "2020-05-01T10:00:00.000+10:00")
+        self.assertEqual(series[0].getValue(), 180.5)
+        self.assertEqual(series.getRawValue(0), 180.5)
+
+    def testWindowDropsOlderReadings(self):
+        day = 24 * 3600
+        series = EncounterSeries.fromEncounters([encounter(3, 300), encounter(2, 200), encounter(1, 100)], 10, 2 * day)
+        self.assertEqual(series.getWindow(), 2 * day)
+        self.assertEqual(values(series), [300, 200, 100])
+        self.assertTrue(series.merge([encounter(4, 400)]))
+        self.assertEqual(values(series), [400, 300, 200])
+        self.assertFalse(series.merge([encounter(1, 100)]))  # older than the window
+        self.assertEqual(values(series.copy()), [400, 300, 200])
+        self.assertEqual(series.copy().getWindow(), 2 * day)
+
+    def testDownsample(self):
+        series = EncounterSeries.fromEncounters([encounter(day, day) for day in range(12, 0, -1)], 20)
+        times, lowest, highest, means = series.downsample(20)  # fewer readings than buckets: one each
+        self.assertEqual(means.tolist(), list(range(1, 13)))
+        times, lowest, highest, means = series.downsample(4)
+        self.assertEqual(len(times), 4)
+        self.assertEqual((lowest.tolist(), highest.tolist()), ([1, 4, 7, 10], [3, 6, 9, 12]))
+        self.assertEqual(means.tolist(), [2, 5, 8, 11])
+        self.assertTrue(all(times[n] < times[n + 1] for n in range(3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from App.Model.HttpCache import HttpCache
+from App.Model.WebServiceManager import WebServiceManager
+from FakeFhirServer import FakeFhirServer, bloodPressureObservation, bundle
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def testLeastRecentlyUsedIsDropped(self):
+        cache = HttpCache(maxSize=2)
+        cache.store("a", '"1"', None, {"id": "a"})
+        cache.store("b", '"1"', None, {"id": "b"})
+        cache.get("a")  # a is now used more recently than b
+        cache.store("c", '"1"', None, {"id": "c"})
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a").data, {"id": "a"})
+        self.assertEqual(cache.get("c").data, {"id": "c"})
+
+    def testStoreReplacesEntry(self):
+        cache = HttpCache(maxSize=2)
+        cache.store("a", '"1"', None, {"version": 1})
+        cache.store("a", '"2"', None, {"version": 2})
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.get("a").etag, cache.get("a").data), ('"2"', {"version": 2}))
+
+    def testExpiredEntryIsDropped(self):
+        cache = HttpCache(ttl=-1)
+        cache.store("a", None, "Fri, 01 May 2020 10:00:00 GMT", {"id": "a"})
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+class TestConditionalRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.version = 1  # ETag of the Observations, changed when the server has new ones
+        self.answers = []  # status of each answer
+        self.server = FakeFhirServer(self.respond)
+        self.server.start()
+        self.wsm = WebServiceManager(baseUrl=self.server.getBaseUrl())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def respond(self, path, query, headers):
+        """
+        Answer the Observation searches with an ETag, and 304 when the client already has the current version
+        :param path: path of the url
+        :param query: map of query parameter to value
+        :param headers: the request headers
+        :return: the status, response headers and body
+        """
+        etag = 'W/"{0}"'.format(self.version)
+        status = 304 if headers.get("If-None-Match") == etag else 200
+        self.answers.append(status)
+        page = bundle([bloodPressureObservation("p1", "2020-05-0{0}T10:00:00.000+00:00".format(self.version),
+                                                130 + self.version, 80 + self.version)])
+        return status, {"ETag": etag}, page if status == 200 else None
+
+    def testRevalidationReusesCachedBody(self):
+        first = self.wsm.fetchEncounter("p1", "systolic", 1)
+        second = self.wsm.fetchEncounter("p1", "systolic", 1)
+        self.assertEqual(self.answers, [200, 304])
+        self.assertEqual([encounter.getValue() for encounter in second], [131])
+        self.assertEqual(second[0].getDateTime(), first[0].getDateTime())
+
+    def testParseIsMemoizedPerParserAndEtag(self):
+        first = self.wsm.fetchEncounter("p1", "systolic", 1)
+        second = self.wsm.fetchEncounter("p1", "systolic", 1)
+        self.assertIs(second[0], first[0])  # parsed once for the ETag
+        diastolic = self.wsm.fetchEncounter("p1", "diastolic", 1)  # same url, parsed another way
+        self.assertEqual(self.answers, [200, 304, 304])
+        self.assertEqual([encounter.getValue() for encounter in diastolic], [81])
+
+        self.version = 2
+        third = self.wsm.fetchEncounter("p1", "systolic", 1)
+        self.assertEqual(self.answers[-1], 200)
+        self.assertIsNot(third[0], first[0])
+        self.assertEqual([encounter.getValue() for encounter in third], [132])
+
+
+if __name__ == "__main__":
+    unittest.main()
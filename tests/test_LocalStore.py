@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from App.Model.CholesterolEncounter import CholesterolEncounter
+from App.Model.LocalStore import LocalStore
+from App.Model.Patient import Patient
+
+
+def patient(patient_id):
+    """
+    Build a Patient without Encounters
+    :param patient_id: ID of the patient
+    :return: the Patient
+    """
+    return Patient(patient_id, "Given" + patient_id, "Family", "1970-01-01", "female", "1 Main St", "Clayton", "VIC",
+                   "AU")
+
+
+def encounter(day, value):
+    """
+    Build a cholesterol Encounter on a day of May 2020
+    :param day: day of the month
+    :param value: the reading
+    :return: CholesterolEncounter at 10:00 UTC that day
+    """
+    return CholesterolEncounter("2020-05-{0:02d}T10:00:00.000+00:00".format(day), value)
+
+
+class TestLocalStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "store.sqlite3")
+        self.store = LocalStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def reopen(self, maxAge=7 * 24 * 3600):
+        """
+        Close the store and open the same database file again, as a restart of the app would
+        :param maxAge: Seconds after which stored data is ignored
+        :return: None
+        """
+        self.store.close()
+        self.store = LocalStore(self.path, maxAge)
+
+    def testRosterIsKeptBetweenRuns(self):
+        self.store.saveIdentifier("prac", "url-of-prac")
+        self.store.saveRoster("prac", [patient("p2"), patient("p1")])
+        self.reopen()
+        self.assertEqual(self.store.loadIdentifier("prac"), "url-of-prac")
+        self.assertEqual([stored.getDetails() for stored in self.store.loadRoster("prac")],
+                         [patient("p2").getDetails(), patient("p1").getDetails()])
+        self.assertEqual(self.store.loadRoster("other"), [])
+
+    def testSaveRosterReplacesPreviousOne(self):
+        self.store.saveIdentifier("prac", "url-of-prac")
+        self.store.saveRoster("prac", [patient("p1"), patient("p2")])
+        self.store.saveRoster("prac", [patient("p3")])
+        self.assertEqual([stored.getId() for stored in self.store.loadRoster("prac")], ["p3"])
+
+    def testDataOlderThanMaxAgeIsIgnored(self):
+        self.store.saveIdentifier("prac", "url-of-prac")
+        self.store.saveRoster("prac", [patient("p1")])
+        self.store.saveEncounters({"p1": {"cholesterol": [encounter(1, 100)]}})
+        self.reopen(maxAge=-1)
+        self.assertIsNone(self.store.loadIdentifier("prac"))
+        self.assertEqual(self.store.loadRoster("prac"), [])
+        self.assertEqual(self.store.loadEncounters(["p1"], ["cholesterol"], 10), {})
+
+    def testSaveEncountersReplacesHistory(self):
+        self.store.saveEncounters({"p1": {"cholesterol": [encounter(3, 300), encounter(2, 200), encounter(1, 100.5)]}})
+        self.store.saveEncounters({"p1": {"cholesterol": [encounter(4, 400), encounter(3, 300)]}})
+        results = self.store.loadEncounters(["p1", "p2"], ["cholesterol", "systolic"], 10)
+        self.assertEqual(list(results), ["p1"])
+        self.assertEqual(list(results["p1"]), ["cholesterol"])
+        stored = results["p1"]["cholesterol"]
+        self.assertEqual([reading.getValue() for reading in stored], [400, 300])
+        self.assertEqual(stored[0].getDateTime(), "2020-05-04T10:00:00.000+00:00")
+        self.assertEqual(self.store.loadEncounters(["p1"], ["cholesterol"], 1)["p1"]["cholesterol"][0].getValue(), 400)
+
+    def testEmptyHistoryIsKept(self):
+        self.store.saveEncounters({"p1": {"cholesterol": [encounter(1, 100)]}})
+        self.store.saveEncounters({"p1": {"cholesterol": None}})
+        self.assertEqual(self.store.loadEncounters(["p1"], ["cholesterol"], 10), {"p1": {"cholesterol": []}})
+
+    def testSessionRoundTrip(self):
+        session = {"N": 30, "X": 140, "Y": 90.5,
+                   "monitors": {"cholesterol": {"patients": ["p2", "p1"], "threshold": 180.25},
+                                "systolic": {"patients": [], "threshold": -1}}}
+        self.assertIsNone(self.store.loadSession("prac"))
+        self.store.saveSession("prac", session)
+        self.reopen(maxAge=-1)  # sessions do not expire
+        self.assertEqual(self.store.loadSession("prac"), session)
+        self.store.saveSession("prac", {"N": 10})
+        self.assertEqual(self.store.loadSession("prac"), {"N": 10})
+        self.assertIsNone(self.store.loadSession("other"))
+
+    def testIgnoredAfterClose(self):
+        self.store.close()
+        self.store.saveIdentifier("prac", "url-of-prac")
+        self.store.saveRoster("prac", [patient("p1")])
+        self.store.saveEncounters({"p1": {"cholesterol": [encounter(1, 100)]}})
+        self.store.saveSession("prac", {"N": 10})
+        self.assertIsNone(self.store.loadIdentifier("prac"))
+        self.assertIsNone(self.store.loadSession("prac"))
+        self.assertEqual(self.store.loadRoster("prac"), [])
+        self.reopen()
+        self.assertEqual(self.store.loadRoster("prac"), [])
+        self.assertIsNone(self.store.loadSession("prac"))
+
+
+if __name__ == "__main__":
+    unittest.main()
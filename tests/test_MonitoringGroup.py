@@ -0,0 +1,63 @@
+import datetime
+import unittest
+
+from App.Model.MonitoringGroup import MonitoringGroup
+from App.Model.MonitoringList import MonitoringList
+
+
+class RecordingWebServiceManager:
+    """
+    Stands in for WebServiceManager, recording the bulk fetches asked for and finding nothing
+    """
+
+    def __init__(self):
+        self.fetches = []  # (patient ids, encounter types, num, startDate) of each bulk fetch
+
+    def fetchEncountersBulk(self, patient_ids, encounterTypes, num, startDate=None):
+        self.fetches.append((patient_ids, encounterTypes, num, startDate))
+        return {patient_id: {encounterType: [] for encounterType in encounterTypes} for patient_id in patient_ids}
+
+
+class TestFetchPatients(unittest.TestCase):
+
+    def setUp(self):
+        self.wsm = RecordingWebServiceManager()
+        self.cholesterol = MonitoringList("cholesterol", self.wsm)
+        self.systolic = MonitoringList("systolic", self.wsm, 140, 1)
+        self.historic = MonitoringList("systolic", self.wsm, 140, 500, 30 * 24 * 3600)
+        self.group = MonitoringGroup(self.wsm, [self.cholesterol, self.systolic, self.historic])
+
+    def testCountsAndWindowStartPerPatientAndType(self):
+        results = self.group.fetchPatients([(self.cholesterol, ["p1", "p2"]), (self.systolic, ["p2"]),
+                                            (self.historic, ["p3"])])
+        self.assertEqual(len(self.wsm.fetches), 1)
+        patient_ids, encounterTypes, nums, startDates = self.wsm.fetches[0]
+        self.assertEqual(patient_ids, ["p1", "p2", "p3"])
+        self.assertEqual(encounterTypes, ["cholesterol", "systolic"])
+        self.assertEqual(nums, {"p1": {"cholesterol": 1}, "p2": {"cholesterol": 1, "systolic": 1},
+                                "p3": {"systolic": 500}})
+        self.assertEqual(list(startDates), ["p3"])
+        windowStart = datetime.datetime.fromisoformat(startDates["p3"]["systolic"])
+        expected = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30)
+        self.assertLess(abs((windowStart - expected).total_seconds()), 60)
+        self.assertEqual(set(results), {"p1", "p2", "p3"})
+
+    def testSharedTypeKeepsMostEncountersAndLatestReading(self):
+        self.group.fetchPatients([(self.systolic, ["p1"]), (self.historic, ["p1"])])
+        patient_ids, encounterTypes, nums, startDates = self.wsm.fetches[0]
+        self.assertEqual(nums, {"p1": {"systolic": 500}})
+        self.assertIn("systolic", startDates["p1"])  # the latest reading is kept even if it is before the start
+
+    def testUnboundedListIsNotLimitedByWindow(self):
+        unbounded = MonitoringList("systolic", self.wsm, 140, 5)
+        group = MonitoringGroup(self.wsm, [unbounded, self.historic])
+        group.fetchPatients([(unbounded, ["p1"]), (self.historic, ["p1"])])
+        self.assertEqual(self.wsm.fetches[0][3], {"p1": {}})
+
+    def testNothingToFetch(self):
+        self.assertEqual(self.group.fetchPatients([(self.cholesterol, [])]), {})
+        self.assertEqual(self.wsm.fetches, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
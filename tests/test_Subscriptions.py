@@ -0,0 +1,135 @@
+import queue
+import threading
+import unittest
+
+from App.Model.CholesterolEncounter import CholesterolEncounter
+from App.Model.MonitoringGroup import MonitoringGroup
+from App.Model.MonitoringList import MonitoringList
+from App.Model.Patient import Patient
+from App.Model.WebServiceManager import WebServiceManager
+from App.Service.NotificationReceiver import NotificationReceiver
+from App.Simulator.FhirStandIn import FhirStandIn
+
+
+def issued(day):
+    """
+    Get the time of a reading on a day of May 2020
+    :param day: day of the month
+    :return: ISO 8601 datetime at 10:00 UTC that day
+    """
+    return "2020-05-{0:02d}T10:00:00.000+00:00".format(day)
+
+
+def values(results, patient_id, encounterType):
+    """
+    Get the values of the Encounters of a patient
+    :param results: map of patient id to a map of encounter type to list of Encounters
+    :param patient_id: ID of the patient
+    :param encounterType: type of encounter
+    :return: list of values, latest first
+    """
+    return [encounter.getValue() for encounter in results[patient_id][encounterType]]
+
+
+class TestSubscriptions(unittest.TestCase):
+    types = ["cholesterol", "systolic", "diastolic"]
+
+    def setUp(self):
+        self.standIn = FhirStandIn()
+        self.standIn.start()
+        self.wsm = WebServiceManager(baseUrl=self.standIn.getBaseUrl())
+
+    def tearDown(self):
+        self.standIn.stop()
+
+    def testCreateAndDeleteSubscriptions(self):
+        subscription_ids = self.wsm.createSubscriptions(["p1", "p2"], self.types, "http://127.0.0.1:1/notify",
+                                                        "2020-05-01T10:00:00+00:00")
+        self.assertEqual(len(subscription_ids), 1)  # one for both codes and both patients
+        self.assertEqual(self.standIn.getSubscriptionCount(), 1)
+        self.wsm.deleteSubscriptions(subscription_ids + ["missing"])  # unknown ones are ignored
+        self.assertEqual(self.standIn.getSubscriptionCount(), 0)
+
+    def testSubscriptionPerChunkOfPatients(self):
+        patient_ids = ["p{0}".format(n) for n in range(51)]  # patients are sent in chunks of 50
+        subscription_ids = self.wsm.createSubscriptions(patient_ids, ["cholesterol"], "http://127.0.0.1:1/notify")
+        self.assertEqual(len(subscription_ids), 2)
+        self.assertEqual(self.standIn.getRequestCounts(), {"Subscription": 2})
+
+    def testNothingToSubscribeTo(self):
+        self.assertEqual(self.wsm.createSubscriptions(["p1"], ["weight"], "http://127.0.0.1:1/notify"), [])
+        self.assertEqual(self.standIn.getRequestCounts(), {})
+
+
+class TestParseNotification(unittest.TestCase):
+
+    def setUp(self):
+        self.standIn = FhirStandIn()  # only builds the resources, it is not started
+        self.wsm = WebServiceManager()
+
+    def tearDown(self):
+        self.standIn.server_close()
+
+    def testSingleObservation(self):
+        observation = self.standIn.addCholesterol("p1", issued(1), 180)
+        results = self.wsm.parseNotification(observation, ["cholesterol", "systolic"])
+        self.assertEqual(values(results, "p1", "cholesterol"), [180])
+        self.assertEqual(results["p1"]["cholesterol"][0].getDateTime(), issued(1))
+        self.assertNotIn("systolic", results["p1"])
+
+    def testBundleLatestFirst(self):
+        entries = [self.standIn.addBloodPressure("p1", issued(day), 120 + day, 80 + day) for day in (1, 3, 2)]
+        bundle = {"resourceType": "Bundle", "entry": [{"resource": entry} for entry in entries] +
+                  [{"resource": {"resourceType": "OperationOutcome"}}]}
+        results = self.wsm.parseNotification(bundle, ["systolic", "diastolic"])
+        self.assertEqual(values(results, "p1", "systolic"), [123, 122, 121])
+        self.assertEqual(values(results, "p1", "diastolic"), [83, 82, 81])
+
+    def testTypesNotAskedForAreLeftOut(self):
+        observation = self.standIn.addCholesterol("p1", issued(1), 180)
+        self.assertEqual(self.wsm.parseNotification(observation, ["systolic"]), {})
+
+
+class TestPushedReadings(unittest.TestCase):
+
+    def setUp(self):
+        self.standIn = FhirStandIn()
+        self.standIn.start()
+        self.receiver = NotificationReceiver()
+        self.receiver.start()
+        self.notifications = queue.Queue()
+        threading.Thread(target=lambda: [self.notifications.put(data) for data in self.receiver.iterNotifications()],
+                         daemon=True).start()
+        self.wsm = WebServiceManager(baseUrl=self.standIn.getBaseUrl())
+        self.monitor = MonitoringList("cholesterol", self.wsm, num=3)
+        self.group = MonitoringGroup(self.wsm, [self.monitor])
+        patient = Patient("p1", "Given", "Family", "1970-01-01", "female", "1 Main St", "Clayton", "VIC", "AU")
+        self.standIn.addCholesterol("p1", issued(1), 170)
+        self.monitor.add(patient.withEncounters([CholesterolEncounter(issued(1), 170)]))
+
+    def tearDown(self):
+        self.receiver.stop()
+        self.standIn.stop()
+
+    def testCreateNotifyApplyDelete(self):
+        self.group.enablePush(self.receiver.getEndpoint())
+        self.group.apply(self.group.fetch())  # subscribes the polled patients
+        self.assertEqual(self.standIn.getSubscriptionCount(), 1)
+
+        self.standIn.addCholesterol("p1", issued(2), 190)
+        self.standIn.addCholesterol("p2", issued(2), 250)  # not subscribed to
+        data = self.notifications.get(timeout=5)
+        self.assertTrue(self.group.applyNotification(data))
+        encounters = self.monitor.returnPatients()["p1"].getEncounters()
+        self.assertEqual([encounter.getValue() for encounter in encounters], [190, 170])
+        self.assertIsNotNone(self.receiver.getLastReceived())
+        self.assertFalse(self.group.applyNotification(None))  # a ping asks to poll instead
+
+        self.group.disablePush()
+        self.assertEqual(self.standIn.getSubscriptionCount(), 0)
+        with self.assertRaises(queue.Empty):
+            self.notifications.get(timeout=0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
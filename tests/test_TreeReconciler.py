@@ -0,0 +1,101 @@
+import unittest
+
+from App.View.TreeReconciler import TreeReconciler
+
+
+class FakeTree:
+    """
+    Stands in for a ttk.Treeview, keeping its rows in order and recording the calls made to it
+    """
+
+    def __init__(self):
+        self.rows = dict()  # iid to (values, tags)
+        self.order = []  # iids in display order
+        self.calls = []  # (method name, iid) of each call
+
+    def insert(self, parent, index, iid, values, tags):
+        self.calls.append(("insert", iid))
+        self.rows[iid] = (tuple(values), tuple(tags))
+        self.order.append(iid)
+
+    def item(self, iid, values, tags):
+        self.calls.append(("item", iid))
+        self.rows[iid] = (tuple(values), tuple(tags))
+
+    def delete(self, iid):
+        self.calls.append(("delete", iid))
+        del self.rows[iid]
+        self.order.remove(iid)
+
+    def move(self, iid, parent, index):
+        self.calls.append(("move", iid))
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+
+def rows(*iids, value=0):
+    """
+    Build the rows of a render
+    :param iids: iids of the rows in display order
+    :param value: value shown in every row
+    :return: list of (iid, values, tags)
+    """
+    return [(iid, (iid, value), ()) for iid in iids]
+
+
+class TestTreeReconciler(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = FakeTree()
+        self.reconciler = TreeReconciler(self.tree)
+        self.reconciler.render(rows("a", "b", "c"))
+        self.tree.calls.clear()
+
+    def testInsert(self):
+        self.assertEqual(self.tree.order, ["a", "b", "c"])
+        self.reconciler.render(rows("a", "b", "c", "d"))
+        self.assertEqual(self.tree.calls, [("insert", "d")])
+        self.assertEqual(self.tree.order, ["a", "b", "c", "d"])
+
+    def testUnchangedRenderTouchesNothing(self):
+        self.reconciler.render(rows("a", "b", "c"))
+        self.assertEqual(self.tree.calls, [])
+
+    def testUpdateOnlyChangedRows(self):
+        changed = rows("a", "b", "c")
+        changed[1] = ("b", ("b", 1), ("red font",))
+        self.reconciler.render(changed)
+        self.assertEqual(self.tree.calls, [("item", "b")])
+        self.assertEqual(self.tree.rows["b"], (("b", 1), ("red font",)))
+
+    def testDelete(self):
+        self.reconciler.render(rows("a", "c"))
+        self.assertEqual(self.tree.calls, [("delete", "b")])
+        self.assertEqual(self.tree.order, ["a", "c"])
+
+    def testMove(self):
+        self.reconciler.render(rows("c", "a", "b"))
+        self.assertEqual(self.tree.calls, [("move", "c")])
+        self.assertEqual(self.tree.order, ["c", "a", "b"])
+
+    def testInsertInTheMiddle(self):
+        self.reconciler.render(rows("a", "d", "b", "c"))
+        self.assertEqual(self.tree.order, ["a", "d", "b", "c"])
+        self.assertEqual([call for call in self.tree.calls if call[0] == "insert"], [("insert", "d")])
+
+    def testMixedChanges(self):
+        self.reconciler.render(rows("d", "c", "a") + [("e", ("e", 0), ())])
+        self.assertEqual(self.tree.order, ["d", "c", "a", "e"])
+        self.assertIn(("delete", "b"), self.tree.calls)
+        self.assertEqual(sorted(iid for method, iid in self.tree.calls if method == "insert"), ["d", "e"])
+        self.assertNotIn("item", [method for method, iid in self.tree.calls])
+
+    def testClear(self):
+        self.reconciler.clear()
+        self.assertEqual(self.tree.order, [])
+        self.reconciler.render(rows("a"))
+        self.assertEqual(self.tree.calls[-1], ("insert", "a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import statistics
+import unittest
+
+import numpy as np
+
+from App.Model.CholesterolEncounter import CholesterolEncounter
+from App.Model.MonitoringList import MonitoringList
+from App.Model.Patient import Patient
+from App.Model.ValueStatistics import ValueStatistics
+
+VALUES = [180, 205.5, 150, 240, 199, 170, 260.25, 199]
+
+
+def patient(patient_id, value=None):
+    """
+    Build a Patient with one cholesterol reading
+    :param patient_id: ID of the patient
+    :param value: the reading, or None for a patient without Encounters
+    :return: the Patient
+    """
+    monitored = Patient(patient_id, "Given", "Family", "1970-01-01", "female", "1 Main St", "Clayton", "VIC", "AU")
+    if value is None:
+        return monitored
+    return monitored.withEncounters([CholesterolEncounter("2020-05-01T10:00:00.000+00:00", value)])
+
+
+class TestValueStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.statistics = ValueStatistics(capacity=2)  # small, so setting the values grows the array
+        for n, value in enumerate(VALUES):
+            self.statistics.set("p{0}".format(n), value)
+
+    def testMatchesStatisticsAndNumPy(self):
+        self.assertEqual(self.statistics.getCount(), len(VALUES))
+        self.assertAlmostEqual(self.statistics.getMean(), statistics.mean(VALUES))
+        self.assertAlmostEqual(self.statistics.getStandardDeviation(), statistics.pstdev(VALUES))
+        self.assertAlmostEqual(self.statistics.getMedian(), statistics.median(VALUES))
+        for percentile in (0, 10, 25, 90, 100):
+            self.assertAlmostEqual(self.statistics.getPercentile(percentile), np.percentile(VALUES, percentile))
+        scores = self.statistics.getZScores()
+        for n, value in enumerate(VALUES):
+            expected = (value - statistics.mean(VALUES)) / statistics.pstdev(VALUES)
+            self.assertAlmostEqual(scores["p{0}".format(n)], expected)
+            self.assertAlmostEqual(self.statistics.getZScore("p{0}".format(n)), expected)
+
+    def testSetReplacesAndRemoveKeepsSlotsContiguous(self):
+        self.statistics.set("p0", 100)
+        self.statistics.remove("p2")
+        self.statistics.remove("missing")
+        expected = [100] + VALUES[1:2] + VALUES[3:]
+        self.assertEqual(sorted(self.statistics.getValues().tolist()), sorted(expected))
+        self.assertFalse(self.statistics.contains("p2"))
+        self.assertEqual(self.statistics.getValue("p7"), VALUES[7])
+        self.assertAlmostEqual(self.statistics.getMean(), statistics.mean(expected))
+        self.assertAlmostEqual(self.statistics.getStandardDeviation(), statistics.pstdev(expected))
+        self.assertAlmostEqual(self.statistics.getMedian(), statistics.median(expected))
+
+    def testEmptyAndSingleValue(self):
+        empty = ValueStatistics()
+        self.assertEqual(empty.getCount(), 0)
+        self.assertIsNone(empty.getMean())
+        self.assertIsNone(empty.getStandardDeviation())
+        self.assertIsNone(empty.getMedian())
+        self.assertIsNone(empty.getPercentile(90))
+        self.assertIsNone(empty.getZScore("p1"))
+        self.assertEqual(empty.getZScores(), {})
+
+        empty.set("p1", 180)
+        self.assertEqual((empty.getMean(), empty.getStandardDeviation(), empty.getMedian()), (180, 0, 180))
+        self.assertEqual(empty.getZScores(), {"p1": 0.0})
+        empty.remove("p1")
+        self.assertIsNone(empty.getMean())
+
+
+class TestThresholdModes(unittest.TestCase):
+
+    def setUp(self):
+        self.monitor = MonitoringList("cholesterol", None, threshold=200)
+        self.monitor.addAll([patient("p{0}".format(n), value) for n, value in enumerate(VALUES)] + [patient("none")])
+
+    def testFixed(self):
+        self.assertEqual(self.monitor.getThreshold(), 200)
+        self.assertEqual(self.monitor.getThresholdMode(), ("fixed", None))
+
+    def testStatisticModes(self):
+        self.monitor.setThresholdMode("mean")
+        self.assertAlmostEqual(self.monitor.getThreshold(), statistics.mean(VALUES))
+        self.monitor.setThresholdMode("median")
+        self.assertAlmostEqual(self.monitor.getThreshold(), statistics.median(VALUES))
+        self.monitor.setThresholdMode("percentile", 90)
+        self.assertAlmostEqual(self.monitor.getThreshold(), np.percentile(VALUES, 90))
+        self.monitor.setThresholdMode("zscore", 1.5)
+        self.assertAlmostEqual(self.monitor.getThreshold(),
+                               statistics.mean(VALUES) + 1.5 * statistics.pstdev(VALUES))
+        self.assertEqual(self.monitor.getThresholdMode(), ("zscore", 1.5))
+
+    def testFollowsRemovedPatients(self):
+        self.monitor.setThresholdMode("median")
+        self.monitor.remove("p3")
+        self.assertAlmostEqual(self.monitor.getThreshold(), statistics.median(VALUES[:3] + VALUES[4:]))
+
+    def testEmptyListUsesFixedThreshold(self):
+        monitor = MonitoringList("cholesterol", None, threshold=200)
+        monitor.add(patient("none"))
+        for mode, parameter in (("mean", None), ("median", None), ("percentile", 90), ("zscore", 2)):
+            monitor.setThresholdMode(mode, parameter)
+            self.assertEqual(monitor.getThreshold(), 200)
+
+    def testSinglePatient(self):
+        monitor = MonitoringList("cholesterol", None, threshold=200)
+        monitor.add(patient("p1", 180))
+        for mode, parameter in (("mean", None), ("median", None), ("percentile", 90), ("zscore", 2)):
+            monitor.setThresholdMode(mode, parameter)
+            self.assertEqual(monitor.getThreshold(), 180)
+
+    def testUnknownModeOrMissingParameter(self):
+        with self.assertRaises(ValueError):
+            self.monitor.setThresholdMode("mode")
+        with self.assertRaises(ValueError):
+            self.monitor.setThresholdMode("percentile")
+        self.assertEqual(self.monitor.getThresholdMode(), ("fixed", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
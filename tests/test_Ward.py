@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+from App.Model.MyExceptions import LoginException
+from App.Model.Patient import Patient
+from App.Model.Ward import Ward
+
+
+def patient(patient_id):
+    """
+    Build a Patient without Encounters
+    :param patient_id: ID of the patient
+    :return: the Patient
+    """
+    return Patient(patient_id, "Given", "Family", "1970-01-01", "female", "1 Main St", "Clayton", "VIC", "AU")
+
+
+class RosterWebServiceManager:
+    """
+    Stands in for WebServiceManager, answering the roster of each practitioner from a map
+    """
+
+    def __init__(self, rosters):
+        """
+        :param rosters: map of practitioner ID to the IDs of their patients, in order
+        """
+        self.__rosters = rosters
+        self.__lock = threading.Lock()
+        self.rosterFetches = 0
+
+    def fetchPractitionerIdentifier(self, pracId):
+        return "identifier-" + pracId if pracId in self.__rosters else None
+
+    def iterAllPatients(self, identifier):
+        with self.__lock:
+            self.rosterFetches += 1
+        for patient_id in self.__rosters[identifier[len("identifier-"):]]:
+            yield patient(patient_id)
+
+
+class TestWard(unittest.TestCase):
+
+    def setUp(self):
+        # 30 patients each, the last 5 of the first roster being the first 5 of the second
+        self.wsm = RosterWebServiceManager({"a": ["p{0}".format(n) for n in range(30)],
+                                            "b": ["p{0}".format(n) for n in range(25, 55)]})
+
+    def testSharedPatientsAppearOnce(self):
+        ward = Ward(["a", "b"], self.wsm)
+        self.assertEqual(len(ward.returnPatients()), 55)
+        self.assertEqual(ward.getPractitionerIds("p0"), ["a"])
+        self.assertEqual(ward.getPractitionerIds("p27"), ["a", "b"])
+        self.assertEqual(ward.getPractitionerIds("p54"), ["b"])
+        self.assertEqual(ward.getPractitionerIds("unknown"), [])
+        self.assertEqual(ward.getId(), "a,b")
+
+    def testLoadPatientsYieldsEachPatientOnce(self):
+        ward = Ward(["a", "b", "a"], self.wsm, False)
+        before = ward.returnPatients()
+        loaded = [loaded.getId() for loaded in ward.loadPatients()]
+        self.assertEqual(len(loaded), 55)
+        self.assertEqual(set(loaded), {"p{0}".format(n) for n in range(55)})
+        self.assertEqual(self.wsm.rosterFetches, 2)  # the duplicated ID is fetched once
+        self.assertEqual(len(before), 0)  # views handed out earlier do not change
+        self.assertEqual(len(ward.returnPatients()), 55)
+        self.assertIs(ward.getPatient("p30"), ward.returnPatients()["p30"])
+
+    def testUnknownPractitioner(self):
+        with self.assertRaises(LoginException):
+            Ward(["a", "missing"], self.wsm)
+
+
+if __name__ == "__main__":
+    unittest.main()
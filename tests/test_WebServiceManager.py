@@ -0,0 +1,265 @@
+import unittest
+from urllib.parse import quote
+
+from App.Model.MyExceptions import ServerException
+from App.Model.WebServiceManager import WebServiceManager
+from FakeFhirServer import FakeFhirServer, bloodPressureObservation, bundle, cholesterolObservation
+
+
+def issued(day):
+    """
+    Get the time of a reading on a day of May 2020
+    :param day: day of the month
+    :return: ISO 8601 datetime at 10:00 UTC that day
+    """
+    return "2020-05-{0:02d}T10:00:00.000+00:00".format(day)
+
+
+def values(results, patient_id, encounterType):
+    """
+    Get the values of the Encounters fetched for a patient
+    :param results: map of patient id to a map of encounter type to list of Encounters
+    :param patient_id: ID of the patient
+    :param encounterType: type of encounter
+    :return: list of values, latest first
+    """
+    return [encounter.getValue() for encounter in results[patient_id][encounterType]]
+
+
+class TestFetchEncountersBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = []  # Bundle pages answered in turn, the last one for every request after it
+        self.server = FakeFhirServer(self.respond)
+        self.server.start()
+        self.wsm = WebServiceManager(baseUrl=self.server.getBaseUrl())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def respond(self, path, query, headers):
+        """
+        Answer the Observation searches with the pages of the test in turn
+        :param path: path of the url
+        :param query: map of query parameter to value
+        :param headers: the request headers
+        :return: the status, response headers and the next page
+        """
+        count = len(self.server.getRequests())
+        return 200, {}, self.pages[min(count, len(self.pages)) - 1]
+
+    def testOneSearchForAllTypes(self):
+        self.pages = [bundle([cholesterolObservation("p1", issued(3), 180),
+                              bloodPressureObservation("p2", issued(3), 140, 90),
+                              cholesterolObservation("p2", issued(2), 200),
+                              cholesterolObservation("p1", issued(1), 170)])]
+        results = self.wsm.fetchEncountersBulk(["p1", "p2"], ["cholesterol", "systolic", "diastolic"], 1)
+        requests = self.server.getRequests()
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0][0], "/fhir/Observation")
+        self.assertEqual(requests[0][1]["patient"], "p1,p2")
+        self.assertEqual(requests[0][1]["code"], "2093-3,55284-4")
+        self.assertEqual(values(results, "p1", "cholesterol"), [180])
+        self.assertEqual(values(results, "p2", "cholesterol"), [200])
+        self.assertEqual(values(results, "p2", "systolic"), [140])
+        self.assertEqual(values(results, "p2", "diastolic"), [90])
+        self.assertEqual(values(results, "p1", "systolic"), [])
+        self.assertEqual(results["p1"]["cholesterol"][0].getDateTime(), issued(3))
+
+    def testPagesUntilEveryPatientHasEnough(self):
+        nextUrl = self.server.getBaseUrl() + "Observation?page=2"
+        self.pages = [bundle([cholesterolObservation("p1", issued(3), 180),
+                              cholesterolObservation("p2", issued(3), 200)], nextUrl),
+                      bundle([cholesterolObservation("p1", issued(2), 170),
+                              cholesterolObservation("p2", issued(2), 190)], nextUrl),
+                      bundle([cholesterolObservation("p1", issued(1), 160)])]
+        results = self.wsm.fetchEncountersBulk(["p1", "p2"], ["cholesterol"], 2)
+        self.assertEqual(len(self.server.getRequests()), 2)  # the third page is not needed
+        self.assertEqual(values(results, "p1", "cholesterol"), [180, 170])
+        self.assertEqual(values(results, "p2", "cholesterol"), [200, 190])
+
+    def testPatientsAreSearchedInChunks(self):
+        self.pages = [bundle([])]
+        patient_ids = ["p{0}".format(n) for n in range(120)]
+        results = self.wsm.fetchEncountersBulk(patient_ids, ["cholesterol"], 1)
+        chunks = [query["patient"].split(",") for path, query in self.server.getRequests()]
+        self.assertEqual([len(chunk) for chunk in chunks], [50, 50, 20])
+        self.assertEqual(sum(chunks, []), patient_ids)
+        self.assertEqual(set(results), set(patient_ids))
+
+    def testUnknownTypeIsNotSearched(self):
+        results = self.wsm.fetchEncountersBulk(["p1"], ["weight"], 1)
+        self.assertEqual(results, {"p1": {}})
+        self.assertEqual(self.server.getRequests(), [])
+
+
+class TestFetchEncountersSince(unittest.TestCase):
+
+    def setUp(self):
+        # Observations the server holds, latest reading first, each updated on the server a day after its reading
+        self.observations = [cholesterolObservation("p1", issued(day), 100 + day, issued(day + 1))
+                             for day in range(4, 0, -1)]
+        self.server = FakeFhirServer(self.respond)
+        self.server.start()
+        self.wsm = WebServiceManager(baseUrl=self.server.getBaseUrl())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def respond(self, path, query, headers):
+        """
+        Answer the Observation searches, keeping to the Observations updated after a _lastUpdated=gt filter
+        :param path: path of the url
+        :param query: map of query parameter to value
+        :param headers: the request headers
+        :return: the status, response headers and the search page
+        """
+        since = query.get("_lastUpdated", "gt")[2:]
+        return 200, {}, bundle([observation for observation in self.observations
+                                if observation["meta"]["lastUpdated"] > since][:int(query["_count"])])
+
+    def testFirstCallReturnsLatestAndWatermark(self):
+        results, watermark = self.wsm.fetchEncountersSince(["p1"], ["cholesterol"], 2, None)
+        self.assertEqual(values(results, "p1", "cholesterol"), [104, 103])
+        self.assertEqual(watermark, issued(5))
+        self.assertNotIn("_lastUpdated", self.server.getRequests()[0][1])
+
+    def testWatermarkOnlyFetchesNewerObservations(self):
+        _, watermark = self.wsm.fetchEncountersSince(["p1"], ["cholesterol"], 2, None)
+        results, unchanged = self.wsm.fetchEncountersSince(["p1"], ["cholesterol"], 2, watermark)
+        self.assertEqual(self.server.getRequests()[-1][1]["_lastUpdated"], "gt" + watermark)
+        self.assertEqual(values(results, "p1", "cholesterol"), [])
+        self.assertEqual(unchanged, watermark)
+
+        self.observations.insert(0, cholesterolObservation("p1", issued(6), 106))
+        results, newer = self.wsm.fetchEncountersSince(["p1"], ["cholesterol"], 2, watermark)
+        self.assertEqual(values(results, "p1", "cholesterol"), [106])
+        self.assertEqual(newer, issued(6))
+
+
+class TestRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.failures = 0  # number of requests answered 503 before the server recovers
+        self.server = FakeFhirServer(self.respond)
+        self.server.start()
+        self.wsm = WebServiceManager(retries=2, backoffFactor=0, baseUrl=self.server.getBaseUrl())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def respond(self, path, query, headers):
+        """
+        Answer 503 to the first requests, then a Patient or an empty search
+        :param path: path of the url
+        :param query: map of query parameter to value
+        :param headers: the request headers
+        :return: the status, response headers and body
+        """
+        if len(self.server.getRequests()) <= self.failures:
+            return 503, {}, None
+        if path.startswith("/fhir/Patient/"):
+            return 200, {}, {"resourceType": "Patient", "id": path.split("/")[-1], "birthDate": "1970-01-01",
+                             "gender": "unknown", "name": [{"given": ["Given"], "family": "Family"}],
+                             "address": [{"line": ["1 Main St"], "city": "Clayton", "state": "VIC",
+                                          "country": "AU"}]}
+        return 200, {}, bundle([])
+
+    def testRetriesOn503(self):
+        self.failures = 2
+        self.assertEqual(self.wsm.fetchEncounter("p1", "cholesterol", 1), [])
+        self.assertEqual(len(self.server.getRequests()), 3)
+        stats = self.wsm.getRequestStats()["Observation"]
+        self.assertEqual((stats["requests"], stats["errors"]), (1, 0))
+
+    def testExhaustedRetriesRaiseServerException(self):
+        self.failures = 10
+        with self.assertRaises(ServerException):
+            self.wsm.fetchEncounter("p1", "cholesterol", 1)
+        self.assertEqual(len(self.server.getRequests()), 3)  # the request and its two retries
+        stats = self.wsm.getRequestStats()["Observation"]
+        self.assertEqual((stats["requests"], stats["errors"]), (1, 1))
+
+    def testRequestsAreCountedPerResource(self):
+        self.wsm.fetchPatient("p1")
+        self.wsm.fetchPatient("p2")
+        self.wsm.fetchEncountersBulk(["p1", "p2"], ["cholesterol"], 1)
+        stats = self.wsm.getRequestStats()
+        self.assertEqual({endpoint: counts["requests"] for endpoint, counts in stats.items()},
+                         {"Patient": 2, "Observation": 1})
+        self.assertTrue(all(counts["errors"] == 0 and counts["maxLatency"] >= counts["meanLatency"] > 0
+                            for counts in stats.values()))
+
+
+class TestNumbersAndStartDates(unittest.TestCase):
+    types = ["cholesterol", "systolic", "diastolic"]
+
+    def setUp(self):
+        # Observations the server holds, latest reading first: five days of both kinds for two patients
+        self.observations = []
+        for day in range(5, 0, -1):
+            for n, patient_id in enumerate(["p1", "p2"]):
+                self.observations.append(cholesterolObservation(patient_id, issued(day), 100 * (n + 1) + day))
+                self.observations.append(bloodPressureObservation(patient_id, issued(day), 120 + day, 80 + day))
+        self.server = FakeFhirServer(self.respond)
+        self.server.start()
+        self.wsm = WebServiceManager(baseUrl=self.server.getBaseUrl())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def respond(self, path, query, headers):
+        """
+        Answer the Observation searches like the FHIR server: filtered by patient, code and date=ge, latest first,
+        in pages of _count Observations linked by a next url
+        :param path: path of the url
+        :param query: map of query parameter to value
+        :param headers: the request headers
+        :return: the status, response headers and the search page
+        """
+        patient_ids = query["patient"].split(",")
+        codes = query["code"].split(",")
+        start = query.get("date", "ge")[2:]
+        found = [observation for observation in self.observations
+                 if observation["subject"]["reference"][len("Patient/"):] in patient_ids
+                 and observation["code"]["coding"][0]["code"] in codes and observation["issued"] >= start]
+        offset = int(query.get("_offset", 0))
+        count = int(query["_count"])
+        nextUrl = None
+        if offset + count < len(found):
+            nextUrl = "{0}Observation?patient={1}&code={2}&_count={3}&_offset={4}".format(
+                self.server.getBaseUrl(), query["patient"], query["code"], count, offset + count)
+            if "date" in query:
+                nextUrl += "&date=" + quote(query["date"], safe='')
+        return 200, {}, bundle(found[offset:offset + count], nextUrl)
+
+    def testNumberPerPatientAndType(self):
+        results = self.wsm.fetchEncountersBulk(["p1", "p2"], self.types,
+                                               {"p1": {"cholesterol": 3}, "p2": {"systolic": 1, "diastolic": 4}})
+        self.assertEqual(values(results, "p1", "cholesterol"), [105, 104, 103])
+        self.assertEqual(values(results, "p1", "systolic"), [])
+        self.assertEqual(values(results, "p2", "cholesterol"), [])
+        self.assertEqual(values(results, "p2", "systolic"), [125])
+        self.assertEqual(values(results, "p2", "diastolic"), [85, 84, 83, 82])
+
+    def testStartDateFilter(self):
+        results = self.wsm.fetchEncountersBulk(["p1"], ["cholesterol"], 10, issued(4))
+        self.assertEqual(self.server.getRequests()[0][1]["date"], "ge" + issued(4))
+        self.assertEqual(values(results, "p1", "cholesterol"), [105, 104])
+
+    def testStartDatePerPatientAndType(self):
+        results = self.wsm.fetchEncountersBulk(["p1", "p2"], ["cholesterol"], 10,
+                                               {"p1": {"cholesterol": issued(3)},
+                                                "p2": {"cholesterol": "2020-06-01T00:00:00.000+00:00"}})
+        self.assertNotIn("date", self.server.getRequests()[0][1])
+        # the first encounter before the date ends the list, and is only kept if the list is still empty
+        self.assertEqual(values(results, "p1", "cholesterol"), [105, 104, 103])
+        self.assertEqual(values(results, "p2", "cholesterol"), [205])
+
+    def testPagingStopsAtStartDate(self):
+        self.wsm.fetchEncountersBulk(["p1"], ["cholesterol"], 100, {"p1": {"cholesterol": issued(4)}})
+        self.assertEqual(len(self.server.getRequests()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()